@@ -1,8 +1,9 @@
 from typing import List
-import pandas as pd
 from collections import Counter
 from collections import defaultdict
 
+from core.backend.app.geo import hilbert_index
+
 LABEL_KEY = 'label'
 USERNAME_KEY = 'username'
 EXAMPLE_ID_KEY = 'example_id'
@@ -25,6 +26,37 @@ def round_robin_algorithm(tasks: list,
 
   return example_annotator_map
 
+def _locality_key(task):
+  latitude, longitude = getattr(task, "latitude", None), getattr(task, "longitude", None)
+  if latitude is None or longitude is None:
+    return (1, 0)
+  return (0, hilbert_index(latitude, longitude))
+
+def locality_algorithm(tasks: list,
+                       annotators: list,
+                       max_annotators_per_example: int):
+  """
+  Order tasks along a Hilbert curve over their coordinates and cut them into
+  one contiguous block per annotator. Copy j of block b goes to annotator
+  b + j, so every task gets distinct annotators and each annotator works
+  through adjacent blocks of one area, reusing cached images and map tiles.
+  Tasks without coordinates keep their order after the located ones.
+
+  :param max_annotators_per_example: Annotators per task, at most one per annotator.
+  """
+  num_annotators = len(annotators)
+  num_tasks = len(tasks)
+  annotators_per_example = min(max_annotators_per_example, num_annotators)
+  example_annotator_map = defaultdict(list)
+
+  for i, task in enumerate(sorted(tasks, key=_locality_key)):
+    block = i * num_annotators // num_tasks
+    for j in range(annotators_per_example):
+      annotator = annotators[(block + j) % num_annotators]
+      example_annotator_map[task.task_id].append(annotator.user_id)
+
+  return example_annotator_map
+
 def weighted_round_robin_algorithm(examples: list,
                                   annotators: list):
   num_annotators = len(annotators)
@@ -43,6 +75,46 @@ def weighted_round_robin_algorithm(examples: list,
 
   return example_annotator_map
 
+# Adaptive redundancy
+def has_consensus(annotation_list: list, threshold: float = 1.0) -> bool:
+  """
+  Whether a single label holds at least `threshold` of the votes.
+
+  :param annotation_list: Labels (or label IDs) given to one task.
+  :param threshold: Required share of the votes; 1.0 means unanimous.
+  """
+  _, most_common_annotations = calculate_majority_agreement(annotation_list)
+  if len(most_common_annotations) != 1:
+    return False
+  return annotation_list.count(most_common_annotations[0]) >= threshold * len(annotation_list)
+
+def needs_more_annotators(annotation_list: list,
+                          assigned: int,
+                          min_annotators: int,
+                          max_annotators: int,
+                          threshold: float = 1.0) -> bool:
+  """
+  A task gets another annotator once everyone assigned to it has voted, it has
+  at least `min_annotators` votes, no label has consensus and the cap of
+  `max_annotators` is not reached.
+  """
+  votes = len(annotation_list)
+  if votes < max(assigned, min(min_annotators, max_annotators)) or assigned >= max_annotators:
+    return False
+  return not has_consensus(annotation_list, threshold)
+
+def pick_extra_annotator(annotator_ids: list, excluded: set, workload: dict):
+  """
+  Least busy annotator not yet involved with the task.
+
+  :param workload: Open assignments per annotator ID.
+  :return: Annotator ID, or None if every annotator is excluded.
+  """
+  candidates = [annotator_id for annotator_id in annotator_ids if annotator_id not in excluded]
+  if not candidates:
+    return None
+  return min(candidates, key=lambda annotator_id: (workload.get(annotator_id, 0), annotator_id))
+
 # Compute Agreements
 def compute_agreements(annotations):
   """
@@ -77,6 +149,9 @@ def calculate_majority_agreement(annotation_list: list):
   return agreement_scores, most_common_annotations
 
 def concat_annotations(df):
+  # Imported here so that pandas stays out of application startup
+  import pandas as pd
+
   # Concatenate annotator usernames and annotations
   usernames = ', '.join(df[USERNAME_KEY].unique())
   annotations = ', '.join(df[LABEL_KEY])
@@ -0,0 +1,115 @@
+import hashlib
+import datetime
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.backend.app.model import Project, Task
+
+# Browsers keep the response but revalidate it on every use; per-user
+# responses must not be stored by shared caches
+CACHE_CONTROL = "private, no-cache"
+
+@dataclass
+class CacheValidators:
+  etag: str
+  last_modified: Optional[datetime.datetime] = None
+
+def _variant(request: Request) -> str:
+  # Responses differ per URL and per signed-in user/role, so both are part of the tag
+  key = "|".join([
+    request.url.path,
+    str(sorted(request.query_params.multi_items())),
+    request.cookies.get("access_token", ""),
+    request.cookies.get("current_role", ""),
+  ])
+  return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def _validators(request: Request, scope: str, version, last_modified) -> CacheValidators:
+  return CacheValidators(etag=f'W/"{scope}-{version}-{_variant(request)}"', last_modified=last_modified)
+
+def project_validators(db: Session, request: Request, project_id: int) -> Optional[CacheValidators]:
+  """
+  :return: Validators derived from the project's version counter, or None if the project does not exist.
+  """
+  row = (db.query(Project.version, Project.updated_at)
+         .filter(Project.project_id == project_id)
+         .first())
+  if row is None:
+    return None
+  return _validators(request, f"p{project_id}", row.version, row.updated_at)
+
+def labeled_status_validators(db: Session, request: Request, project_id: int) -> Optional[CacheValidators]:
+  row = (db.query(Project.version, Project.annotation_version)
+         .filter(Project.project_id == project_id)
+         .first())
+  if row is None:
+    return None
+  # No Last-Modified: annotation writes do not touch updated_at
+  return _validators(request, f"p{project_id}-labels", f"{row.version}.{row.annotation_version}", None)
+
+def task_project_validators(db: Session, request: Request, task_id: int) -> Optional[CacheValidators]:
+  row = (db.query(Project.project_id, Project.version, Project.updated_at)
+         .join(Task, Task.project_id == Project.project_id)
+         .filter(Task.task_id == task_id)
+         .first())
+  if row is None:
+    return None
+  return _validators(request, f"p{row.project_id}", row.version, row.updated_at)
+
+def project_list_validators(db: Session, request: Request) -> CacheValidators:
+  # Creating, deleting or updating any project changes one of these aggregates
+  count, version_sum, max_id, last_modified = db.query(
+    func.count(Project.project_id),
+    func.coalesce(func.sum(Project.version), 0),
+    func.coalesce(func.max(Project.project_id), 0),
+    func.max(Project.updated_at),
+  ).one()
+  return _validators(request, "projects", f"{count}.{version_sum}.{max_id}", last_modified)
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+  return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+def _last_modified_header(value: datetime.datetime) -> Optional[datetime.datetime]:
+  """
+  HTTP dates have whole seconds, so the header is the second after `value`.
+  It is only sent once that second has passed: until then a later write
+  could fall before it and be hidden by a 304. The ETag validates meanwhile.
+  """
+  header = _utc(value).replace(microsecond=0) + datetime.timedelta(seconds=1)
+  return header if header <= datetime.datetime.now(datetime.timezone.utc) else None
+
+def is_not_modified(request: Request, validators: CacheValidators) -> bool:
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match is not None:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: compare tags without the W/ prefix
+    return "*" in candidates or validators.etag.removeprefix("W/") in [
+      tag.removeprefix("W/") for tag in candidates]
+
+  if_modified_since = request.headers.get("if-modified-since")
+  if if_modified_since and validators.last_modified is not None:
+    try:
+      since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+      return False
+    # Only modifications strictly before the header's second are covered by it
+    return _utc(validators.last_modified) < since
+  return False
+
+def set_cache_headers(response: Response, validators: CacheValidators):
+  response.headers["ETag"] = validators.etag
+  response.headers["Cache-Control"] = CACHE_CONTROL
+  response.headers["Vary"] = "Cookie"
+  last_modified = _last_modified_header(validators.last_modified) if validators.last_modified is not None else None
+  if last_modified is not None:
+    response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+def not_modified_response(validators: CacheValidators) -> Response:
+  response = Response(status_code=304)
+  set_cache_headers(response, validators)
+  return response
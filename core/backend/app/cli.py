@@ -0,0 +1,173 @@
+"""
+Management commands for the core backend.
+
+Usage:
+  python -m core.backend.app.cli migrate
+  python -m core.backend.app.cli revision -m "add label table"
+  python -m core.backend.app.cli init-db
+  python -m core.backend.app.cli seed --projects 5 --tasks 200000 --agreement "0.95:0.7,0.5:0.3"
+  python -m core.backend.app.cli schedule
+  python -m core.backend.app.cli dedup --project-id 1
+  python -m core.backend.app.cli precompress core/frontend/build
+
+Commands use the same database configuration as the API (DATABASE_URL or
+the Cloud SQL environment variables).
+"""
+import time
+
+import typer
+
+cli = typer.Typer(help="SKAInnotate core management commands")
+
+@cli.callback()
+def main():
+  pass
+
+@cli.command()
+def migrate(revision: str = typer.Option("head", help="Target revision")):
+  """
+  Apply pending schema migrations. Revisions after 0001 are safe to run while
+  the service is live: index builds run concurrently and backfills commit in
+  batches. 0001 (integer task keys) needs the service stopped.
+  """
+  from core.backend.app.database import engine
+  from core.backend.app.migrations import migrate as upgrade
+
+  start = time.perf_counter()
+  previous, current = upgrade(engine, revision)
+  typer.echo(f"Migrated from {previous or 'empty'} to {current} in {time.perf_counter() - start:.1f}s")
+
+@cli.command()
+def revision(message: str = typer.Option(..., "-m", "--message", help="Short description of the change"),
+             autogenerate: bool = typer.Option(False, help="Diff the models against the database")):
+  """
+  Create a new migration script in core/backend/migrations/versions.
+  """
+  from alembic import command
+  from core.backend.app.migrations import alembic_config, head_revision
+
+  config = alembic_config()
+  rev_id = f"{int(head_revision()) + 1:04d}"
+  if autogenerate:
+    from core.backend.app.database import engine
+    with engine.connect() as connection:
+      config.attributes["connection"] = connection
+      script = command.revision(config, message=message, autogenerate=True, rev_id=rev_id)
+  else:
+    script = command.revision(config, message=message, rev_id=rev_id)
+  typer.echo(f"Created {script.path}")
+
+@cli.command("init-db")
+def init_db():
+  """
+  Create the schema and seed the roles and admin user. Run once per release
+  when workers start with INIT_DB_ON_STARTUP=0.
+  """
+  from core.backend.app.database import init_db as initialize
+
+  start = time.perf_counter()
+  initialize()
+  typer.echo(f"Database initialized in {time.perf_counter() - start:.2f}s")
+
+@cli.command()
+def seed(projects: int = typer.Option(1, help="Projects to create"),
+         tasks: int = typer.Option(10000, help="Tasks per project"),
+         annotators: int = typer.Option(20, help="Annotator users to create"),
+         reviewers: int = typer.Option(2, help="Reviewer users to create"),
+         admins: int = typer.Option(1, help="Admin users to create"),
+         labels: int = typer.Option(5, help="Labels per project"),
+         annotators_per_task: int = typer.Option(3, help="Annotators assigned to each task"),
+         annotated_fraction: float = typer.Option(0.5, help="Fraction of tasks labeled by all their annotators"),
+         reviewed_fraction: float = typer.Option(0.1, help="Fraction of annotated tasks that were reviewed"),
+         agreement: str = typer.Option("0.9", help="Agreement distribution as probability:weight pairs, "
+                                                   "e.g. 0.95:0.7,0.5:0.3"),
+         prefix: str = typer.Option("synthetic", help="Prefix for generated usernames and project titles"),
+         seed: int = typer.Option(0, help="Random seed")):
+  """
+  Generate a synthetic dataset directly in the database.
+  """
+  from core.backend.app.database import engine
+  from core.backend.app.synthetic import generate_dataset
+
+  start = time.perf_counter()
+  try:
+    generated = generate_dataset(engine,
+                                 projects=projects,
+                                 tasks_per_project=tasks,
+                                 annotators=annotators,
+                                 reviewers=reviewers,
+                                 admins=admins,
+                                 labels=labels,
+                                 annotators_per_task=annotators_per_task,
+                                 annotated_fraction=annotated_fraction,
+                                 reviewed_fraction=reviewed_fraction,
+                                 agreement=agreement,
+                                 prefix=prefix,
+                                 seed=seed)
+  except ValueError as e:
+    typer.echo(str(e), err=True)
+    raise typer.Exit(code=1)
+
+  elapsed = time.perf_counter() - start
+  for project in generated["projects"]:
+    typer.echo(f"Project {project['project_id']}: {len(project['task_ids'])} tasks, "
+               f"{project['annotated_tasks']} annotated, {project['reviewed_tasks']} reviewed")
+  typer.echo(f"Generated {len(generated['projects'])} projects in {elapsed:.1f}s")
+
+@cli.command()
+def schedule():
+  """
+  Recompute every project's deadline priority and print the schedule, most
+  urgent first. Run periodically, e.g. as a Cloud Run job.
+  """
+  from core.backend.app.database import SessionLocal
+  from core.backend.app.crud import refresh_project_priorities
+
+  with SessionLocal() as db:
+    schedules = refresh_project_priorities(db)
+  for entry in sorted(schedules, key=lambda entry: entry["priority"], reverse=True):
+    projected = entry["projected_completion"]
+    typer.echo(f"Project {entry['project_id']}: priority {entry['priority']:.2f}, "
+               f"{entry['remaining_annotations']} annotations left, "
+               f"projected {projected.isoformat(timespec='minutes') if projected else 'never'}"
+               f"{' (at risk)' if entry['at_risk'] else ''}")
+
+@cli.command()
+def dedup(project_id: int = typer.Option(..., help="Project whose task images are compared"),
+          max_distance: int = typer.Option(None, help="Largest Hamming distance between near-duplicate hashes "
+                                                      "(default DEDUP_MAX_DISTANCE)"),
+          processes: int = typer.Option(None, help="Hashing processes (default DEDUP_PROCESSES or one per core)")):
+  """
+  Hash the project's new task images and group near-duplicates, so that only
+  one task per group is labeled.
+  """
+  from core.backend.app import dedup as near_duplicates
+  from core.backend.app.database import SessionLocal
+  from core.backend.app.crud import deduplicate_tasks
+
+  start = time.perf_counter()
+  with SessionLocal() as db:
+    try:
+      result = deduplicate_tasks(db, project_id,
+                                 max_distance=near_duplicates.DEDUP_MAX_DISTANCE if max_distance is None else max_distance,
+                                 processes=processes or near_duplicates.DEDUP_PROCESSES)
+    except RuntimeError as e:
+      typer.echo(str(e), err=True)
+      raise typer.Exit(code=1)
+  typer.echo(f"Hashed {result['hashed']} images ({result['unreadable']} unreadable) in "
+             f"{time.perf_counter() - start:.1f}s; {result['duplicates']} duplicates in {result['groups']} groups")
+
+@cli.command()
+def precompress(directory: str = typer.Argument("core/frontend/build", help="Frontend build directory"),
+                minimum_size: int = typer.Option(1024, help="Skip files smaller than this many bytes")):
+  """
+  Write .br/.gz siblings for the frontend build so they are served without
+  compressing on each request.
+  """
+  from core.backend.app.static import precompress_directory
+
+  written = precompress_directory(directory, minimum_size=minimum_size)
+  typer.echo(f"Wrote {written['br']} .br and {written['gzip']} .gz files under {directory}")
+
+if __name__ == "__main__":
+  cli()
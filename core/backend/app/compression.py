@@ -0,0 +1,139 @@
+import os
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+  import brotli
+except ImportError:  # brotli is optional; gzip is always available
+  brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+# Encodings offered, in order of preference
+COMPRESSION_ENCODINGS = [encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",")
+                         if encoding.strip()]
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml",
+                      "image/svg+xml")
+
+class _Compressor:
+  def __init__(self, encoding: str):
+    self.encoding = encoding
+    if encoding == "br":
+      self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    else:
+      # wbits=31 writes a gzip header and trailer
+      self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+  def compress(self, data: bytes) -> bytes:
+    if self.encoding == "br":
+      return self._compressor.process(data)
+    return self._compressor.compress(data)
+
+  def finish(self) -> bytes:
+    return self._compressor.finish() if self.encoding == "br" else self._compressor.flush()
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+  accepted = []
+  for part in accept_encoding.split(","):
+    name, _, params = part.strip().partition(";")
+    if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+      continue
+    accepted.append(name.strip().lower())
+  return accepted
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+  """
+  :param available: Encodings the server can produce, in order of preference.
+  :return: The first available encoding the client accepts, or None for identity.
+  """
+  accepted = _accepted_encodings(accept_encoding)
+  return next((encoding for encoding in available if encoding in accepted), None)
+
+class CompressionMiddleware:
+  """
+  Brotli/gzip response compression with a size threshold.
+
+  Whole responses are compressed in one pass; streamed responses are
+  compressed chunk by chunk. Responses that already set Content-Encoding
+  (precompressed files, event streams) or are not text-like pass through.
+  """
+  def __init__(self, app,
+               minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+               encodings: Optional[List[str]] = None):
+    self.app = app
+    self.minimum_size = minimum_size
+    self.encodings = [encoding for encoding in (encodings or COMPRESSION_ENCODINGS)
+                      if encoding == "gzip" or (encoding == "br" and brotli is not None)]
+
+  async def __call__(self, scope, receive, send):
+    encoding = None
+    if scope["type"] == "http":
+      encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+    if encoding is None:
+      await self.app(scope, receive, send)
+      return
+
+    start_message = None
+    compressor: Optional[_Compressor] = None
+    passthrough = False
+
+    async def send_wrapper(message):
+      nonlocal start_message, compressor, passthrough
+      if message["type"] == "http.response.start":
+        start_message = message
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "")
+        passthrough = ("content-encoding" in headers
+                       or not content_type.startswith(COMPRESSIBLE_TYPES))
+        return
+      if message["type"] != "http.response.body":
+        await send(message)
+        return
+
+      body = message.get("body", b"")
+      more_body = message.get("more_body", False)
+      if passthrough:
+        if start_message is not None:
+          await send(start_message)
+          start_message = None
+        await send(message)
+        return
+
+      if compressor is None:
+        if not more_body and len(body) < self.minimum_size:
+          await send(start_message)
+          start_message = None
+          await send(message)
+          passthrough = True
+          return
+        compressor = _Compressor(encoding)
+        headers = MutableHeaders(raw=start_message["headers"])
+        headers["Content-Encoding"] = encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+          # The compressed body is a different representation
+          headers["ETag"] = f"W/{headers['etag']}"
+        if more_body:
+          del headers["Content-Length"]
+        else:
+          compressed = compressor.compress(body) + compressor.finish()
+          headers["Content-Length"] = str(len(compressed))
+          await send(start_message)
+          start_message = None
+          await send({"type": "http.response.body", "body": compressed})
+          return
+        await send(start_message)
+        start_message = None
+
+      chunk = compressor.compress(body)
+      if not more_body:
+        chunk += compressor.finish()
+      if chunk or not more_body:
+        await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    await self.app(scope, receive, send_wrapper)
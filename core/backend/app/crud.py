@@ -1,9 +1,11 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, delete, insert, update, literal, exists
+from sqlalchemy.orm import Session, aliased, selectinload
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import datetime
+import time
 import json
+from collections import defaultdict
 
 import core.backend.app.schema as schema
 from core.backend.app.model import (User, 
@@ -11,11 +13,150 @@ from core.backend.app.model import (User,
                       Task,
                       Annotation,
                       Review,
+                      Label,
+                      Prediction,
+                      PredictionScore,
                       AssignedTask,
                       Project,
                       user_tasks,
                       user_roles)
-from core.backend.app.assignment import round_robin_algorithm
+from core.backend.app.assignment import round_robin_algorithm, locality_algorithm, needs_more_annotators, pick_extra_annotator
+from core.backend.app.predictions import summarize_scores
+from core.backend.app import events, scheduling, dedup, geo
+
+# Number of tasks removed per DELETE batch; keeps row locks and WAL bursts short
+DELETE_CHUNK_SIZE = 5000
+# Rows written per bulk INSERT/UPDATE batch (predictions import, deduplication)
+BULK_WRITE_BATCH_SIZE = 5000
+
+# (version, annotation_version) of a project before and after a write
+VersionChange = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# Project event publishing
+def _publish_task_event(db: Session, task_id: int, event_type: str, data: dict, annotations_change: int = 0,
+                        versions: Optional[VersionChange] = None):
+  # Skip the lookups entirely while no dashboard is listening
+  if not events.broker.has_subscribers():
+    return
+  row = (db.query(Task.project_id, Project.max_annotators_per_task, Project.assignment_mode)
+         .join(Project, Project.project_id == Task.project_id)
+         .filter(Task.task_id == task_id)
+         .first())
+  if row is None or not events.broker.has_subscribers(row.project_id):
+    return
+  delta = {}
+  if row.assignment_mode == schema.AssignmentMode.adaptive and event_type.startswith("annotation."):
+    # Completion depends on agreement, not on a count; dashboards reload their snapshot
+    if annotations_change:
+      delta["totalAnnotations"] = annotations_change
+    events.broker.publish(row.project_id, event_type, {"task_id": task_id, **data}, delta, versions)
+    events.broker.publish(row.project_id, events.STALE, {}, {})
+    return
+  if annotations_change:
+    delta["totalAnnotations"] = annotations_change
+    count = db.query(func.count(Annotation.annotation_id)).filter(Annotation.task_id == task_id).scalar()
+    # A task is complete once it has max_annotators_per_task annotations
+    if annotations_change > 0 and count == row.max_annotators_per_task:
+      delta.update(completedTasks=1, pendingTasks=-1)
+    elif annotations_change < 0 and count == row.max_annotators_per_task - 1:
+      delta.update(completedTasks=-1, pendingTasks=1)
+  events.broker.publish(row.project_id, event_type, {"task_id": task_id, **data}, delta, versions)
+
+def _publish_project_event(project_id: int, event_type: str, data: Optional[dict] = None, delta: Optional[dict] = None,
+                           versions: Optional[VersionChange] = None):
+  events.broker.publish(project_id, event_type, data, delta, versions)
+
+# Project versioning; callers commit. The single-project bumps return the
+# (version, annotation_version) before and after, read in the write's own
+# transaction, for the event published once it commits.
+def bump_project_version(db: Session, project_id: int) -> Optional[VersionChange]:
+  row = db.execute(update(Project)
+                   .where(Project.project_id == project_id)
+                   .values(version=Project.version + 1, updated_at=datetime.datetime.utcnow())
+                   .returning(Project.version, Project.annotation_version)
+                   .execution_options(synchronize_session=False)).first()
+  return ((row.version - 1, row.annotation_version), tuple(row)) if row else None
+
+def bump_annotation_version(db: Session, task_id: int) -> Optional[VersionChange]:
+  row = db.execute(update(Project)
+                   .where(Project.project_id == select(Task.project_id).where(Task.task_id == task_id).scalar_subquery())
+                   .values(annotation_version=Project.annotation_version + 1)
+                   .returning(Project.version, Project.annotation_version)
+                   .execution_options(synchronize_session=False)).first()
+  return ((row.version, row.annotation_version - 1), tuple(row)) if row else None
+
+def get_project_versions(db: Session, project_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+  """
+  :return: (version, annotation_version) by project ID, for projects that exist.
+  """
+  rows = (db.query(Project.project_id, Project.version, Project.annotation_version)
+          .filter(Project.project_id.in_(project_ids)))
+  return {project_id: (version, annotation_version) for project_id, version, annotation_version in rows}
+
+def bump_project_versions(db: Session, project_ids: List[int]):
+  db.execute(update(Project)
+             .where(Project.project_id.in_(project_ids))
+             .values(version=Project.version + 1, updated_at=datetime.datetime.utcnow())
+             .execution_options(synchronize_session=False))
+
+def bump_task_project_versions(db: Session, task_ids: List[int]) -> Dict[int, VersionChange]:
+  rows = db.execute(update(Project)
+                    .where(Project.project_id.in_(select(Task.project_id).where(Task.task_id.in_(task_ids))))
+                    .values(version=Project.version + 1, updated_at=datetime.datetime.utcnow())
+                    .returning(Project.project_id, Project.version, Project.annotation_version)
+                    .execution_options(synchronize_session=False))
+  return {project_id: ((version - 1, annotation_version), (version, annotation_version))
+          for project_id, version, annotation_version in rows}
+
+# Label vocabulary
+class UnknownLabelError(ValueError):
+  pass
+
+def parse_labels(labels: str) -> List[str]:
+  """
+  Split a comma-separated label list, dropping quotes, blanks and repeats.
+  """
+  names = []
+  for name in labels.split(","):
+    name = name.strip(' "\'')
+    if name and name not in names:
+      names.append(name)
+  return names
+
+def set_project_labels(db: Session, project: Project, labels: str):
+  """
+  Make `labels` the project's vocabulary, in that order. Labels left out are
+  retired rather than deleted so the annotations that use them keep their label.
+  """
+  names = parse_labels(labels)
+  existing = {label.name: label for label in project.label_set}
+  for position, name in enumerate(names):
+    label = existing.pop(name, None)
+    if label is None:
+      project.label_set.append(Label(name=name, position=position, active=True))
+    else:
+      label.position, label.active = position, True
+  for label in existing.values():
+    label.active = False
+
+def get_project_labels(db: Session, project_id: int, include_retired: bool = False) -> List[Label]:
+  query = db.query(Label).filter(Label.project_id == project_id)
+  if not include_retired:
+    query = query.filter(Label.active.is_(True))
+  return query.order_by(Label.position, Label.label_id).all()
+
+def get_label_id(db: Session, task_id: int, name: str) -> int:
+  """
+  ID of the active label `name` in the vocabulary of the task's project.
+
+  :raises UnknownLabelError: The project has no such label.
+  """
+  label_id = db.execute(select(Label.label_id)
+                        .join(Task, Task.project_id == Label.project_id)
+                        .where(Task.task_id == task_id, Label.name == name, Label.active.is_(True))).scalar()
+  if label_id is None:
+    raise UnknownLabelError(f"Label {name!r} is not in the project's label set")
+  return label_id
 
 # Project CRUD operations
 def get_project(db: Session, project_id: int):
@@ -28,24 +169,89 @@ def create_project(db: Session, project: schema.ProjectCreate):
   db_project = Project(
     project_title=project.project_title, 
     project_description=project.project_description,
-    labels=project.labels,
     max_annotators_per_task=project.max_annotators_per_task,
     completion_deadline=project.completion_deadline,
+    assignment_mode=project.assignment_mode,
+    min_annotators_per_task=project.min_annotators_per_task,
+    consensus_threshold=project.consensus_threshold,
     created_at=datetime.datetime.utcnow()
   )
+  set_project_labels(db, db_project, project.labels)
   db.add(db_project)
   db.commit()
   db.refresh(db_project)
   return db_project
 
-def delete_project(db: Session, project_id: int):
+def delete_project(db: Session, project_id: int, chunk_size: int = DELETE_CHUNK_SIZE):
   project = db.query(Project).filter(Project.project_id == project_id).first()
   if project is None:
     return None
-  db.delete(project)
+  # Detach so the returned row stays readable after the set-based delete
+  db.expunge(project)
+  delete_tasks(db, project_id=project_id, chunk_size=chunk_size)
+  db.execute(delete(Project)
+             .where(Project.project_id == project_id)
+             .execution_options(synchronize_session=False))
   db.commit()
+  _publish_project_event(project_id, events.PROJECT_DELETED)
   return project
 
+def clone_project(db: Session, project_id: int, project_clone: schema.ProjectClone):
+  source = get_project(db, project_id)
+  if source is None:
+    return None
+
+  db_project = Project(
+    project_title=project_clone.project_title or f"{source.project_title} (copy)",
+    project_description=(project_clone.project_description
+                         if project_clone.project_description is not None
+                         else source.project_description),
+    max_annotators_per_task=(project_clone.max_annotators_per_task
+                             if project_clone.max_annotators_per_task is not None
+                             else source.max_annotators_per_task),
+    completion_deadline=(project_clone.completion_deadline
+                         if project_clone.completion_deadline is not None
+                         else source.completion_deadline),
+    assignment_mode=project_clone.assignment_mode or source.assignment_mode,
+    min_annotators_per_task=(project_clone.min_annotators_per_task
+                             if project_clone.min_annotators_per_task is not None
+                             else source.min_annotators_per_task),
+    consensus_threshold=(project_clone.consensus_threshold
+                         if project_clone.consensus_threshold is not None
+                         else source.consensus_threshold),
+    created_at=datetime.datetime.utcnow()
+  )
+  set_project_labels(db, db_project, project_clone.labels if project_clone.labels is not None else source.labels)
+  db.add(db_project)
+  db.flush()
+
+  # Copy rows server-side with INSERT ... SELECT; nothing is loaded into Python.
+  # Copies keep their external IDs and image hashes and get fresh surrogate
+  # task IDs; near-duplicate groups are rebuilt by deduplicate_tasks.
+  db.execute(
+    insert(Task).from_select(
+      ["external_id", "project_id", "image", "additional_data", "image_hash", "latitude", "longitude", "geohash"],
+      select(Task.external_id, literal(db_project.project_id), Task.image, Task.additional_data, Task.image_hash,
+             Task.latitude, Task.longitude, Task.geohash)
+      .where(Task.project_id == project_id)
+    )
+  )
+  if project_clone.copy_assignments:
+    source_task = aliased(Task)
+    db.execute(
+      insert(AssignedTask).from_select(
+        ["task_id", "user_id", "assignment_type"],
+        select(Task.task_id, AssignedTask.user_id, AssignedTask.assignment_type)
+        .join(source_task, source_task.task_id == AssignedTask.task_id)
+        .join(Task, (Task.external_id == source_task.external_id)
+                    & (Task.project_id == db_project.project_id))
+        .where(source_task.project_id == project_id)
+      )
+    )
+  db.commit()
+  db.refresh(db_project)
+  return db_project
+
 def update_project(db: Session, project_id: int, project_update: schema.ProjectUpdate):
   db_project = db.query(Project).filter(Project.project_id == project_id).first()
   if db_project:
@@ -54,13 +260,22 @@ def update_project(db: Session, project_id: int, project_update: schema.ProjectU
     if project_update.project_description is not None:
       db_project.project_description = project_update.project_description
     if project_update.labels is not None:
-      db_project.labels = project_update.labels
+      set_project_labels(db, db_project, project_update.labels)
     if project_update.max_annotators_per_task is not None:
       db_project.max_annotators_per_task = project_update.max_annotators_per_task
     if project_update.completion_deadline is not None:
       db_project.completion_deadline = project_update.completion_deadline
+    if project_update.assignment_mode is not None:
+      db_project.assignment_mode = project_update.assignment_mode
+    if project_update.min_annotators_per_task is not None:
+      db_project.min_annotators_per_task = project_update.min_annotators_per_task
+    if project_update.consensus_threshold is not None:
+      db_project.consensus_threshold = project_update.consensus_threshold
+    bump_project_version(db, project_id)
     db.commit()
     db.refresh(db_project)
+    # Changing the annotator counts or the mode redefines which tasks are complete
+    _publish_project_event(project_id, events.STALE)
   return db_project
 
 # User CRUD operations
@@ -174,7 +389,7 @@ def unassign_role(db: Session, role: str, user_id: int):
 def get_users_by_role(db: Session, role: str):
   return db.query(User).join(User.roles).filter(Role.role_name == role).all()
 
-def get_reviewers_by_task(db: Session, task_id: str):
+def get_reviewers_by_task(db: Session, task_id: int):
   return (
     db.query(User)
     .join(user_tasks, User.user_id == user_tasks.c.user_id)
@@ -218,15 +433,22 @@ def delete_role(db: Session, role_id: int) -> Optional[Role]:
   return role
 
 # Task CRUD operations
+def set_task_location(task: Task):
+  # Keeps the indexed coordinate columns in step with additional_data
+  for column, value in geo.location_columns(task.additional_data).items():
+    setattr(task, column, value)
+
 def create_task(db: Session, task: schema.TaskCreate) -> Task:
   new_task = Task(
-      task_id=task.task_id,
+      external_id=task.external_id,
       project_id=task.project_id,
       image=task.image,
       additional_data=json.dumps(task.additional_data)
   )
+  set_task_location(new_task)
   try:
     db.add(new_task)
+    bump_project_version(db, task.project_id)
     db.commit()
     db.refresh(new_task)
   except IntegrityError:
@@ -234,32 +456,153 @@ def create_task(db: Session, task: schema.TaskCreate) -> Task:
   return new_task
 
 def upsert_task(db: Session, project_id: int, task: schema.TaskCreate) -> Task:
-  existing_task = db.query(Task).filter(Task.task_id == task.task_id, Task.project_id == project_id).first()
+  existing_task = get_task_by_external_id(db, project_id, task.external_id)
   if existing_task:
-    update_task(db, project_id, task.task_id, task.image, task.additional_data)
+    update_task(db, existing_task.task_id, task.image, json.dumps(task.additional_data))
     return existing_task
   else:
     new_task = Task(
-        task_id=task.task_id,
+        external_id=task.external_id,
         project_id=project_id,
         image=task.image,
         additional_data=json.dumps(task.additional_data)
     )
+    set_task_location(new_task)
     try:
       db.add(new_task)
+      versions = bump_project_version(db, project_id)
       db.commit()
       db.refresh(new_task)
+      _publish_project_event(project_id, "task.created", {"task_id": new_task.task_id},
+                             {"totalTasks": 1, "pendingTasks": 1}, versions)
     except IntegrityError:
       db.rollback()
     return new_task
 
-def get_task(db: Session, task_id: str) -> Optional[Task]:
+def get_task(db: Session, task_id: int) -> Optional[Task]:
   return db.query(Task).filter(Task.task_id == task_id).first()
 
-def get_tasks_in_project(db: Session, project_id: int) -> List[Task]:
-  return db.query(Task).filter(Task.project_id == project_id).all()
+def get_task_by_external_id(db: Session, project_id: int, external_id: str) -> Optional[Task]:
+  return db.query(Task).filter(Task.project_id == project_id, Task.external_id == external_id).first()
+
+def _with_labels(query):
+  # Batch-load annotations and reviews instead of one lazy load per task
+  return query.options(selectinload(Task.annotations), selectinload(Task.reviews))
+
+def _order_tasks(query, order: schema.TaskOrder = schema.TaskOrder.task_id):
+  # Tasks with a prediction come first, most informative first; the rest by ID
+  if order == schema.TaskOrder.task_id:
+    return query.order_by(Task.task_id)
+  key = Prediction.margin.asc() if order == schema.TaskOrder.margin else Prediction.entropy.desc()
+  return (query.outerjoin(Prediction, Prediction.task_id == Task.task_id)
+          .order_by(key.nulls_last(), Task.task_id))
+
+def get_tasks_in_project(db: Session,
+                         project_id: int,
+                         load_labels: bool = False,
+                         order: Optional[schema.TaskOrder] = None) -> List[Task]:
+  query = db.query(Task).filter(Task.project_id == project_id)
+  if load_labels:
+    query = _with_labels(query)
+  if order is not None:
+    query = _order_tasks(query, order)
+  return query.all()
 
-def assign_task_to_user(db: Session, task_id: str, project_id: int, user: User):
+# Plain dict rows for large list endpoints: no identity map, no pydantic validation
+_TASK_ROW_COLUMNS = (Task.task_id, Task.external_id, Task.project_id, Task.image)
+
+def get_task_rows_in_project(db: Session, project_id: int) -> List[dict]:
+  query = select(*_TASK_ROW_COLUMNS).where(Task.project_id == project_id)
+  return [dict(row) for row in db.execute(query).mappings()]
+
+def get_assigned_task_rows(db: Session, user_id: int, assignment_type: schema.AssignmentType, project_id: int) -> List[dict]:
+  query = (select(*_TASK_ROW_COLUMNS)
+           .join(AssignedTask, AssignedTask.task_id == Task.task_id)
+           .where(AssignedTask.user_id == user_id,
+                  AssignedTask.assignment_type == assignment_type,
+                  Task.project_id == project_id))
+  return [dict(row) for row in db.execute(query).mappings()]
+
+def get_task_label_rows(db: Session,
+                        project_id: int,
+                        user_id: Optional[int] = None,
+                        assignment_type: Optional[schema.AssignmentType] = None,
+                        order: schema.TaskOrder = schema.TaskOrder.task_id) -> List[dict]:
+  """
+  Tasks of a project, or those assigned to a user, with their annotation and
+  review (user_id, label) pairs; three queries regardless of the number of tasks.
+
+  :param order: Task ID order, or most informative predictions first.
+  """
+  task_ids = select(Task.task_id).where(Task.project_id == project_id)
+  if user_id is not None:
+    task_ids = (task_ids.join(AssignedTask, AssignedTask.task_id == Task.task_id)
+                .where(AssignedTask.user_id == user_id, AssignedTask.assignment_type == assignment_type))
+
+  labels = {}
+  for model in (Annotation, Review):
+    labels[model] = defaultdict(list)
+    query = (select(model.task_id, model.user_id, Label.name)
+             .join(Label, Label.label_id == model.label_id)
+             .where(model.task_id.in_(task_ids)))
+    for task_id, label_user_id, label in db.execute(query):
+      labels[model][task_id].append((label_user_id, label))
+
+  tasks = db.execute(
+    _order_tasks(select(Task.task_id, Task.external_id, Task.image).where(Task.task_id.in_(task_ids)), order)
+  ).mappings()
+  return [{**task,
+           "annotations": labels[Annotation].get(task["task_id"], []),
+           "reviews": labels[Review].get(task["task_id"], [])}
+          for task in tasks]
+
+# Task locations
+def _within_bbox(query, west: float, south: float, east: float, north: float):
+  # The (project_id, latitude) index narrows the rows; longitude is filtered on them
+  query = query.where(Task.latitude.between(south, north))
+  if west <= east:
+    return query.where(Task.longitude.between(west, east))
+  # The box crosses the antimeridian
+  return query.where((Task.longitude >= west) | (Task.longitude <= east))
+
+def get_task_locations(db: Session,
+                       project_id: int,
+                       west: float = -180,
+                       south: float = -90,
+                       east: float = 180,
+                       north: float = 90,
+                       limit: Optional[int] = None) -> List[dict]:
+  """
+  Tasks of a project whose coordinates fall in a bounding box, by task ID.
+  """
+  query = _within_bbox(select(Task.task_id, Task.external_id, Task.image, Task.latitude, Task.longitude)
+                       .where(Task.project_id == project_id), west, south, east, north).order_by(Task.task_id)
+  if limit is not None:
+    query = query.limit(limit)
+  return [dict(row) for row in db.execute(query).mappings()]
+
+def get_task_clusters(db: Session,
+                      project_id: int,
+                      zoom: int,
+                      west: float = -180,
+                      south: float = -90,
+                      east: float = 180,
+                      north: float = 90) -> List[dict]:
+  """
+  Tasks in a bounding box grouped by geohash cells sized for a map zoom level:
+  number of tasks and mean position per cell, and the task ID of single-task cells.
+  """
+  cell = func.substr(Task.geohash, 1, geo.zoom_precision(zoom)).label("geohash")
+  query = _within_bbox(select(cell,
+                              func.count(Task.task_id).label("count"),
+                              func.avg(Task.latitude).label("latitude"),
+                              func.avg(Task.longitude).label("longitude"),
+                              func.min(Task.task_id).label("task_id"))
+                       .where(Task.project_id == project_id), west, south, east, north).group_by(cell)
+  return [{**row, "task_id": row["task_id"] if row["count"] == 1 else None}
+          for row in db.execute(query).mappings()]
+
+def assign_task_to_user(db: Session, task_id: int, project_id: int, user: User):
   task = get_task(db, task_id, project_id)
   if task:
     task.assigned_users.append(user)
@@ -267,27 +610,38 @@ def assign_task_to_user(db: Session, task_id: str, project_id: int, user: User):
     db.refresh(task)
   return task
 
-def assign_task(db: Session, task_id: str, user_id: int, assignment_type: schema.AssignmentType):
+def assign_task(db: Session, task_id: int, user_id: int, assignment_type: schema.AssignmentType, publish: bool = True):
   existing_assignment = db.query(AssignedTask).filter_by(task_id=task_id, user_id=user_id, assignment_type=assignment_type).first()
   if existing_assignment:
     return existing_assignment
 
   assigned_task = AssignedTask(task_id=task_id, user_id=user_id, assignment_type=assignment_type)
   db.add(assigned_task)
+  versions = {}
+  if publish:
+    versions = bump_task_project_versions(db, [task_id])
   db.commit()
   db.refresh(assigned_task)
+  if publish:
+    _publish_task_event(db, task_id, "assignment.changed",
+                        {"user_id": user_id, "assignment_type": assignment_type, "assigned": True},
+                        versions=next(iter(versions.values()), None))
   return assigned_task
 
-def unassign_task(db: Session, task_id: str, assignment_type: schema.AssignmentType):
+def unassign_task(db: Session, task_id: int, assignment_type: schema.AssignmentType):
   existing_assignment = db.query(AssignedTask).filter_by(task_id=task_id,
                         assignment_type=assignment_type).first()
   if not existing_assignment:
     return
   db.delete(existing_assignment)
+  versions = bump_task_project_versions(db, [task_id])
   db.commit()
+  _publish_task_event(db, task_id, "assignment.changed",
+                      {"user_id": existing_assignment.user_id, "assignment_type": assignment_type, "assigned": False},
+                      versions=next(iter(versions.values()), None))
   return
 
-def get_users_assigned_to_task(db: Session, task_id: str, project_id: int):
+def get_users_assigned_to_task(db: Session, task_id: int, project_id: int):
   assigned_users = (
       db.query(AssignedTask)
       .join(Task, Task.task_id == AssignedTask.task_id)
@@ -296,7 +650,16 @@ def get_users_assigned_to_task(db: Session, task_id: str, project_id: int):
   )
   return assigned_users
 
-def get_assigned_users_for_task(db: Session, task_id: str):
+def get_users_for_task_assignments(db: Session, task_id: int, project_id: int) -> List[User]:
+  return (
+      db.query(User)
+      .join(AssignedTask, AssignedTask.user_id == User.user_id)
+      .join(Task, Task.task_id == AssignedTask.task_id)
+      .filter(Task.project_id == project_id, Task.task_id == task_id)
+      .all()
+  )
+
+def get_assigned_users_for_task(db: Session, task_id: int):
   annotators_subquery = (
       db.query(AssignedTask.user_id)
       .filter(
@@ -326,65 +689,282 @@ def get_assigned_users_for_task(db: Session, task_id: str):
   )
   return (annotators, reviewers)
 
-def auto_assign_tasks_to_users(db: Session, project_id: int):
-  tasks = get_tasks_in_project(db, project_id)
+def auto_assign_tasks_to_users(db: Session,
+                               project_id: int,
+                               order: schema.TaskOrder = schema.TaskOrder.task_id,
+                               limit: Optional[int] = None,
+                               strategy: schema.AssignmentStrategy = schema.AssignmentStrategy.round_robin):
+  """
+  Spread tasks over all annotators. Near-duplicates are left out; they take
+  the labels of their group's first task.
+
+  :param order: Order in which tasks are dealt out.
+  :param limit: Assign only this many tasks that have no annotator yet, in `order`.
+  :param strategy: round_robin, or locality to give each annotator a block of nearby tasks.
+  """
+  query = db.query(Task).filter(Task.project_id == project_id, Task.duplicate_of.is_(None))
+  if limit is None:
+    tasks = _order_tasks(query, order).all()
+  else:
+    assigned = select(AssignedTask.task_id).where(AssignedTask.assignment_type == schema.AssignmentType.annotation)
+    tasks = _order_tasks(query.filter(Task.task_id.not_in(assigned)), order).limit(limit).all()
   annotators = get_users_by_role(db, schema.UserRole.annotator)
-  max_annotators_per_task = (
-      db.query(Project)
-      .filter(Project.project_id == project_id)
-      .first()
-      .max_annotators_per_task
-  )
+  project = db.query(Project).filter(Project.project_id == project_id).first()
+  annotators_per_task = project.max_annotators_per_task
+  if project.assignment_mode == schema.AssignmentMode.adaptive:
+    # Contested tasks get more annotators as their annotations come in
+    annotators_per_task = min(project.min_annotators_per_task, annotators_per_task)
   if len(tasks) > 0 and len(annotators) > 0:
-    tasks_to_annotators_map = round_robin_algorithm(tasks, annotators, max_annotators_per_example=max_annotators_per_task)
+    algorithm = locality_algorithm if strategy == schema.AssignmentStrategy.locality else round_robin_algorithm
+    tasks_to_annotators_map = algorithm(tasks, annotators, max_annotators_per_example=annotators_per_task)
     for task_id, annotator_ids in tasks_to_annotators_map.items():
       for annotator_id in annotator_ids:
-        assign_task(db, task_id, annotator_id, schema.AssignmentType.annotation)
+        assign_task(db, task_id, annotator_id, schema.AssignmentType.annotation, publish=False)
+    versions = bump_project_version(db, project_id)
+    db.commit()
+    _publish_project_event(project_id, "assignment.changed", {"auto_assigned_tasks": len(tasks_to_annotators_map)},
+                           versions=versions)
     return tasks
   return []
 
-def update_task(db: Session, task_id: str, image: Optional[str] = None, additional_data: Optional[str] = None) -> Optional[Task]:
+def update_task(db: Session, task_id: int, image: Optional[str] = None, additional_data: Optional[str] = None) -> Optional[Task]:
   task = get_task(db, task_id)
   if task is None:
       return None
   if image:
+      if image != task.image:
+        task.image_hash = None
       task.image = image
   if additional_data:
       task.additional_data = additional_data
+      set_task_location(task)
+  bump_project_version(db, task.project_id)
   db.commit()
   db.refresh(task)
   return task
 
-def delete_task(db: Session, task_id: str) -> Optional[Task]:
+def delete_task(db: Session, task_id: int) -> Optional[Task]:
   task = get_task(db, task_id)
   if task is None:
     return None
-  db.delete(task)
-  db.commit()
+  db.expunge(task)
+  delete_tasks(db, task_ids=[task_id])
+  _publish_project_event(task.project_id, events.STALE)
   return task
 
+def _delete_task_rows(db: Session, task_ids: List[int]):
+  # Child rows are removed explicitly so databases created before the
+  # ON DELETE CASCADE constraints (and SQLite without FK enforcement) stay consistent
+  for table in (Annotation.__table__, Review.__table__, AssignedTask.__table__, user_tasks,
+                PredictionScore.__table__, Prediction.__table__):
+    db.execute(delete(table).where(table.c.task_id.in_(task_ids)))
+  # Duplicates of removed tasks become tasks of their own
+  db.execute(update(Task.__table__)
+             .where(Task.__table__.c.duplicate_of.in_(task_ids))
+             .values(duplicate_of=None))
+  bump_task_project_versions(db, task_ids)
+  db.execute(delete(Task.__table__).where(Task.__table__.c.task_id.in_(task_ids)))
+
+def delete_tasks(db: Session,
+                 project_id: Optional[int] = None,
+                 task_ids: Optional[List[int]] = None,
+                 chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+  """
+  Delete tasks and everything referencing them in bounded batches.
+
+  :param project_id: Restrict deletion to tasks of this project.
+  :param task_ids: Restrict deletion to these task IDs.
+  :param chunk_size: Number of tasks deleted per transaction.
+  :return: Number of tasks deleted.
+  """
+  if project_id is None and task_ids is None:
+    raise ValueError("Either project_id or task_ids must be provided")
+
+  deleted = 0
+  if task_ids is not None:
+    task_ids = list(dict.fromkeys(task_ids))
+    for start in range(0, len(task_ids), chunk_size):
+      query = select(Task.task_id).where(Task.task_id.in_(task_ids[start:start + chunk_size]))
+      if project_id is not None:
+        query = query.where(Task.project_id == project_id)
+      chunk = db.execute(query).scalars().all()
+      if chunk:
+        _delete_task_rows(db, chunk)
+        db.commit()
+        deleted += len(chunk)
+  else:
+    while True:
+      chunk = db.execute(
+        select(Task.task_id).where(Task.project_id == project_id).limit(chunk_size)
+      ).scalars().all()
+      if not chunk:
+        break
+      _delete_task_rows(db, chunk)
+      db.commit()
+      deleted += len(chunk)
+
+  if project_id is not None and deleted:
+    _publish_project_event(project_id, events.STALE)
+  return deleted
+
+# Prediction operations
+def import_predictions(db: Session, project_id: int, predictions: Dict[str, Dict[str, float]]) -> dict:
+  """
+  Store model scores for a project's tasks, replacing earlier predictions of the same tasks.
+
+  :param predictions: Scores by label name, by task external ID, as parsed by parse_prediction_csv.
+  :return: Number of imported predictions and the external IDs without a task.
+  """
+  label_ids = {label.name: label.label_id for label in get_project_labels(db, project_id)}
+  task_ids = dict(db.execute(select(Task.external_id, Task.task_id).where(Task.project_id == project_id)).all())
+  created_at = datetime.datetime.utcnow()
+
+  rows, score_rows, unknown_examples = [], [], []
+  for external_id, scores in predictions.items():
+    task_id = task_ids.get(external_id)
+    if task_id is None:
+      unknown_examples.append(external_id)
+      continue
+    scores = {label_ids[name]: score for name, score in scores.items()}
+    label_id, confidence, margin, entropy = summarize_scores(scores)
+    rows.append({"task_id": task_id, "project_id": project_id, "label_id": label_id, "confidence": confidence,
+                 "margin": margin, "entropy": entropy, "created_at": created_at})
+    score_rows.extend({"task_id": task_id, "label_id": label_id, "score": score}
+                      for label_id, score in scores.items())
+
+  for start in range(0, len(rows), BULK_WRITE_BATCH_SIZE):
+    chunk = rows[start:start + BULK_WRITE_BATCH_SIZE]
+    chunk_task_ids = [row["task_id"] for row in chunk]
+    db.execute(delete(PredictionScore.__table__).where(PredictionScore.__table__.c.task_id.in_(chunk_task_ids)))
+    db.execute(delete(Prediction.__table__).where(Prediction.__table__.c.task_id.in_(chunk_task_ids)))
+    db.execute(insert(Prediction.__table__), chunk)
+  for start in range(0, len(score_rows), BULK_WRITE_BATCH_SIZE):
+    db.execute(insert(PredictionScore.__table__), score_rows[start:start + BULK_WRITE_BATCH_SIZE])
+  if rows:
+    bump_project_version(db, project_id)
+  db.commit()
+  return {"imported": len(rows), "unknown_examples": unknown_examples}
+
+def get_prediction(db: Session, task_id: int) -> Optional[Prediction]:
+  return (db.query(Prediction)
+          .options(selectinload(Prediction.scores))
+          .filter(Prediction.task_id == task_id)
+          .first())
+
+# Near-duplicate detection
+def deduplicate_tasks(db: Session,
+                      project_id: int,
+                      max_distance: int = dedup.DEDUP_MAX_DISTANCE,
+                      processes: Optional[int] = dedup.DEDUP_PROCESSES) -> dict:
+  """
+  Hash the images of the project's tasks that have no hash yet, then regroup
+  all of them: a task whose image is within `max_distance` bits of an earlier
+  group's first task becomes its duplicate.
+
+  :return: Numbers of newly hashed and unreadable images, duplicates and groups.
+  """
+  missing = db.execute(select(Task.task_id, Task.image)
+                       .where(Task.project_id == project_id, Task.image_hash.is_(None))
+                       .order_by(Task.task_id)).all()
+  # Hold no transaction open while images download
+  db.commit()
+  hashes = dedup.hash_images([image for _, image in missing], processes=processes)
+  hashed = [{"task_id": task_id, "image_hash": image_hash}
+            for (task_id, _), image_hash in zip(missing, hashes) if image_hash is not None]
+  for start in range(0, len(hashed), BULK_WRITE_BATCH_SIZE):
+    db.execute(update(Task), hashed[start:start + BULK_WRITE_BATCH_SIZE])
+
+  project_hashes = dict(db.execute(select(Task.task_id, Task.image_hash)
+                                   .where(Task.project_id == project_id, Task.image_hash.is_not(None))).all())
+  duplicates = dedup.group_near_duplicates(project_hashes, max_distance)
+  db.execute(update(Task.__table__)
+             .where(Task.__table__.c.project_id == project_id, Task.__table__.c.duplicate_of.is_not(None))
+             .values(duplicate_of=None))
+  rows = [{"task_id": task_id, "duplicate_of": representative} for task_id, representative in duplicates.items()]
+  for start in range(0, len(rows), BULK_WRITE_BATCH_SIZE):
+    db.execute(update(Task), rows[start:start + BULK_WRITE_BATCH_SIZE])
+  bump_project_version(db, project_id)
+  db.commit()
+  _publish_project_event(project_id, events.STALE)
+  return {"hashed": len(hashed),
+          "unreadable": len(missing) - len(hashed),
+          "duplicates": len(duplicates),
+          "groups": len(set(duplicates.values()))}
+
+def get_duplicates(db: Session, task_ids: List[int]) -> Dict[int, List[Task]]:
+  """
+  :return: Near-duplicate tasks by the ID of their group's first task.
+  """
+  duplicates = defaultdict(list)
+  for start in range(0, len(task_ids), DELETE_CHUNK_SIZE):
+    for task in (db.query(Task)
+                 .filter(Task.duplicate_of.in_(task_ids[start:start + DELETE_CHUNK_SIZE]))
+                 .order_by(Task.task_id)):
+      duplicates[task.duplicate_of].append(task)
+  return duplicates
+
 # Annotation CRUD operations
-def create_annotation(db: Session, label: str, task_id: str, annotator_id: int) -> Annotation:
-  annotation = (db.query(Annotation)
-                .filter(Annotation.task_id == task_id, 
-                Annotation.user_id == annotator_id).first()
-  )
+def create_annotation(db: Session, label: str, task_id: int, annotator_id: int) -> Annotation:
   annotation = Annotation(
-      label=label,
+      label_id=get_label_id(db, task_id, label),
       task_id=task_id,
       user_id=annotator_id
   )
   db.add(annotation)
+  versions = bump_annotation_version(db, task_id)
   db.commit()
   db.refresh(annotation)
+  _publish_task_event(db, task_id, "annotation.created",
+                      {"annotation_id": annotation.annotation_id, "user_id": annotator_id, "label": label},
+                      annotations_change=1, versions=versions)
+  escalate_contested_task(db, task_id)
   return annotation
 
-def get_default_label(db: Session, task_id: str, user_id: int):
+def escalate_contested_task(db: Session, task_id: int) -> Optional[int]:
+  """
+  In adaptive projects, assign one more annotator to a task whose annotators
+  have all voted without reaching consensus, up to max_annotators_per_task.
+
+  :return: ID of the annotator added, if any.
+  """
+  project = (db.query(Project)
+             .join(Task, Task.project_id == Project.project_id)
+             .filter(Task.task_id == task_id)
+             .first())
+  if project is None or project.assignment_mode != schema.AssignmentMode.adaptive:
+    return None
+
+  votes = db.execute(select(Annotation.user_id, Annotation.label_id).where(Annotation.task_id == task_id)).all()
+  assigned = set(db.execute(select(AssignedTask.user_id)
+                            .where(AssignedTask.task_id == task_id,
+                                   AssignedTask.assignment_type == schema.AssignmentType.annotation)).scalars())
+  if not needs_more_annotators([label_id for _, label_id in votes], len(assigned),
+                               project.min_annotators_per_task, project.max_annotators_per_task,
+                               project.consensus_threshold):
+    return None
+
+  # Open assignments per annotator in the project: assigned tasks not annotated yet
+  workload = dict(db.execute(
+    select(AssignedTask.user_id, func.count())
+    .join(Task, Task.task_id == AssignedTask.task_id)
+    .outerjoin(Annotation, (Annotation.task_id == AssignedTask.task_id) & (Annotation.user_id == AssignedTask.user_id))
+    .where(Task.project_id == project.project_id,
+           AssignedTask.assignment_type == schema.AssignmentType.annotation,
+           Annotation.annotation_id.is_(None))
+    .group_by(AssignedTask.user_id)
+  ).all())
+  annotator_ids = [user.user_id for user in get_users_by_role(db, schema.UserRole.annotator)]
+  annotator_id = pick_extra_annotator(annotator_ids, assigned | {user_id for user_id, _ in votes}, workload)
+  if annotator_id is not None:
+    assign_task(db, task_id, annotator_id, schema.AssignmentType.annotation)
+  return annotator_id
+
+def get_default_label(db: Session, task_id: int, user_id: int):
   return (db.query(Annotation)
           .filter(Annotation.task_id == task_id, Annotation.user_id == user_id)
           .first())
 
-def get_default_review(db: Session, task_id: str, user_id: int):
+def get_default_review(db: Session, task_id: int, user_id: int):
   return (db.query(Review)
           .filter(Review.task_id == task_id, Review.user_id == user_id)
           .first())
@@ -397,7 +977,35 @@ def get_annotations(db: Session, project_id: int) -> List[Annotation]:
   return query.all()
 
 
-def get_annotation_by_task_annotator(db: Session, task_id: Optional[str] = None, annotator_id: Optional[int] = None) -> List[Annotation]:
+def get_annotation_rows(db: Session, project_id: int) -> List[dict]:
+  query = (select(Annotation.annotation_id, Label.name.label("label"), Annotation.label_id,
+                  Annotation.task_id, Annotation.user_id)
+           .join(Label, Label.label_id == Annotation.label_id)
+           .join(Task, Task.task_id == Annotation.task_id)
+           .where(Task.project_id == project_id))
+  return [dict(row) for row in db.execute(query).mappings()]
+
+def get_labeled_status(db: Session,
+                       project_id: int,
+                       user_id: int,
+                       assignment_type: schema.AssignmentType,
+                       assigned_only: bool = False) -> List[tuple]:
+  """
+  (task_id, labeled) for the project's tasks ordered by task_id, where labeled
+  means the user annotated (or reviewed) the task; one left join on the
+  (task_id, user_id) index.
+  """
+  label_model = Review if assignment_type == schema.AssignmentType.review else Annotation
+  query = (select(Task.task_id, label_model.task_id.isnot(None))
+           .outerjoin(label_model, (label_model.task_id == Task.task_id) & (label_model.user_id == user_id))
+           .where(Task.project_id == project_id))
+  if assigned_only:
+    query = (query.join(AssignedTask, AssignedTask.task_id == Task.task_id)
+             .where(AssignedTask.user_id == user_id, AssignedTask.assignment_type == assignment_type))
+  # DISTINCT collapses duplicate labels by the same user
+  return db.execute(query.distinct().order_by(Task.task_id)).all()
+
+def get_annotation_by_task_annotator(db: Session, task_id: Optional[int] = None, annotator_id: Optional[int] = None) -> List[Annotation]:
   query = db.query(Annotation)
   if task_id:
     query = query.filter(Annotation.task_id == task_id)
@@ -405,7 +1013,7 @@ def get_annotation_by_task_annotator(db: Session, task_id: Optional[str] = None,
     query = query.filter(Annotation.user_id == annotator_id)
   return query.first()
 
-def get_review_by_task_reviewer(db: Session, task_id: Optional[str] = None, reviewer_id: Optional[int] = None) -> List[Review]:
+def get_review_by_task_reviewer(db: Session, task_id: Optional[int] = None, reviewer_id: Optional[int] = None) -> List[Review]:
   query = db.query(Review)
   if task_id:
     query = query.filter(Review.task_id == task_id)
@@ -413,24 +1021,27 @@ def get_review_by_task_reviewer(db: Session, task_id: Optional[str] = None, revi
     query = query.filter(Review.user_id == reviewer_id)
   return query.first()
 
+def get_annotated_tasks_with_labels(db: Session, project_id: int) -> List[Task]:
+  query = db.query(Task).filter(Task.project_id == project_id, Task.annotations.any()).order_by(Task.task_id)
+  return _with_labels(query).all()
+
 def get_tasks_with_annotations(db: Session, project_id: int):
   tasks = (
     db.query(Task)
-    .join(Project)
-    .filter(Task.project_id == project_id)
+    .filter(Task.project_id == project_id, Task.annotations.any())
+    .options(selectinload(Task.annotations))
     .all()
   )
   
   tasks_with_annotations = []
   for task in tasks:
-    annotations = db.query(Annotation).filter(Annotation.task_id == task.task_id).all()
-    if annotations:
-      task_info = {
-        "task_id": task.task_id,
-        "image": task.image,
-        "labels": [annotation.label for annotation in annotations]
-      }
-      tasks_with_annotations.append(task_info)
+    task_info = {
+      "task_id": task.task_id,
+      "external_id": task.external_id,
+      "image": task.image,
+      "labels": [annotation.label for annotation in task.annotations]
+    }
+    tasks_with_annotations.append(task_info)
   
   return tasks_with_annotations
 
@@ -439,9 +1050,12 @@ def update_annotation(db: Session, annotation_id: int, label: Optional[str] = No
   if annotation is None:
     return None
   if label:
-    annotation.label = label
+    annotation.label_id = get_label_id(db, annotation.task_id, label)
   db.commit()
   db.refresh(annotation)
+  _publish_task_event(db, annotation.task_id, "annotation.updated",
+                      {"annotation_id": annotation_id, "user_id": annotation.user_id, "label": annotation.label})
+  escalate_contested_task(db, annotation.task_id)
   return annotation
 
 def delete_annotation(db: Session, annotation_id: int) -> Optional[Annotation]:
@@ -449,33 +1063,42 @@ def delete_annotation(db: Session, annotation_id: int) -> Optional[Annotation]:
   if annotation is None:
       return None
   db.delete(annotation)
+  versions = bump_annotation_version(db, annotation.task_id)
   db.commit()
+  _publish_task_event(db, annotation.task_id, "annotation.deleted",
+                      {"annotation_id": annotation_id, "user_id": annotation.user_id},
+                      annotations_change=-1, versions=versions)
   return annotation
 
 # Review CRUD operations
-def create_review(db: Session, label: str, task_id: str, reviewer_id: int) -> Review:
+def create_review(db: Session, label: str, task_id: int, reviewer_id: int) -> Review:
   review = (db.query(Review)
             .filter(Review.task_id == task_id, 
             Review.user_id == reviewer_id).first()
   )
   
+  label_id = get_label_id(db, task_id, label)
+  versions = None
   if review:
-    review.label = label
+    review.label_id = label_id
   else:
     review = Review(
-        label=label,
+        label_id=label_id,
         task_id=task_id,
         user_id=reviewer_id
     )
     db.add(review)
+    versions = bump_annotation_version(db, task_id)
   db.commit()
   db.refresh(review)
+  _publish_task_event(db, task_id, "review.submitted",
+                      {"review_id": review.review_id, "user_id": reviewer_id, "label": label}, versions=versions)
   return review
 
 def get_review(db: Session, review_id: int) -> Optional[Review]:
   return db.query(Review).filter(Review.review_id == review_id).first()
 
-def get_reviews(db: Session, task_id: Optional[str] = None, reviewer_id: Optional[int] = None) -> List[Review]:
+def get_reviews(db: Session, task_id: Optional[int] = None, reviewer_id: Optional[int] = None) -> List[Review]:
   query = db.query(Review)
   if task_id:
     query = query.filter(Review.task_id == task_id)
@@ -488,27 +1111,22 @@ def update_review(db: Session, review_id: int, label: Optional[str] = None) -> O
   if review is None:
     return None
   if label:
-    review.label = label
+    review.label_id = get_label_id(db, review.task_id, label)
   db.commit()
   db.refresh(review)
+  _publish_task_event(db, review.task_id, "review.submitted",
+                      {"review_id": review_id, "user_id": review.user_id, "label": review.label})
   return review
 
-def update_annotation(db: Session, annotation_id: int, label: Optional[str] = None) -> Optional[Annotation]:
-  annotation = get_annotation(db, annotation_id)
-  if annotation is None:
-    return None
-  if label:
-    annotation.label = label
-  db.commit()
-  db.refresh(annotation)
-  return annotation
-
 def delete_review(db: Session, review_id: int) -> Optional[Review]:
   review = get_review(db, review_id)
   if review is None:
     return None
   db.delete(review)
+  versions = bump_annotation_version(db, review.task_id)
   db.commit()
+  _publish_task_event(db, review.task_id, "review.deleted", {"review_id": review_id, "user_id": review.user_id},
+                      versions=versions)
   return review
 
 # Assignment and Task fetch
@@ -518,16 +1136,75 @@ def get_assigned_tasks_by_type(db: Session, user_id: int, assignment_type: schem
       AssignedTask.assignment_type == assignment_type
   ).all()
 
-def get_assigned_tasks_by_type_and_project(db: Session, user_id: int, assignment_type: schema.AssignmentType, project_id: int):
-  return db.query(Task).join(AssignedTask).filter(
+def get_assigned_tasks_by_type_and_project(db: Session, user_id: int, assignment_type: schema.AssignmentType, project_id: int,
+                                           load_labels: bool = False, order: Optional[schema.TaskOrder] = None):
+  query = db.query(Task).join(AssignedTask).filter(
       AssignedTask.user_id == user_id,
       AssignedTask.assignment_type == assignment_type,
       Task.project_id == project_id
-  ).all()
+  )
+  if load_labels:
+    query = _with_labels(query)
+  if order is not None:
+    query = _order_tasks(query, order)
+  return query.all()
 
 def get_assigned_tasks(db: Session, user_id: int) -> List[AssignedTask]:
   return db.query(AssignedTask).filter(AssignedTask.user_id == user_id).all()
 
+def _count_adaptive_completed_tasks(db: Session, project: Project) -> int:
+  """
+  Tasks that reached consensus with at least min_annotators_per_task votes, or
+  that hit max_annotators_per_task; grouped on integer label IDs in the database.
+  """
+  votes = (select(Annotation.task_id, func.count().label("votes"))
+           .join(Task, Task.task_id == Annotation.task_id)
+           .where(Task.project_id == project.project_id)
+           .group_by(Annotation.task_id, Annotation.label_id)
+           .subquery())
+  per_task = (select(func.sum(votes.c.votes).label("total"), func.max(votes.c.votes).label("top"))
+              .group_by(votes.c.task_id)
+              .subquery())
+  min_votes = min(project.min_annotators_per_task, project.max_annotators_per_task)
+  return db.execute(
+    select(func.count())
+    .select_from(per_task)
+    .where(((per_task.c.total >= min_votes) & (per_task.c.top >= project.consensus_threshold * per_task.c.total))
+           | (per_task.c.total >= project.max_annotators_per_task))
+  ).scalar()
+
+def get_project_statistics(db: Session, project_id: int) -> Optional[schema.Stats]:
+  project = get_project(db, project_id)
+  if project is None:
+    return None
+  # Near-duplicates are labeled through their group's first task
+  total_tasks = (db.query(func.count(Task.task_id))
+                 .filter(Task.project_id == project_id, Task.duplicate_of.is_(None))
+                 .scalar())
+  if project.assignment_mode == schema.AssignmentMode.adaptive:
+    completed_tasks = _count_adaptive_completed_tasks(db, project)
+  else:
+    annotation_counts = (
+      db.query(Annotation.task_id)
+      .join(Task, Task.task_id == Annotation.task_id)
+      .filter(Task.project_id == project_id)
+      .group_by(Annotation.task_id)
+      .having(func.count(Annotation.annotation_id) >= project.max_annotators_per_task)
+      .subquery()
+    )
+    completed_tasks = db.query(func.count()).select_from(annotation_counts).scalar()
+  total_annotations = (db.query(func.count(Annotation.annotation_id))
+                       .join(Task, Task.task_id == Annotation.task_id)
+                       .filter(Task.project_id == project_id)
+                       .scalar())
+  return schema.Stats(
+    totalTasks=total_tasks,
+    completedTasks=completed_tasks,
+    pendingTasks=total_tasks - completed_tasks,
+    totalAnnotations=total_annotations,
+    accuracyRate=0.00
+  )
+
 def get_completed_annotations(db: Session, project_id: int):
   max_annotators_per_task = get_project(db, project_id).max_annotators_per_task
   return db.query(Task)\
@@ -535,4 +1212,110 @@ def get_completed_annotations(db: Session, project_id: int):
           .filter(Task.project_id == project_id)\
           .group_by(Task.task_id)\
           .having(func.count('*') >= max_annotators_per_task)\
-          .all()
\ No newline at end of file
+          .all()
+# Deadline scheduling
+# Monotonic time of this worker's last priority refresh
+_priorities_refreshed_at: Optional[float] = None
+
+def get_project_schedules(db: Session,
+                          project_id: Optional[int] = None,
+                          now: Optional[datetime.datetime] = None) -> List[dict]:
+  """
+  Remaining annotations, required and observed annotation rates, projected
+  completion and priority of every project, or of one; three queries
+  regardless of the number of tasks.
+  """
+  now = now or datetime.datetime.utcnow()
+  projects = db.query(Project)
+  per_task = (select(Task.project_id, func.count(Annotation.annotation_id).label("annotations"))
+              .outerjoin(Annotation, Annotation.task_id == Task.task_id)
+              .where(Task.duplicate_of.is_(None))
+              .group_by(Task.project_id, Task.task_id))
+  recent = (select(Task.project_id, func.count(Annotation.annotation_id))
+            .select_from(Annotation)
+            .join(Task, Task.task_id == Annotation.task_id)
+            .where(Annotation.created_at >= now - datetime.timedelta(hours=scheduling.SCHEDULE_WINDOW_HOURS))
+            .group_by(Task.project_id))
+  if project_id is not None:
+    projects = projects.filter(Project.project_id == project_id)
+    per_task = per_task.where(Task.project_id == project_id)
+    recent = recent.where(Task.project_id == project_id)
+
+  # Number of tasks by annotation count, per project
+  per_task = per_task.subquery()
+  histograms = defaultdict(dict)
+  for row_project_id, annotations, tasks in db.execute(
+      select(per_task.c.project_id, per_task.c.annotations, func.count())
+      .group_by(per_task.c.project_id, per_task.c.annotations)):
+    histograms[row_project_id][annotations] = tasks
+  recent_annotations = dict(db.execute(recent).all())
+
+  schedules = []
+  for project in projects.order_by(Project.project_id).all():
+    histogram = histograms.get(project.project_id, {})
+    target = scheduling.annotations_target(project.max_annotators_per_task,
+                                           project.assignment_mode == schema.AssignmentMode.adaptive,
+                                           project.min_annotators_per_task)
+    remaining = scheduling.remaining_annotations(histogram, target)
+    required = scheduling.required_rate(remaining, project.completion_deadline, now)
+    observed = recent_annotations.get(project.project_id, 0) / scheduling.SCHEDULE_WINDOW_HOURS
+    projected = scheduling.projected_completion(remaining, observed, now)
+    schedules.append({
+      "project_id": project.project_id,
+      "project_title": project.project_title,
+      "completion_deadline": project.completion_deadline,
+      "total_tasks": sum(histogram.values()),
+      "remaining_annotations": remaining,
+      "required_rate": required,
+      "observed_rate": observed,
+      "projected_completion": projected,
+      "at_risk": (project.completion_deadline is not None and remaining > 0
+                  and (projected is None or projected > project.completion_deadline)),
+      "priority": scheduling.priority(required, observed),
+    })
+  return schedules
+
+def refresh_project_priorities(db: Session, max_age: float = 0.0) -> Optional[List[dict]]:
+  """
+  Store every project's scheduling priority for ordering annotators' queues.
+  Projects whose priority changed get a new version, since project responses
+  include it.
+
+  :param max_age: Skip the refresh when this worker ran one less than max_age seconds ago.
+  :return: The schedules, or None when the refresh was skipped.
+  """
+  global _priorities_refreshed_at
+  if _priorities_refreshed_at is not None and time.monotonic() - _priorities_refreshed_at < max_age:
+    return None
+  schedules = get_project_schedules(db)
+  stored = dict(db.query(Project.project_id, Project.priority))
+  changed = [{"project_id": schedule["project_id"], "priority": schedule["priority"]}
+             for schedule in schedules if stored.get(schedule["project_id"]) != schedule["priority"]]
+  if changed:
+    db.execute(update(Project), changed)
+    bump_project_versions(db, [row["project_id"] for row in changed])
+    db.commit()
+  _priorities_refreshed_at = time.monotonic()
+  return schedules
+
+def get_user_queue(db: Session,
+                   user_id: int,
+                   assignment_type: schema.AssignmentType = schema.AssignmentType.annotation,
+                   limit: Optional[int] = None) -> List[dict]:
+  """
+  Tasks assigned to a user that they have not labeled yet, across all
+  projects: highest priority first, then earliest deadline, then task ID.
+  """
+  model = Annotation if assignment_type == schema.AssignmentType.annotation else Review
+  labeled = exists().where(model.task_id == Task.task_id, model.user_id == user_id)
+  query = (select(Task.task_id, Task.external_id, Task.project_id, Task.image,
+                  Project.project_title, Project.priority, Project.completion_deadline)
+           .join(AssignedTask, AssignedTask.task_id == Task.task_id)
+           .join(Project, Project.project_id == Task.project_id)
+           .where(AssignedTask.user_id == user_id,
+                  AssignedTask.assignment_type == assignment_type,
+                  ~labeled)
+           .order_by(Project.priority.desc(), Project.completion_deadline.asc().nulls_last(), Task.task_id))
+  if limit is not None:
+    query = query.limit(limit)
+  return [dict(row) for row in db.execute(query).mappings()]
@@ -1,16 +1,16 @@
 import os
 import json
+import time
 from typing import Generator
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
-from google.cloud.sql.connector import Connector
 from dotenv import load_dotenv
 
 import core.backend.app.crud as crud
-from core.backend.app.model import Role, User, Base
+from core.backend.app import metrics
+from core.backend.app.model import Role, User
 import core.backend.app.schema as schema
 
 load_dotenv()
@@ -23,46 +23,81 @@ DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 DB_NAME = os.getenv("DB_NAME")
 
-if not all([DB_USER, DB_PASS, DB_NAME]):
-  raise ValueError("Missing required environment variables for database configuration.")
-
-connector = Connector()
-
-def get_connection() -> str:
-  conn = connector.connect(
-        f"{PROJECT_ID}:{REGION}:{INSTANCE_NAME}",
-        "pg8000",
-        user=DB_USER,
-        password=DB_PASS,
-        db=DB_NAME
-  )
+# Set DATABASE_URL (e.g. sqlite:///./test.db or postgresql+pg8000://...) to bypass
+# the Cloud SQL connector for local development, tests and benchmarks
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Create the schema and seed roles/admin when a worker starts. Set to 0 when
+# `python -m core.backend.app.cli init-db` runs as a release step instead.
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Connection pool per worker process. Every worker of every instance holds up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections, which must fit in the server's max_connections.
+POOL_OPTIONS = {
+  "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+  "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+  "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+  "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+  "pool_pre_ping": True,
+}
+
+connector = None
+
+if DATABASE_URL:
+  if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+  else:
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
+else:
+  if not all([DB_USER, DB_PASS, DB_NAME]):
+    raise ValueError("Missing required environment variables for database configuration.")
+
+  def get_connection() -> str:
+    # The connector is imported and started on first connect rather than at import
+    global connector
+    if connector is None:
+      from google.cloud.sql.connector import Connector
+      connector = Connector()
+    conn = connector.connect(
+          f"{PROJECT_ID}:{REGION}:{INSTANCE_NAME}",
+          "pg8000",
+          user=DB_USER,
+          password=DB_PASS,
+          db=DB_NAME
+    )
 
-  return conn
+    return conn
 
-engine = create_engine(
-      "postgresql+pg8000://",
-      creator=get_connection,
-    )
+  engine = create_engine(
+        "postgresql+pg8000://",
+        creator=get_connection,
+        **POOL_OPTIONS,
+      )
 
-# DATABASE_URL = "sqlite:///./test.db"  # Use this for local testing/ development
-# engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+metrics.instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def add_initial_roles(db: Session):
   roles = schema.UserRole._member_names_ #["admin", "annotator", "reviewer"]
-  for role_name in roles:
-    existing_role = db.query(Role).filter_by(role_name=role_name).first()
-    if not existing_role:
-      role = Role(role_name=role_name)
-      db.add(role)
-  db.commit()
+  existing_roles = {role_name for role_name, in db.query(Role.role_name)}
+  missing_roles = [role_name for role_name in roles if role_name not in existing_roles]
+  if missing_roles:
+    db.add_all([Role(role_name=role_name) for role_name in missing_roles])
+    db.commit()
 
 def init_admin(db: Session):
-  super_user_username = os.getenv("SUPERUSER_USERNAME").lower()
-  super_user_email = os.getenv("SUPERUSER_EMAIL").lower()
+  super_user_username = (os.getenv("SUPERUSER_USERNAME") or "").lower()
+  super_user_email = (os.getenv("SUPERUSER_EMAIL") or "").lower()
 
   if super_user_username and super_user_email:
+    already_admin = (db.query(User.user_id)
+                     .join(User.roles)
+                     .filter(User.username == super_user_username,
+                             User.email == super_user_email,
+                             Role.role_name == schema.UserRole.admin)
+                     .first())
+    if already_admin:
+      return
     user = crud.create_user(db, super_user_username, super_user_email)
     crud.assign_role_to_user(db, user_name=super_user_username, 
                              user_email=super_user_email, 
@@ -78,20 +113,11 @@ def init_admin(db: Session):
 
 
 def init_db():
-  # Check if the enum type exists before creating it
-  existing_enum_query = text("""
-      SELECT EXISTS (
-          SELECT 1
-          FROM pg_type
-          WHERE typname = 'assignmenttype'
-      )
-  """)
-  
-  with SessionLocal() as db:
-    # Checking for existing enum type
-    if not db.execute(existing_enum_query).scalar():
-      Base.metadata.create_all(bind=engine)
+  # Only an empty database is created here; existing ones are upgraded by `cli migrate`
+  from core.backend.app.migrations import ensure_schema
+  ensure_schema(engine)
 
+  with SessionLocal() as db:
     try:
       add_initial_roles(db)
       init_admin(db)
@@ -99,9 +125,24 @@ def init_db():
       db.rollback()
       print(f"Integrity error occurred: {e.orig}")  # Log the error or handle it as needed
 
+def close_db():
+  """
+  Close pooled connections and the Cloud SQL connector when a worker shuts down,
+  so the database does not keep connections from exited workers open.
+  """
+  global connector
+  engine.dispose()
+  if connector is not None:
+    connector.close()
+    connector = None
+
 def get_db() -> Generator:
   db = SessionLocal()
   try:
+    # Check out the connection up front so pool wait time is measured on its own
+    start = time.perf_counter()
+    db.connection()
+    metrics.observe_checkout_wait(time.perf_counter() - start)
     yield db
   finally:
     db.close()
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Near-duplicate detection for task images: difference hashes computed in a
+process pool, grouped with a BK-tree over their Hamming distance.
+"""
+import io
+import os
+import logging
+import functools
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+try:
+  from PIL import Image
+except ImportError:  # Pillow is optional; only hashing needs it
+  Image = None
+
+logger = logging.getLogger(__name__)
+
+# Hashes at most this many bits apart are near-duplicates
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "4"))
+# Hashing processes; defaults to one per core
+DEDUP_PROCESSES = int(os.getenv("DEDUP_PROCESSES", "0")) or None
+# Images handed to a process at a time
+DEDUP_CHUNK_SIZE = int(os.getenv("DEDUP_CHUNK_SIZE", "16"))
+IMAGE_TIMEOUT_SECONDS = 30
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+_HASH_MASK = (1 << HASH_BITS) - 1
+
+# Image hashing
+
+@functools.lru_cache(maxsize=None)
+def _storage_client():
+  # One client per hashing process
+  from google.cloud import storage
+  return storage.Client()
+
+def read_image(uri: str) -> bytes:
+  """
+  :param uri: gs:// object, http(s) URL or local path.
+  """
+  if uri.startswith("gs://"):
+    bucket, _, name = uri[len("gs://"):].partition("/")
+    return _storage_client().bucket(bucket).blob(name).download_as_bytes(timeout=IMAGE_TIMEOUT_SECONDS)
+  if uri.startswith(("http://", "https://")):
+    with urllib.request.urlopen(uri, timeout=IMAGE_TIMEOUT_SECONDS) as response:
+      return response.read()
+  with open(uri, "rb") as f:
+    return f.read()
+
+def dhash(data: bytes, hash_size: int = HASH_SIZE) -> int:
+  """
+  Difference hash: the grayscale image shrunk to (hash_size + 1) x hash_size
+  pixels, one bit per pixel that is brighter than its right neighbour. Robust
+  to rescaling, recompression and small brightness changes.
+  """
+  image = Image.open(io.BytesIO(data)).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+  pixels = list(image.getdata())
+  value = 0
+  for row in range(hash_size):
+    for column in range(hash_size):
+      left = pixels[row * (hash_size + 1) + column]
+      value = (value << 1) | (left > pixels[row * (hash_size + 1) + column + 1])
+  return value
+
+def to_signed(value: int) -> int:
+  # BIGINT columns are signed
+  return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+def hamming(a: int, b: int) -> int:
+  return bin((a ^ b) & _HASH_MASK).count("1")
+
+def hash_image(uri: str) -> Optional[int]:
+  """
+  :return: Signed difference hash of the image, or None if it cannot be read.
+  """
+  try:
+    return to_signed(dhash(read_image(uri)))
+  except Exception as e:
+    logger.warning(f"Could not hash {uri}: {e}")
+    return None
+
+def hash_images(uris: Sequence[str], processes: Optional[int] = DEDUP_PROCESSES) -> List[Optional[int]]:
+  """
+  Hash images in a process pool; downloads overlap with decoding.
+
+  :return: Hashes in the order of `uris`, None for unreadable images.
+  """
+  if Image is None:
+    raise RuntimeError("Near-duplicate detection needs Pillow: pip install Pillow")
+  if not uris:
+    return []
+  with ProcessPoolExecutor(max_workers=processes) as pool:
+    return list(pool.map(hash_image, uris, chunksize=DEDUP_CHUNK_SIZE))
+
+# Grouping
+
+class BKTree:
+  """
+  Metric tree over Hamming distance. Each child hangs off its parent by their
+  distance, so by the triangle inequality a search within `radius` of a value
+  at distance d from a node only descends into children keyed d - radius to
+  d + radius.
+  """
+  def __init__(self):
+    # Nodes are (hash, item, {distance: child node})
+    self._root: Optional[Tuple[int, Hashable, Dict[int, tuple]]] = None
+
+  def add(self, value: int, item: Hashable):
+    node = (value, item, {})
+    if self._root is None:
+      self._root = node
+      return
+    parent = self._root
+    while True:
+      distance = hamming(value, parent[0])
+      child = parent[2].get(distance)
+      if child is None:
+        parent[2][distance] = node
+        return
+      parent = child
+
+  def search(self, value: int, radius: int) -> List[Tuple[int, Hashable]]:
+    """
+    :return: (distance, item) pairs within `radius` of `value`, nearest first.
+    """
+    matches = []
+    pending = [self._root] if self._root is not None else []
+    while pending:
+      node_value, item, children = pending.pop()
+      distance = hamming(value, node_value)
+      if distance <= radius:
+        matches.append((distance, item))
+      pending.extend(child for key, child in children.items() if distance - radius <= key <= distance + radius)
+    return sorted(matches, key=lambda match: match[0])
+
+def group_near_duplicates(hashes: Dict[int, int], max_distance: int = DEDUP_MAX_DISTANCE) -> Dict[int, int]:
+  """
+  Walk tasks in ID order; a task within `max_distance` bits of an earlier
+  group representative joins the nearest one, otherwise it becomes a
+  representative itself. Comparing with representatives only keeps groups
+  from chaining across gradually changing images.
+
+  :param hashes: Image hash by task ID.
+  :return: Representative task ID by duplicate task ID.
+  """
+  representatives = BKTree()
+  duplicates = {}
+  for task_id in sorted(hashes):
+    matches = representatives.search(hashes[task_id], max_distance)
+    if matches:
+      duplicates[task_id] = matches[0][1]
+    else:
+      representatives.add(hashes[task_id], task_id)
+  return duplicates
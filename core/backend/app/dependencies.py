@@ -1,4 +1,5 @@
 import os
+import secrets
 from datetime import datetime, timedelta
 from fastapi import Request, HTTPException, status, Depends, Response
 from jose import JWTError, jwt
@@ -6,7 +7,19 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
+# Local development: missing secrets are replaced by random per-process ones
+DEV_MODE = os.getenv("DEV_MODE", "").lower() in ("1", "true", "yes")
+
+# Signs access tokens, and session cookies unless SESSION_SECRET is set; both
+# must be the same in every worker and instance
+SECRET_KEY = os.getenv("SECRET_KEY")
+SESSION_SECRET = os.getenv("SESSION_SECRET") or SECRET_KEY
+if not SECRET_KEY:
+  if not DEV_MODE:
+    raise RuntimeError("SECRET_KEY is not set. Set it (and optionally SESSION_SECRET) to a long random value, "
+                       "or set DEV_MODE=1 for local development.")
+  SECRET_KEY = secrets.token_urlsafe(32)
+  SESSION_SECRET = SESSION_SECRET or secrets.token_urlsafe(32)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
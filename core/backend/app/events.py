@@ -0,0 +1,151 @@
+import os
+import json
+import asyncio
+import logging
+import itertools
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before it is told to resynchronize
+QUEUE_SIZE = 1000
+# Seconds between keep-alive comments on idle streams
+KEEPALIVE_SECONDS = 15
+# Seconds between checks of watched projects' versions for writes made by
+# other workers and instances; 0 disables the check
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "2"))
+
+# Published when counters can no longer be updated incrementally
+# (bulk task changes, project settings); subscribers reload their snapshot
+STALE = "stats.stale"
+PROJECT_DELETED = "project.deleted"
+
+@dataclass(eq=False)
+class Subscription:
+  project_id: int
+  loop: asyncio.AbstractEventLoop
+  queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=QUEUE_SIZE))
+  # Project version the subscriber's last snapshot reflects
+  version: Optional[Hashable] = None
+
+  def deliver(self, event: Dict):
+    # A write made by this worker moves the subscriber to its version, so the
+    # watcher does not reload a snapshot the event already brings up to date
+    versions = event.get("versions")
+    if versions is not None and self.version == versions[0]:
+      self.version = versions[1]
+    try:
+      self.queue.put_nowait(event)
+    except asyncio.QueueFull:
+      # A slow client only needs to catch up, not to replay every event
+      while not self.queue.empty():
+        self.queue.get_nowait()
+      self.queue.put_nowait({"id": event["id"], "type": STALE, "data": {}, "delta": {}})
+
+class ProjectEventBroker:
+  """
+  In-process publish/subscribe channel for per-project events.
+
+  crud write paths publish from request threads; subscribers are SSE
+  streams consuming from their own event loop. Each worker process has
+  its own broker, so incremental events only reach streams of the worker
+  that served the write; they carry the project version the write produced.
+  Writes served elsewhere are caught by `watch`, which polls the version of
+  every project with subscribers and tells those behind to reload their
+  snapshot.
+  """
+  def __init__(self):
+    self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+    self._lock = threading.Lock()
+    self._ids = itertools.count(1)
+    self._watcher: Optional[asyncio.Task] = None
+
+  def has_subscribers(self, project_id: Optional[int] = None) -> bool:
+    if project_id is None:
+      return any(self._subscribers.values())
+    return bool(self._subscribers.get(project_id))
+
+  def subscribe(self, project_id: int) -> Subscription:
+    subscription = Subscription(project_id=project_id, loop=asyncio.get_running_loop())
+    with self._lock:
+      self._subscribers[project_id].add(subscription)
+    return subscription
+
+  def unsubscribe(self, subscription: Subscription):
+    with self._lock:
+      subscribers = self._subscribers.get(subscription.project_id)
+      if subscribers is not None:
+        subscribers.discard(subscription)
+        if not subscribers:
+          del self._subscribers[subscription.project_id]
+
+  def publish(self, project_id: int, event_type: str, data: Optional[Dict] = None, delta: Optional[Dict] = None,
+              versions: Optional[Tuple[Hashable, Hashable]] = None):
+    """
+    :param event_type: e.g. "annotation.created", "review.submitted", "assignment.changed".
+    :param data: JSON-serializable event payload.
+    :param delta: Increments to apply to the project's statistics counters.
+    :param versions: Project version before and after the write behind the event.
+    """
+    with self._lock:
+      subscribers = list(self._subscribers.get(project_id, ()))
+    if not subscribers:
+      return
+    event = {"id": next(self._ids), "type": event_type, "data": data or {}, "delta": delta or {},
+             "versions": versions}
+    for subscription in subscribers:
+      try:
+        subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+      except RuntimeError:
+        # The subscriber's loop has shut down
+        self.unsubscribe(subscription)
+
+  def watch(self, fetch_versions: Callable[[List[int]], Dict[int, Hashable]],
+            interval: float = EVENT_POLL_SECONDS):
+    """
+    Start this worker's version watcher on the running loop unless it runs.
+
+    :param fetch_versions: Blocking call returning the version of each existing
+                           project among the given IDs; run in a thread.
+    """
+    if interval <= 0 or (self._watcher is not None and not self._watcher.done()):
+      return
+    self._watcher = asyncio.get_running_loop().create_task(self._watch(fetch_versions, interval))
+
+  async def _watch(self, fetch_versions: Callable[[List[int]], Dict[int, Hashable]], interval: float):
+    loop = asyncio.get_running_loop()
+    while self.has_subscribers():
+      await asyncio.sleep(interval)
+      with self._lock:
+        subscriptions = [subscription for subscribers in self._subscribers.values() for subscription in subscribers]
+      project_ids = sorted({subscription.project_id for subscription in subscriptions})
+      if not project_ids:
+        continue
+      try:
+        versions = await loop.run_in_executor(None, fetch_versions, project_ids)
+      except Exception as e:
+        logger.warning(f"Could not check project versions: {e}")
+        continue
+      for subscription in subscriptions:
+        version = versions.get(subscription.project_id)
+        if subscription.version is None or version == subscription.version:
+          continue
+        # Reported once; the snapshot that follows records the new version
+        subscription.version = version
+        event = {"id": next(self._ids), "type": STALE if version is not None else PROJECT_DELETED,
+                 "data": {}, "delta": {}}
+        try:
+          subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        except RuntimeError:
+          self.unsubscribe(subscription)
+
+def format_sse(event_type: str, data: Dict, event_id: Optional[int] = None) -> str:
+  message = f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+  if event_id is not None:
+    message = f"id: {event_id}\n{message}"
+  return message
+
+broker = ProjectEventBroker()
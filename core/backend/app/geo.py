@@ -0,0 +1,115 @@
+"""
+Task coordinates: extraction from additional_data at ingestion, geohash
+encoding, the geohash length used to cluster tasks at a map zoom level and
+the Hilbert curve position used to assign nearby tasks together.
+
+Plain columns with B-tree indexes work the same on PostgreSQL and SQLite, so
+no PostGIS or R-tree extension is needed.
+"""
+import json
+import math
+from typing import Dict, Optional, Tuple, Union
+
+LATITUDE_KEYS = ("latitude", "lat")
+LONGITUDE_KEYS = ("longitude", "lon", "lng")
+# Stored geohash length, about 5 m x 5 m
+GEOHASH_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Approximate width in km of a geohash cell of each length, at the equator
+_CELL_WIDTH_KM = (5000, 1250, 156, 39.1, 4.89, 1.22, 0.153, 0.0382, 0.00477)
+_EARTH_CIRCUMFERENCE_KM = 40075
+# Clusters aimed for across one 256-pixel map tile
+CLUSTERS_PER_TILE = 4
+# Hilbert curve over a 2^16 x 2^16 grid, cells of about 600 m x 300 m
+HILBERT_ORDER = 16
+
+def _number(data: dict, keys: Tuple[str, ...]) -> Optional[float]:
+  for key in keys:
+    try:
+      value = float(data[key])
+    except (KeyError, TypeError, ValueError):
+      continue
+    if not math.isnan(value):
+      return value
+  return None
+
+def extract_coordinates(additional_data: Union[str, dict, None]) -> Optional[Tuple[float, float]]:
+  """
+  :param additional_data: Task metadata, as a dict or its JSON.
+  :return: (latitude, longitude), or None when missing or out of range.
+  """
+  if isinstance(additional_data, str):
+    try:
+      additional_data = json.loads(additional_data)
+    except ValueError:
+      return None
+  if not isinstance(additional_data, dict):
+    return None
+  latitude, longitude = _number(additional_data, LATITUDE_KEYS), _number(additional_data, LONGITUDE_KEYS)
+  if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+    return None
+  return latitude, longitude
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+  # Interleave longitude and latitude bisection bits, five bits per character
+  bounds = [[-180.0, 180.0], [-90.0, 90.0]]
+  coordinates = (longitude, latitude)
+  characters, value, bits, axis = [], 0, 0, 0
+  while len(characters) < precision:
+    low, high = bounds[axis]
+    middle = (low + high) / 2
+    if coordinates[axis] >= middle:
+      value = (value << 1) | 1
+      bounds[axis][0] = middle
+    else:
+      value <<= 1
+      bounds[axis][1] = middle
+    axis, bits = 1 - axis, bits + 1
+    if bits == 5:
+      characters.append(_BASE32[value])
+      value, bits = 0, 0
+  return "".join(characters)
+
+def location_columns(additional_data: Union[str, dict, None]) -> Dict[str, Optional[object]]:
+  """
+  :return: Values of the task's latitude, longitude and geohash columns.
+  """
+  coordinates = extract_coordinates(additional_data)
+  if coordinates is None:
+    return {"latitude": None, "longitude": None, "geohash": None}
+  latitude, longitude = coordinates
+  return {"latitude": latitude, "longitude": longitude, "geohash": encode_geohash(latitude, longitude)}
+
+def zoom_precision(zoom: int) -> int:
+  """
+  :return: Geohash length whose cells split a web map tile at `zoom` into
+           about CLUSTERS_PER_TILE clusters across.
+  """
+  target_km = _EARTH_CIRCUMFERENCE_KM / 2 ** zoom / CLUSTERS_PER_TILE
+  for precision, width_km in enumerate(_CELL_WIDTH_KM, start=1):
+    if width_km <= target_km:
+      return precision
+  return GEOHASH_PRECISION
+
+def hilbert_index(latitude: float, longitude: float, order: int = HILBERT_ORDER) -> int:
+  """
+  Position along a Hilbert curve through the latitude/longitude grid. Unlike
+  geohash (a Z-order curve), consecutive positions are always neighbouring
+  cells, so a run of positions covers one compact area.
+  """
+  side = 1 << order
+  x = min(int((longitude + 180) / 360 * side), side - 1)
+  y = min(int((latitude + 90) / 180 * side), side - 1)
+  index = 0
+  s = side >> 1
+  while s > 0:
+    rx = 1 if x & s else 0
+    ry = 1 if y & s else 0
+    index += s * s * ((3 * rx) ^ ry)
+    # Rotate the quadrant so the curve inside it starts and ends next to its neighbours
+    if ry == 0:
+      if rx == 1:
+        x, y = side - 1 - x, side - 1 - y
+      x, y = y, x
+    s >>= 1
+  return index
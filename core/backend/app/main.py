@@ -1,11 +1,15 @@
 import os
-import uvicorn
+# Imported first so the startup profile covers every other import
+from core.backend.app import startup
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 # from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from jose import JWTError, jwt
-from core.backend.app import utils
+from core.backend.app import utils, metrics, querydebug, database
+from core.backend.app.dependencies import SESSION_SECRET
+from core.backend.app.compression import CompressionMiddleware
+from core.backend.app.static import PrecompressedStaticFiles
 from core.backend.app.routers import (auth, 
                       users, 
                       tasks, 
@@ -18,10 +22,16 @@ from dotenv import load_dotenv
 
 
 load_dotenv()
+startup.mark("imports")
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="core/frontend/build/static"), name="static")
-app.add_middleware(SessionMiddleware, secret_key=os.urandom(24))
+app = FastAPI(default_response_class=ORJSONResponse)
+# check_dir=False lets the API run (tests, benchmarks) without a frontend build
+app.mount("/static", PrecompressedStaticFiles(directory="core/frontend/build/static", check_dir=False), name="static")
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+app.add_middleware(CompressionMiddleware)
+if querydebug.QUERY_DEBUG:
+  app.add_middleware(querydebug.QueryDebugMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -29,7 +39,15 @@ app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(annotations.router, prefix="/api/annotations", tags=["annotations"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["reviews"])
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
 app.include_router(welcome.router)
+app.add_event_handler("shutdown", database.close_db)
+startup.mark("app")
 
 if __name__ == "__main__":
-  uvicorn.run(app, os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", 8000)))
\ No newline at end of file
+  # Development server; production runs gunicorn with core/backend/gunicorn.conf.py
+  import uvicorn
+  uvicorn.run("core.backend.app.main:app",
+              host=os.environ.get("HOST", "0.0.0.0"),
+              port=int(os.environ.get("PORT", 8000)),
+              workers=int(os.environ.get("WEB_CONCURRENCY", 1)))
\ No newline at end of file
@@ -0,0 +1,192 @@
+import os
+import hmac
+import time
+import logging
+import contextvars
+import collections
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST,
+                               CollectorRegistry,
+                               Counter,
+                               Gauge,
+                               Histogram,
+                               generate_latest,
+                               multiprocess,
+                               REGISTRY)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.requests import Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged together with the SQL they ran; 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+# Upper bound on statements kept per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 200
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; /metrics is disabled without it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+REQUEST_LATENCY = Histogram(
+  "http_request_duration_seconds",
+  "HTTP request latency by route",
+  ["method", "route", "status"],
+)
+REQUEST_QUERIES = Histogram(
+  "http_request_db_queries",
+  "SQL statements executed per HTTP request",
+  ["method", "route"],
+  buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+REQUEST_DB_TIME = Histogram(
+  "http_request_db_seconds",
+  "Time spent executing SQL per HTTP request",
+  ["method", "route"],
+)
+QUERIES_TOTAL = Counter(
+  "db_queries_total",
+  "SQL statements executed",
+)
+POOL_CHECKOUT_WAIT = Histogram(
+  "db_pool_checkout_seconds",
+  "Time spent waiting for a pooled database connection",
+  buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_CHECKED_OUT = Gauge(
+  "db_pool_checked_out",
+  "Database connections currently checked out of the pool",
+  multiprocess_mode="livesum",
+)
+
+@dataclass
+class RequestStats:
+  queries: int = 0
+  db_time: float = 0.0
+  statements: List[Tuple[str, float]] = field(default_factory=list)
+  statement_counts: collections.Counter = field(default_factory=collections.Counter)
+
+  def record(self, statement: str, duration: float):
+    self.queries += 1
+    self.db_time += duration
+    self.statement_counts[statement] += 1
+    if len(self.statements) < MAX_RECORDED_STATEMENTS:
+      self.statements.append((statement, duration))
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+  "request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+  return _request_stats.get()
+
+def start_request_stats() -> Tuple[RequestStats, contextvars.Token]:
+  stats = RequestStats()
+  return stats, _request_stats.set(stats)
+
+def end_request_stats(token: contextvars.Token):
+  _request_stats.reset(token)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  duration = time.perf_counter() - conn.info["query_start_time"].pop()
+  QUERIES_TOTAL.inc()
+  stats = _request_stats.get()
+  if stats is not None:
+    stats.record(statement, duration)
+
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+  POOL_CHECKED_OUT.inc()
+
+def _pool_checkin(dbapi_connection, connection_record):
+  POOL_CHECKED_OUT.dec()
+
+def instrument_engine(engine: Engine):
+  """
+  Attach query timing hooks to an engine and count its checked out connections.
+  The gauge is updated on checkout and checkin rather than read from the pool,
+  so that multiprocess collection (PROMETHEUS_MULTIPROC_DIR) sees it too.
+  """
+  if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+  if not event.contains(engine.pool, "checkout", _pool_checkout):
+    event.listen(engine.pool, "checkout", _pool_checkout)
+    event.listen(engine.pool, "checkin", _pool_checkin)
+
+def observe_checkout_wait(seconds: float):
+  POOL_CHECKOUT_WAIT.observe(seconds)
+
+def _route_label(scope) -> str:
+  route = scope.get("route")
+  if route is not None:
+    return route.path
+  endpoint = scope.get("endpoint")
+  if endpoint is not None:
+    return getattr(endpoint, "__name__", type(endpoint).__name__)
+  return "unmatched"
+
+class MetricsMiddleware:
+  """
+  ASGI middleware recording latency, status and SQL usage for each request.
+  """
+  def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+    self.app = app
+    self.slow_request_ms = slow_request_ms
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or scope["path"] == "/metrics":
+      await self.app(scope, receive, send)
+      return
+
+    stats, token = start_request_stats()
+    status = 500
+    streaming = False
+    start = time.perf_counter()
+
+    async def send_wrapper(message):
+      nonlocal status, streaming
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        streaming = (b"content-type", b"text/event-stream") in [
+          (name.lower(), value.split(b";")[0]) for name, value in message.get("headers", [])]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      end_request_stats(token)
+      elapsed = time.perf_counter() - start
+      method = scope["method"]
+      route = _route_label(scope)
+      REQUEST_LATENCY.labels(method, route, str(status)).observe(elapsed)
+      REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+      REQUEST_DB_TIME.labels(method, route).observe(stats.db_time)
+      # Event streams stay open by design and are never "slow"
+      if self.slow_request_ms and not streaming and elapsed * 1000 >= self.slow_request_ms:
+        self._log_slow_request(method, scope["path"], status, elapsed, stats)
+
+  def _log_slow_request(self, method: str, path: str, status: int, elapsed: float, stats: RequestStats):
+    slowest = sorted(stats.statements, key=lambda item: item[1], reverse=True)[:10]
+    statements = "\n".join(f"  {duration * 1000:.1f} ms: {statement}" for statement, duration in slowest)
+    logger.warning(f"Slow request {method} {path} -> {status} took {elapsed * 1000:.1f} ms "
+                   f"({stats.queries} queries, {stats.db_time * 1000:.1f} ms in SQL)\n{statements}")
+
+def _authorized(request: Request) -> bool:
+  scheme, _, token = request.headers.get("authorization", "").partition(" ")
+  return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+
+def metrics_endpoint(request: Request) -> Response:
+  # Traffic and database metrics are internal; serve them only to holders of the token
+  if not METRICS_TOKEN:
+    return Response(status_code=404)
+  if not _authorized(request):
+    return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+  registry = REGISTRY
+  # Under several worker processes each one writes to PROMETHEUS_MULTIPROC_DIR
+  if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+  return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,146 @@
+import os
+import logging
+from typing import Optional, Sequence, Tuple
+
+from alembic import command, op
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from core.backend.app.model import Base
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+# Schema as released before versioned migrations; unversioned databases are stamped from here
+BASELINE_REVISION = "0000"
+# Rows updated per transaction by batched_backfill
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "10000"))
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+  config = Config()
+  config.set_main_option("script_location", MIGRATIONS_DIR)
+  config.set_main_option("file_template", "%%(rev)s_%%(slug)s")
+  config.attributes["connection"] = connection
+  return config
+
+def head_revision() -> str:
+  return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+def current_revision(connection: Connection) -> Optional[str]:
+  return MigrationContext.configure(connection).get_current_revision()
+
+def legacy_revision(connection: Connection) -> Optional[str]:
+  """
+  Revision an unversioned database is at, judged from the columns the
+  hand-applied SQL migrations added.
+
+  :return: The revision, or None if the database has no schema yet.
+  """
+  inspector = inspect(connection)
+  if not inspector.has_table("projects"):
+    return None
+  project_columns = {column["name"] for column in inspector.get_columns("projects")}
+  task_columns = {column["name"] for column in inspector.get_columns("tasks")}
+  if "annotation_version" in project_columns:
+    return "0003"
+  if "version" in project_columns:
+    return "0002"
+  if "external_id" in task_columns:
+    return "0001"
+  return BASELINE_REVISION
+
+def _create_schema(connection: Connection):
+  Base.metadata.create_all(connection)
+  command.stamp(alembic_config(connection), "head")
+  connection.commit()
+
+def ensure_schema(engine: Engine):
+  """
+  Create the schema on an empty database and stamp it at head. Existing
+  databases are only checked: upgrading them is left to `cli migrate` so that
+  workers never run migrations concurrently.
+  """
+  with engine.connect() as connection:
+    current = current_revision(connection)
+    if current is None and legacy_revision(connection) is None:
+      _create_schema(connection)
+      return
+  head = head_revision()
+  if current != head:
+    logger.warning(f"Database schema is at revision {current or 'unversioned'}, expected {head}. "
+                   f"Run `python -m core.backend.app.cli migrate`.")
+
+def migrate(engine: Engine, revision: str = "head") -> Tuple[Optional[str], Optional[str]]:
+  """
+  Upgrade the database to `revision`. Empty databases get the current schema;
+  unversioned databases are stamped with the revision their columns match first.
+
+  :return: Revisions before and after the upgrade.
+  """
+  with engine.connect() as connection:
+    previous = current_revision(connection)
+    if previous is None:
+      legacy = legacy_revision(connection)
+      if legacy is None:
+        _create_schema(connection)
+        return None, current_revision(connection)
+      command.stamp(alembic_config(connection), legacy)
+      logger.info(f"Stamped unversioned database at revision {legacy}")
+    # Migrations manage their own transactions (see autocommit blocks below)
+    connection.commit()
+    command.upgrade(alembic_config(connection), revision)
+    return previous, current_revision(connection)
+
+# Helpers for revision scripts
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str]):
+  """
+  Build an index without blocking writes. On PostgreSQL the build runs outside
+  the migration transaction with CONCURRENTLY; an invalid index left by an
+  interrupted build is dropped and rebuilt.
+  """
+  bind = op.get_bind()
+  column_list = ", ".join(columns)
+  if bind.dialect.name != "postgresql":
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})")
+    return
+
+  with op.get_context().autocommit_block():
+    invalid = bind.execute(text(
+      "SELECT NOT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+      "WHERE c.relname = :name"), {"name": name}).scalar()
+    if invalid:
+      op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})")
+
+def drop_index_concurrently(name: str):
+  if op.get_bind().dialect.name != "postgresql":
+    op.execute(f"DROP INDEX IF EXISTS {name}")
+    return
+  with op.get_context().autocommit_block():
+    op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+def batched_backfill(table: str, key: str, assignments: str, where: str = "TRUE",
+                     batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+  """
+  UPDATE `table` SET `assignments` for rows matching `where`, in ranges of
+  `batch_size` values of the integer column `key`. Each batch commits on its
+  own so row locks are short-lived and live traffic keeps flowing.
+
+  :return: Number of rows updated.
+  """
+  bind = op.get_bind()
+  low, high = bind.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+  if low is None:
+    return 0
+
+  statement = text(f"UPDATE {table} SET {assignments} "
+                   f"WHERE {key} >= :start AND {key} < :end AND ({where})")
+  updated = 0
+  with op.get_context().autocommit_block():
+    for start in range(low, high + 1, batch_size):
+      updated += bind.execute(statement, {"start": start, "end": start + batch_size}).rowcount
+  return updated
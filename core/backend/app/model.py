@@ -3,7 +3,7 @@ import datetime
 import reprlib
 
 import sqlalchemy as sqla
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, Table, Text
+from sqlalchemy import BigInteger, Boolean, Column, Float, Integer, String, ForeignKey, TIMESTAMP, Table, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -19,7 +19,7 @@ user_roles = Table('user_roles', Base.metadata,
 #
 user_tasks = Table('user_tasks', Base.metadata,
                    Column('user_id', Integer, ForeignKey('users.user_id'), primary_key=True),
-                   Column('task_id', String(255), ForeignKey('tasks.task_id'), primary_key=True))
+                   Column('task_id', Integer, ForeignKey('tasks.task_id', ondelete='CASCADE'), primary_key=True))
 
 class Project(Base):
   __tablename__ = 'projects'
@@ -28,11 +28,37 @@ class Project(Base):
   project_title = Column(String(255), nullable=False)
   project_description = Column(String(255), nullable=True, default="")
   created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
-  labels = Column(String(255), nullable=False, default="")
   max_annotators_per_task = Column(Integer, nullable=True, default=1)
+  # fixed: every task gets max_annotators_per_task annotators. adaptive: tasks
+  # start with min_annotators_per_task and contested ones grow up to the max
+  assignment_mode = Column(sqla.Enum(schema.AssignmentMode), nullable=False,
+                           default=schema.AssignmentMode.fixed, server_default=schema.AssignmentMode.fixed.value)
+  min_annotators_per_task = Column(Integer, nullable=False, default=2, server_default='2')
+  # Share of the votes the majority label needs for a task to reach consensus
+  consensus_threshold = Column(Float, nullable=False, default=1.0, server_default='1')
   completion_deadline = Column(TIMESTAMP, nullable=True)
-
-  tasks = relationship("Task", back_populates="project", cascade='all, delete-orphan')
+  # Required over recent annotation pace, set by the scheduler; orders
+  # annotators' queues across projects
+  priority = Column(Float, nullable=False, default=0.0, server_default='0', index=True)
+  # Bumped by writes to the project, its tasks or assignments; drives HTTP ETags
+  version = Column(Integer, nullable=False, default=1, server_default='1')
+  # Bumped by annotation and review writes; drives labeled-status ETags
+  annotation_version = Column(Integer, nullable=False, default=1, server_default='1')
+  updated_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+
+  tasks = relationship("Task", back_populates="project", cascade='all, delete-orphan', passive_deletes=True)
+  # Includes retired labels that existing annotations still reference
+  label_set = relationship("Label", back_populates="project", order_by="Label.position",
+                           cascade='all, delete-orphan', passive_deletes=True, lazy="selectin")
+
+  @property
+  def label_names(self) -> List[str]:
+    return [label.name for label in self.label_set if label.active]
+
+  @property
+  def labels(self) -> str:
+    # Comma-separated, as the API has always exposed the vocabulary
+    return ",".join(self.label_names)
 
   def __repr__(self) -> str:
     return (f'Project('
@@ -45,21 +71,38 @@ class Project(Base):
 
 class Task(Base):
   __tablename__ = 'tasks'
-
-  task_id = Column(String(255), primary_key=True)
-  project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False)
+  # Example IDs only need to be unique within a project; the unique index also
+  # serves project_id lookups. The location indexes serve bounding-box
+  # queries (latitude range, then longitude) and map clustering (geohash prefixes)
+  __table_args__ = (UniqueConstraint('project_id', 'external_id', name='uq_tasks_project_external_id'),
+                    Index('ix_tasks_project_id_latitude', 'project_id', 'latitude'),
+                    Index('ix_tasks_project_id_geohash', 'project_id', 'geohash'))
+
+  task_id = Column(Integer, primary_key=True, autoincrement=True)
+  external_id = Column(String(255), nullable=False)
+  project_id = Column(Integer, ForeignKey('projects.project_id', ondelete='CASCADE'), nullable=False)
   image = Column(String(255), nullable=False)
   additional_data = Column(Text, nullable=True)
+  # 64-bit difference hash of the image, stored signed; NULL until hashed
+  image_hash = Column(BigInteger, nullable=True)
+  # First task of the near-duplicate group this task belongs to; that task's
+  # labels apply to this one, which is not assigned to annotators
+  duplicate_of = Column(Integer, ForeignKey('tasks.task_id', ondelete='SET NULL'), nullable=True, index=True)
+  # Coordinates from additional_data, set at ingestion; NULL without coordinates
+  latitude = Column(Float, nullable=True)
+  longitude = Column(Float, nullable=True)
+  geohash = Column(String(12), nullable=True)
 
   project = relationship("Project", back_populates="tasks")
-  annotations = relationship("Annotation", back_populates="task")
-  reviews = relationship("Review", back_populates="task")
-  assigned_tasks = relationship("AssignedTask", back_populates="task")
-  users = relationship("User", secondary=user_tasks, back_populates="tasks")
+  annotations = relationship("Annotation", back_populates="task", cascade='all, delete-orphan', passive_deletes=True)
+  reviews = relationship("Review", back_populates="task", cascade='all, delete-orphan', passive_deletes=True)
+  assigned_tasks = relationship("AssignedTask", back_populates="task", cascade='all, delete-orphan', passive_deletes=True)
+  users = relationship("User", secondary=user_tasks, back_populates="tasks", passive_deletes=True)
 
   def __repr__(self) -> str:
     return (f'Task('
             f'task_id={self.task_id!r}, '
+            f'external_id={self.external_id!r}, '
             f'project_id={self.project_id!r}, '
             f'image={self.image!r}, '
             f'annotations={reprlib.repr(self.annotations)}, '
@@ -97,16 +140,44 @@ class Role(Base):
             f'role_id={self.role_id!r}, '
             f'role_name={self.role_name!r})')
 
+class Label(Base):
+  __tablename__ = 'labels'
+  __table_args__ = (UniqueConstraint('project_id', 'name', name='uq_labels_project_name'),)
+
+  label_id = Column(Integer, primary_key=True, autoincrement=True)
+  project_id = Column(Integer, ForeignKey('projects.project_id', ondelete='CASCADE'), nullable=False)
+  name = Column(String(255), nullable=False)
+  position = Column(Integer, nullable=False, default=0)
+  # Removed from the project's vocabulary but kept for the annotations that use it
+  active = Column(Boolean, nullable=False, default=True, server_default=sqla.true())
+
+  project = relationship("Project", back_populates="label_set")
+
+  def __repr__(self) -> str:
+    return (f'Label('
+            f'label_id={self.label_id!r}, '
+            f'project_id={self.project_id!r}, '
+            f'name={self.name!r}, '
+            f'active={self.active!r})')
+
 class Annotation(Base):
   __tablename__ = 'annotations'
+  __table_args__ = (Index('ix_annotations_task_id_user_id', 'task_id', 'user_id'),)
 
   annotation_id = Column(Integer, primary_key=True, autoincrement=True)
-  label = Column(String(60), nullable=False)
-  task_id = Column(String(255), ForeignKey('tasks.task_id'), nullable=False)
+  task_id = Column(Integer, ForeignKey('tasks.task_id', ondelete='CASCADE'), nullable=False, index=True)
   user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+  label_id = Column(Integer, ForeignKey('labels.label_id'), nullable=False, index=True)
+  # Indexed for the scheduler's recent throughput window
+  created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow, index=True)
 
   task = relationship("Task", back_populates='annotations')
   user = relationship("User", back_populates='annotations')
+  label_entry = relationship("Label", lazy="joined", innerjoin=True)
+
+  @property
+  def label(self) -> str:
+    return self.label_entry.name
 
   def __repr__(self) -> str:
     return (f'Annotation('
@@ -117,14 +188,20 @@ class Annotation(Base):
 
 class Review(Base):
   __tablename__ = 'reviews'
+  __table_args__ = (Index('ix_reviews_task_id_user_id', 'task_id', 'user_id'),)
 
   review_id = Column(Integer, primary_key=True, autoincrement=True)
-  label = Column(String(60), nullable=False)
-  task_id = Column(String(255), ForeignKey('tasks.task_id'), nullable=False)
+  task_id = Column(Integer, ForeignKey('tasks.task_id', ondelete='CASCADE'), nullable=False, index=True)
   user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+  label_id = Column(Integer, ForeignKey('labels.label_id'), nullable=False, index=True)
 
   task = relationship("Task", back_populates='reviews')
   user = relationship("User", back_populates='reviews')
+  label_entry = relationship("Label", lazy="joined", innerjoin=True)
+
+  @property
+  def label(self) -> str:
+    return self.label_entry.name
 
   def __repr__(self) -> str:
     return (f'Review('
@@ -133,11 +210,56 @@ class Review(Base):
             f'task_id={self.task_id!r}, '
             f'user_id={self.user_id!r})')
 
+# Model output for a task: the top label serves as a pre-fill, the uncertainty
+# measures order task lists and auto-assignment
+class Prediction(Base):
+  __tablename__ = 'predictions'
+  __table_args__ = (Index('ix_predictions_project_id_margin', 'project_id', 'margin'),
+                    Index('ix_predictions_project_id_entropy', 'project_id', 'entropy'))
+
+  task_id = Column(Integer, ForeignKey('tasks.task_id', ondelete='CASCADE'), primary_key=True)
+  # Copied from the task so the ordering indexes cover a single project
+  project_id = Column(Integer, ForeignKey('projects.project_id', ondelete='CASCADE'), nullable=False)
+  label_id = Column(Integer, ForeignKey('labels.label_id'), nullable=False)
+  confidence = Column(Float, nullable=False)
+  # Top score minus the runner-up; small margins are the most informative
+  margin = Column(Float, nullable=False)
+  # Entropy of the normalised scores, 0 (certain) to 1 (uniform)
+  entropy = Column(Float, nullable=False)
+  created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+
+  label_entry = relationship("Label", lazy="joined", innerjoin=True)
+  scores = relationship("PredictionScore", cascade='all, delete-orphan', passive_deletes=True)
+
+  @property
+  def label(self) -> str:
+    return self.label_entry.name
+
+  def __repr__(self) -> str:
+    return (f'Prediction('
+            f'task_id={self.task_id!r}, '
+            f'label_id={self.label_id!r}, '
+            f'confidence={self.confidence!r}, '
+            f'margin={self.margin!r})')
+
+class PredictionScore(Base):
+  __tablename__ = 'prediction_scores'
+
+  task_id = Column(Integer, ForeignKey('predictions.task_id', ondelete='CASCADE'), primary_key=True)
+  label_id = Column(Integer, ForeignKey('labels.label_id'), primary_key=True)
+  score = Column(Float, nullable=False)
+
+  label_entry = relationship("Label", lazy="joined", innerjoin=True)
+
+  @property
+  def label(self) -> str:
+    return self.label_entry.name
+
 class AssignedTask(Base):
   __tablename__ = 'assigned_tasks'
 
   assignment_id = Column(Integer, primary_key=True, autoincrement=True)
-  task_id = Column(String(255), ForeignKey('tasks.task_id'), nullable=False)
+  task_id = Column(Integer, ForeignKey('tasks.task_id', ondelete='CASCADE'), nullable=False, index=True)
   user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
   assignment_type = Column(sqla.Enum(schema.AssignmentType), nullable=False)
 
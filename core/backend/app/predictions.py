@@ -0,0 +1,72 @@
+"""
+Parsing and scoring of model predictions imported for a project's tasks.
+"""
+import csv
+import math
+from io import StringIO
+from typing import Dict, List, Tuple
+
+EXAMPLE_ID_KEY = 'example_id'
+LABEL_KEY = 'label'
+SCORE_KEY = 'score'
+
+class PredictionFormatError(ValueError):
+  pass
+
+def _score(value: str, line: int) -> float:
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    raise PredictionFormatError(f"Line {line}: score {value!r} is not a number")
+
+def parse_prediction_csv(text: str, label_names: List[str]) -> Dict[str, Dict[str, float]]:
+  """
+  Read scores per label per example from a CSV in either layout:
+
+    wide: example_id,<label 1>,<label 2>,...   one row per example
+    long: example_id,label,score               one row per example and label
+
+  :return: Scores by label name, by example ID.
+  :raises PredictionFormatError: Missing columns, labels outside the vocabulary or non-numeric scores.
+  """
+  reader = csv.DictReader(StringIO(text))
+  columns = reader.fieldnames or []
+  if EXAMPLE_ID_KEY not in columns:
+    raise PredictionFormatError(f"Missing '{EXAMPLE_ID_KEY}' column")
+  long_format = LABEL_KEY in columns and SCORE_KEY in columns
+  label_columns = [] if long_format else [column for column in columns if column != EXAMPLE_ID_KEY]
+  unknown = sorted(set(label_columns) - set(label_names))
+  if unknown:
+    raise PredictionFormatError(f"Columns are not project labels: {', '.join(unknown)}")
+
+  predictions: Dict[str, Dict[str, float]] = {}
+  for line, row in enumerate(reader, start=2):
+    scores = predictions.setdefault(str(row[EXAMPLE_ID_KEY]).strip(), {})
+    if long_format:
+      label = row[LABEL_KEY].strip()
+      if label not in label_names:
+        raise PredictionFormatError(f"Line {line}: {label!r} is not a project label")
+      scores[label] = _score(row[SCORE_KEY], line)
+    else:
+      for label in label_columns:
+        if row[label] not in (None, ""):
+          scores[label] = _score(row[label], line)
+  return {example_id: scores for example_id, scores in predictions.items() if scores}
+
+def summarize_scores(scores: Dict[int, float]) -> Tuple[int, float, float, float]:
+  """
+  :param scores: Score per label ID; need not sum to one.
+  :return: (top label ID, confidence, margin, entropy). The margin is the top
+           score minus the runner-up (0 when there is none); the entropy of the
+           normalised scores is scaled to [0, 1].
+  """
+  ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+  top_label_id, confidence = ranked[0]
+  margin = confidence - (ranked[1][1] if len(ranked) > 1 else 0.0)
+
+  total = sum(max(score, 0.0) for _, score in ranked)
+  entropy = 0.0
+  if total > 0 and len(ranked) > 1:
+    probabilities = [max(score, 0.0) / total for _, score in ranked]
+    entropy = -sum(p * math.log(p) for p in probabilities if p > 0) / math.log(len(ranked))
+  return top_label_id, confidence, margin, entropy
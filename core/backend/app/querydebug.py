@@ -0,0 +1,86 @@
+import os
+import re
+import logging
+from collections import Counter
+from typing import Dict, Iterable
+
+from core.backend.app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Enables QueryDebugMiddleware; meant for development, not production
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "").lower() in ("1", "true", "yes")
+# A statement shape repeated this many times within one request is reported as N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "5"))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\?|:\w+|\$\d+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(\s*__\[POSTCOMPILE_\w+\]\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+  """
+  Normalize a SQL statement so that queries differing only in their
+  parameters, literals or IN-list length compare equal.
+  """
+  shape = _STRING_LITERAL.sub("?", statement)
+  shape = _PLACEHOLDER.sub("?", shape)
+  shape = _NUMBER_LITERAL.sub("?", shape)
+  shape = _POSTCOMPILE.sub("(?)", shape)
+  shape = _IN_LIST.sub("IN (?)", shape)
+  return _WHITESPACE.sub(" ", shape).strip()
+
+def shape_counts(statements: Iterable[str]) -> Counter:
+  return Counter(statement_shape(statement) for statement in statements)
+
+def repeated_shapes(statements: Iterable[str], threshold: int = REPEATED_QUERY_THRESHOLD) -> Dict[str, int]:
+  """
+  :param statements: SQL statements executed, one entry per execution.
+  :param threshold: Minimum number of executions for a shape to be reported.
+  :return: Statement shapes executed at least `threshold` times, with their counts.
+  """
+  return {shape: count for shape, count in shape_counts(statements).items() if count >= threshold}
+
+class QueryDebugMiddleware:
+  """
+  Development middleware reporting SQL statement counts per request.
+
+  Adds an X-Query-Count header and logs statement shapes that repeat
+  within a request, which is the signature of an N+1 query pattern.
+  """
+  def __init__(self, app, threshold: int = REPEATED_QUERY_THRESHOLD):
+    self.app = app
+    self.threshold = threshold
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    stats = metrics.current_request_stats()
+    token = None
+    if stats is None:
+      stats, token = metrics.start_request_stats()
+
+    async def send_wrapper(message):
+      if message["type"] == "http.response.start":
+        headers = list(message.get("headers", []))
+        headers.append((b"x-query-count", str(stats.queries).encode()))
+        message = {**message, "headers": headers}
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      if token is not None:
+        metrics.end_request_stats(token)
+      counts = Counter()
+      for statement, count in stats.statement_counts.items():
+        counts[statement_shape(statement)] += count
+      for shape, count in counts.items():
+        if count < self.threshold:
+          continue
+        logger.warning(f"Possible N+1 in {scope['method']} {scope['path']}: "
+                       f"{count} executions of: {shape}")
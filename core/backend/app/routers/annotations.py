@@ -1,5 +1,6 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 import xml.etree.ElementTree as ET
 
@@ -11,11 +12,15 @@ router = APIRouter()
 
 @router.get("/", response_model = List[schema.Annotation])
 def read_annotations(project_id: int, db: Session = Depends(get_db)):
-  return crud.get_annotations(db, project_id=project_id)
+  # Returned directly: the rows already match the response model
+  return ORJSONResponse(crud.get_annotation_rows(db, project_id=project_id))
 
 @router.post("/", response_model=schema.Annotation)
 def create_annotation(annotation: schema.AnnotationCreate, db: Session = Depends(get_db)):
-  return crud.create_annotation(db=db, label=annotation.label, task_id=annotation.task_id, annotator_id=annotation.user_id)
+  try:
+    return crud.create_annotation(db=db, label=annotation.label, task_id=annotation.task_id, annotator_id=annotation.user_id)
+  except crud.UnknownLabelError as e:
+    raise HTTPException(status_code=422, detail=str(e))
 
 @router.get("/{annotation_id}", response_model=schema.Annotation)
 def read_annotation(annotation_id: int, db: Session = Depends(get_db)):
@@ -26,7 +31,10 @@ def read_annotation(annotation_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{annotation_id}", response_model=schema.Annotation)
 def update_annotation(annotation_id: int, annotation: schema.AnnotationUpdate, db: Session = Depends(get_db)):
-  db_annotation = crud.update_annotation(db=db, annotation_id=annotation_id, label=annotation.label)
+  try:
+    db_annotation = crud.update_annotation(db=db, annotation_id=annotation_id, label=annotation.label)
+  except crud.UnknownLabelError as e:
+    raise HTTPException(status_code=422, detail=str(e))
   if db_annotation is None:
     raise HTTPException(status_code=404, detail="Annotation not found")
   return db_annotation
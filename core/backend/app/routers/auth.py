@@ -4,8 +4,6 @@ from fastapi import APIRouter, Depends, Request, HTTPException, FastAPI
 from fastapi.responses import JSONResponse
 
 from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from dotenv import load_dotenv
 
 from core.backend.app.dependencies import create_access_token
@@ -32,6 +30,10 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 @router.post("/callback")
 async def auth_callback(token: dict, db: Session = Depends(get_db)):
   """Handle the OAuth 2.0 callback and fetch user information."""
+  # google-auth is slow to import and only needed at sign-in
+  from google.oauth2 import id_token
+  from google.auth.transport import requests as google_requests
+
   try:
     idinfo = id_token.verify_oauth2_token(token["token"], google_requests.Request(), GOOGLE_CLIENT_ID)
     logger.info("ID token verified successfully.")
@@ -1,11 +1,12 @@
 from typing import List
 import csv
-import json
-import pandas as pd
+import asyncio
 import json
 from io import StringIO
-from fastapi import APIRouter, Depends, HTTPException, Request, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, File, UploadFile, Query
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from fastapi.responses import StreamingResponse
@@ -15,12 +16,18 @@ import xml.etree.ElementTree as ET
 import core.backend.app.crud as crud
 import core.backend.app.schema as schema
 import core.backend.app.model as model
-from core.backend.app.database import get_db
-from core.backend.app.utils import get_final_annotation
+from core.backend.app import events, caching, dedup
+from core.backend.app.database import get_db, SessionLocal
+from core.backend.app.predictions import parse_prediction_csv, PredictionFormatError
+from core.backend.app.utils import get_final_annotation, encode_bitmap, encode_runs, encode_id_ranges
 router = APIRouter()
 
 @router.get("/", response_model=List[schema.Project])
-async def get_projects_data(db: Session = Depends(get_db)):
+async def get_projects_data(request: Request, response: Response, db: Session = Depends(get_db)):
+  validators = caching.project_list_validators(db, request)
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
   projects = crud.get_projects(db)
   return projects
 
@@ -29,16 +36,68 @@ async def create_project(project: schema.ProjectCreate, db: Session = Depends(ge
   project = crud.create_project(db=db, project=project)
   return project
 
+# Declared before /{project_id}, which would otherwise capture these paths
+@router.get("/schedule", response_model=List[schema.ProjectSchedule])
+def read_schedule(db: Session = Depends(get_db)):
+  """
+  Every project's deadline schedule, most urgent first. Read-only; the stored
+  priorities are refreshed by POST /schedule, the queue endpoint and `cli schedule`.
+  """
+  schedules = crud.get_project_schedules(db)
+  return sorted(schedules, key=lambda schedule: schedule["priority"], reverse=True)
+
+@router.post("/schedule", response_model=List[schema.ProjectSchedule])
+def refresh_schedule(db: Session = Depends(get_db)):
+  """
+  Recompute and store the priorities that order annotators' queues.
+  """
+  schedules = crud.refresh_project_priorities(db)
+  return sorted(schedules, key=lambda schedule: schedule["priority"], reverse=True)
+
 @router.put("/{project_id}", response_model=schema.Project)
 def update_project(project_id: int, project_update: schema.ProjectUpdate, db: Session = Depends(get_db)):
   project = crud.update_project(db, project_id=project_id, project_update=project_update)
   return project
 
 @router.get("/{project_id}", response_model=schema.Project)
-def read_project(request: Request, project_id: int, db: Session = Depends(get_db)):
+def read_project(request: Request, response: Response, project_id: int, db: Session = Depends(get_db)):
+  validators = caching.project_validators(db, request, project_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
   project = crud.get_project(db, project_id=project_id)
   return project
 
+@router.get("/{project_id}/schedule", response_model=schema.ProjectSchedule)
+def read_project_schedule(project_id: int, db: Session = Depends(get_db)):
+  schedules = crud.get_project_schedules(db, project_id=project_id)
+  if not schedules:
+    raise HTTPException(status_code=404, detail="Project not found")
+  return schedules[0]
+
+@router.get("/{project_id}/labels", response_model=List[schema.Label])
+def read_project_labels(request: Request, response: Response, project_id: int,
+                        include_retired: bool = False, db: Session = Depends(get_db)):
+  """
+  The project's label vocabulary with the IDs annotations and reviews reference.
+  """
+  validators = caching.project_validators(db, request, project_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
+  return crud.get_project_labels(db, project_id, include_retired=include_retired)
+
+@router.post("/{project_id}/clone", response_model=schema.Project)
+def clone_project(project_id: int, project_clone: schema.ProjectClone, db: Session = Depends(get_db)):
+  project = crud.clone_project(db, project_id=project_id, project_clone=project_clone)
+  if project is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  return project
+
 @router.delete("/{project_id}", response_model=schema.Project)
 def delete_project(project_id: int, db: Session = Depends(get_db)):
   project = crud.delete_project(db, project_id)
@@ -48,41 +107,180 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
 
 @router.post("/{project_id}/tasks", response_model=schema.Task)
 def create_task(project_id: int, task: schema.TaskCreate, db: Session = Depends(get_db)):
-  return crud.create_task(db=db, project_id=project_id, task=task)
+  return crud.upsert_task(db=db, project_id=project_id, task=task)
+
+@router.post("/{project_id}/tasks/bulk-delete", response_model=schema.TaskBulkDeleteResponse)
+def delete_tasks(project_id: int, task_delete: schema.TaskBulkDelete, db: Session = Depends(get_db)):
+  if crud.get_project(db, project_id=project_id) is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  deleted = crud.delete_tasks(db, project_id=project_id, task_ids=task_delete.task_ids)
+  return {"deleted": deleted}
 
 @router.get("/{project_id}/tasks", response_model=List[schema.TaskRetrieve])
 def get_tasks_by_project(project_id: int, db: Session = Depends(get_db)):
-  tasks = crud.get_tasks_in_project(db, project_id=project_id)
-  return tasks
+  # Returned directly: the rows already match the response model
+  return ORJSONResponse(crud.get_task_rows_in_project(db, project_id=project_id))
+
+# Map Browsing Endpoints
+def _bbox(west: float = Query(default=-180, ge=-180, le=180),
+          south: float = Query(default=-90, ge=-90, le=90),
+          east: float = Query(default=180, ge=-180, le=180),
+          north: float = Query(default=90, ge=-90, le=90)) -> dict:
+  # A west edge greater than the east edge crosses the antimeridian
+  if south > north:
+    raise HTTPException(status_code=422, detail="south must not exceed north")
+  return {"west": west, "south": south, "east": east, "north": north}
+
+@router.get("/{project_id}/tasks/locations", response_model=List[schema.TaskLocation])
+def read_task_locations(request: Request, project_id: int,
+                        bbox: dict = Depends(_bbox),
+                        limit: int = Query(default=1000, ge=1, le=10000),
+                        db: Session = Depends(get_db)):
+  """
+  Tasks with coordinates inside the bounding box, by task ID.
+  """
+  validators = caching.project_validators(db, request, project_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  response = ORJSONResponse(crud.get_task_locations(db, project_id, limit=limit, **bbox))
+  caching.set_cache_headers(response, validators)
+  return response
+
+@router.get("/{project_id}/tasks/clusters", response_model=List[schema.TaskCluster])
+def read_task_clusters(request: Request, project_id: int,
+                       zoom: int = Query(ge=0, le=22),
+                       bbox: dict = Depends(_bbox),
+                       db: Session = Depends(get_db)):
+  """
+  Task counts per map cell for a web map zoom level, so a map shows a
+  region's tasks without downloading them.
+  """
+  validators = caching.project_validators(db, request, project_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  response = ORJSONResponse(crud.get_task_clusters(db, project_id, zoom, **bbox))
+  caching.set_cache_headers(response, validators)
+  return response
 
 @router.get("/{project_id}/statistics", response_model=schema.Stats)
 def get_project_statistics(project_id: int, db: Session = Depends(get_db)):
-  totalTasks = len(crud.get_tasks_in_project(db=db, project_id=project_id))
-  completedTasks = len(crud.get_completed_annotations(db, project_id=project_id))
-  pendingTasks = totalTasks - completedTasks
-  totalAnnotations = len(crud.get_annotations(db, project_id))
-  accuracyRate = 0.00
-
-  stats = schema.Stats(
-    totalTasks = totalTasks,
-    completedTasks = completedTasks,
-    pendingTasks = pendingTasks,
-    totalAnnotations = totalAnnotations,
-    accuracyRate = accuracyRate
-  )
+  stats = crud.get_project_statistics(db, project_id)
+  if stats is None:
+    raise HTTPException(status_code=404, detail="Project not found")
   return stats
 
+def _statistics_snapshot(project_id: int, subscription: events.Subscription):
+  # Short-lived session: an open event stream must not hold a pooled connection
+  with SessionLocal() as db:
+    # Read before the statistics, so that a write in between is reported again
+    subscription.version = crud.get_project_versions(db, [project_id]).get(project_id)
+    return crud.get_project_statistics(db, project_id)
+
+def _project_versions(project_ids: List[int]):
+  with SessionLocal() as db:
+    return crud.get_project_versions(db, project_ids)
+
+@router.get("/{project_id}/events")
+async def stream_project_events(request: Request, project_id: int):
+  """
+  Server-sent events for a project dashboard.
+
+  Starts with a "snapshot" event carrying the project statistics, followed by
+  incremental events (annotation.created, review.submitted, assignment.changed, ...)
+  whose "delta" holds the counter increments. A new snapshot is sent whenever
+  counters cannot be updated incrementally, including after writes served by
+  other workers or instances.
+  """
+  subscription = events.broker.subscribe(project_id)
+  stats = await run_in_threadpool(_statistics_snapshot, project_id, subscription)
+  if stats is None:
+    events.broker.unsubscribe(subscription)
+    raise HTTPException(status_code=404, detail="Project not found")
+  events.broker.watch(_project_versions)
+
+  async def event_stream():
+    try:
+      yield events.format_sse("snapshot", stats.model_dump())
+      while True:
+        try:
+          event = await asyncio.wait_for(subscription.queue.get(), timeout=events.KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+          if await request.is_disconnected():
+            break
+          yield ": keepalive\n\n"
+          continue
+
+        if event["type"] == events.STALE:
+          snapshot = await run_in_threadpool(_statistics_snapshot, project_id, subscription)
+          if snapshot is None:
+            yield events.format_sse(events.PROJECT_DELETED, {}, event["id"])
+            break
+          yield events.format_sse("snapshot", snapshot.model_dump(), event["id"])
+          continue
+
+        yield events.format_sse(event["type"], {"data": event["data"], "delta": event["delta"]}, event["id"])
+        if event["type"] == events.PROJECT_DELETED:
+          break
+    finally:
+      events.broker.unsubscribe(subscription)
+
+  # identity encoding keeps the compression middleware from buffering the stream
+  return StreamingResponse(event_stream(),
+                           media_type="text/event-stream",
+                           headers={"Cache-Control": "no-cache",
+                                    "Content-Encoding": "identity",
+                                    "X-Accel-Buffering": "no"})
+
 @router.get("/{project_id}/user/{user_id}/assigned-annotations/tasks", response_model=List[schema.TaskRetrieve])
 def get_assigned_annotation_tasks(project_id: int, user_id: int, db: Session = Depends(get_db)):
-  tasks = crud.get_assigned_tasks_by_type_and_project(
+  tasks = crud.get_assigned_task_rows(
     db, user_id=user_id, assignment_type=schema.RoleToAssignment.annotator, project_id=project_id)
-  return tasks
+  return ORJSONResponse(tasks)
 
 @router.get("/{project_id}/user/{user_id}/assigned-reviews/tasks", response_model=List[schema.TaskRetrieve])
 def get_assigned_review_tasks(project_id: int, user_id: int, db: Session = Depends(get_db)):
-  tasks = crud.get_assigned_tasks_by_type_and_project(
+  tasks = crud.get_assigned_task_rows(
     db, user_id=user_id, assignment_type=schema.RoleToAssignment.reviewer, project_id=project_id)
-  return tasks
+  return ORJSONResponse(tasks)
+
+@router.get("/{project_id}/labeled-status", response_model=schema.LabeledStatus)
+def get_labeled_status(request: Request,
+                       response: Response,
+                       project_id: int,
+                       user_id: int,
+                       task_type: schema.AssignmentType = schema.AssignmentType.annotation,
+                       encoding: schema.LabeledStatusEncoding = schema.LabeledStatusEncoding.bitmap,
+                       assigned_only: bool = False,
+                       db: Session = Depends(get_db)):
+  """
+  Labeled status of every task in the project (or only those assigned to the
+  user) for one user, as a bitmap or run lengths aligned with ascending task IDs.
+  """
+  validators = caching.labeled_status_validators(db, request, project_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
+
+  rows = crud.get_labeled_status(db, project_id=project_id, user_id=user_id,
+                                 assignment_type=task_type, assigned_only=assigned_only)
+  flags = [labeled for _, labeled in rows]
+  status = encode_bitmap(flags) if encoding == schema.LabeledStatusEncoding.bitmap else encode_runs(flags)
+  return {
+    "project_id": project_id,
+    "user_id": user_id,
+    "task_type": task_type,
+    "encoding": encoding,
+    "count": len(flags),
+    "labeled": sum(flags),
+    "task_ids": encode_id_ranges(task_id for task_id, _ in rows),
+    "status": status,
+  }
 
 # Update Tasks from CSV Endpoint
 @router.post("/{project_id}/upload-tasks-from-csv", response_class=JSONResponse)
@@ -90,31 +288,79 @@ async def update_csv(project_id: int, file: UploadFile = File(...), db: Session
   if file.content_type != 'text/csv':
     raise HTTPException(status_code=400, detail="Invalid file type. Only CSV files are accepted.")
   
+  import pandas as pd
+
   contents = await file.read()
   df = pd.read_csv(StringIO(contents.decode('utf-8')))
 
+  existing_tasks = {task.external_id: task for task in crud.get_tasks_in_project(db, project_id=project_id)}
+  created = 0
   for _, row in df.iterrows():
-    task_id = row['example_id']
+    external_id = str(row['example_id'])
     image = row['image']
     additional_data = {col: row[col] for col in df.columns if col not in ['example_id', 'image']}
 
-    existing_task = crud.get_task(db=db, task_id=task_id)
+    existing_task = existing_tasks.get(external_id)
     if existing_task:
+      if existing_task.image != image:
+        existing_task.image_hash = None
       existing_task.image = image
       existing_task.additional_data = json.dumps(additional_data)
-      db.commit()
-      db.refresh(existing_task)
+      crud.set_task_location(existing_task)
     else:
-      task = schema.TaskCreate(
-          task_id=task_id,
+      task = model.Task(
+          external_id=external_id,
           project_id=project_id,
           image=image,
-          additional_data=additional_data
+          additional_data=json.dumps(additional_data)
       )
-      crud.create_task(db=db, task=task)
+      crud.set_task_location(task)
+      db.add(task)
+      existing_tasks[external_id] = task
+      created += 1
+  versions = crud.bump_project_version(db, project_id)
+  db.commit()
+  if created:
+    events.broker.publish(project_id, "task.created", {"created": created},
+                          {"totalTasks": created, "pendingTasks": created}, versions)
  
   return {"message": "Tasks updated successfully"}
 
+# Import Model Predictions Endpoint
+@router.post("/{project_id}/predictions", response_model=schema.PredictionImport)
+async def upload_predictions(project_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+  """
+  Import model scores per label for the project's tasks from a CSV keyed by
+  example_id, with one column per label or `label` and `score` columns.
+  """
+  if file.content_type != 'text/csv':
+    raise HTTPException(status_code=400, detail="Invalid file type. Only CSV files are accepted.")
+  if crud.get_project(db, project_id=project_id) is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  contents = await file.read()
+  label_names = [label.name for label in crud.get_project_labels(db, project_id)]
+  try:
+    predictions = parse_prediction_csv(contents.decode('utf-8'), label_names)
+  except PredictionFormatError as error:
+    raise HTTPException(status_code=422, detail=str(error))
+  return crud.import_predictions(db, project_id, predictions)
+
+# Near-duplicate Detection Endpoint
+@router.post("/{project_id}/deduplicate", response_model=schema.DeduplicationResult)
+def deduplicate_tasks(project_id: int,
+                      max_distance: int = Query(default=dedup.DEDUP_MAX_DISTANCE, ge=0, le=dedup.HASH_BITS),
+                      db: Session = Depends(get_db)):
+  """
+  Hash new task images and group near-duplicates, which are then left out of
+  auto-assignment and exported with their group's label.
+  """
+  if crud.get_project(db, project_id=project_id) is None:
+    raise HTTPException(status_code=404, detail="Project not found")
+  try:
+    return crud.deduplicate_tasks(db, project_id, max_distance=max_distance)
+  except RuntimeError as error:
+    raise HTTPException(status_code=501, detail=str(error))
+
 @router.get("/{project_id}/annotated-tasks")
 def get_annotated_tasks(request: Request, project_id: int, db: Session = Depends(get_db)):
   tasks_with_annotations = crud.get_tasks_with_annotations(db, project_id)
@@ -124,6 +370,7 @@ def get_annotated_tasks(request: Request, project_id: int, db: Session = Depends
   for task in tasks_with_annotations:
     task_info = {
         "task_id": task["task_id"],
+        "external_id": task["external_id"],
         "image": task["image"],
         "labels": task["labels"],
         "reviewers": reviewers
@@ -133,38 +380,55 @@ def get_annotated_tasks(request: Request, project_id: int, db: Session = Depends
 
 import ast
 
+def _parse_additional_data(additional_data: str) -> dict:
+  # Stored as JSON; rows written by older releases hold a Python dict repr
+  try:
+    return json.loads(additional_data)
+  except ValueError:
+    return ast.literal_eval(additional_data)
+
 @router.get("/{project_id}/export-annotations")
 def export_annotations(project_id: int, format: str, db: Session = Depends(get_db)):
-  annotated_tasks = db.query(model.Task).join(model.Annotation).filter(model.Task.project_id == project_id).all()
+  annotated_tasks = crud.get_annotated_tasks_with_labels(db, project_id)
+  exported = [(task, get_final_annotation([ann.label for ann in task.annotations], [rev.label for rev in task.reviews]))
+              for task in annotated_tasks]
+  # Near-duplicates that were not labeled themselves take their group's label
+  annotated_ids = {task.task_id for task in annotated_tasks}
+  duplicates = crud.get_duplicates(db, sorted(annotated_ids))
+  exported += [(duplicate, final_annotation)
+               for task, final_annotation in exported
+               for duplicate in duplicates.get(task.task_id, [])
+               if duplicate.task_id not in annotated_ids]
 
-  # Placeholder for actual data columns
-  filter_columns = ['task_id', 'image']
+  # Exported task_id is the example ID the tasks were uploaded with
+  filter_columns = ['external_id', 'image']
+  header_columns = ['task_id', 'image']
   computed_columns = ['final_annotations']
 
   # Assuming all tasks have the same structure of additional_data
-  additional_data_columns = list(ast.literal_eval(annotated_tasks[0].additional_data).keys()) if annotated_tasks else []
+  additional_data = [_parse_additional_data(task.additional_data) for task, _ in exported]
+  additional_data_columns = list(additional_data[0].keys()) if exported else []
 
   if format == 'csv':
     output = StringIO()
     writer = csv.writer(output)
-    writer.writerow(filter_columns + computed_columns + additional_data_columns)
-    for task in annotated_tasks:
+    writer.writerow(header_columns + computed_columns + additional_data_columns)
+    for (task, final_annotation), task_data in zip(exported, additional_data):
       row = [getattr(task, col) for col in filter_columns]
-      final_annotation = get_final_annotation([ann.label for ann in task.annotations], [rev.label for rev in task.reviews])
       row.append(final_annotation)
-      row.extend([ast.literal_eval(task.additional_data).get(col) for col in additional_data_columns])
+      row.extend([task_data.get(col) for col in additional_data_columns])
       writer.writerow(row)
-    output.seek(0)
-    response = StreamingResponse(output, media_type='text/csv', headers={'Content-Disposition': f'attachment; filename="{project_id}_annotations.csv"'})
+    # The export is built in memory; a single body avoids streaming it line by line
+    response = Response(output.getvalue(), media_type='text/csv', headers={'Content-Disposition': f'attachment; filename="{project_id}_annotations.csv"'})
 
   elif format == 'json':
     data = [{
-        **{col: getattr(task, col) for col in filter_columns},
-        "final_annotations": get_final_annotation([ann.label for ann in task.annotations], [rev.label for rev in task.reviews]),
-        **ast.literal_eval(task.additional_data)
-    } for task in annotated_tasks]
-    output = json.dumps(data, indent=4)
-    response = StreamingResponse(BytesIO(output.encode('utf-8')), media_type='application/json', headers={'Content-Disposition': f'attachment; filename="{project_id}_annotations.json"'})
+        **{header: getattr(task, col) for header, col in zip(header_columns, filter_columns)},
+        "final_annotations": final_annotation,
+        **task_data
+    } for (task, final_annotation), task_data in zip(exported, additional_data)]
+    output = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    response = Response(output, media_type='application/json', headers={'Content-Disposition': f'attachment; filename="{project_id}_annotations.json"'})
   else:
     raise HTTPException(status_code=400, detail="Unsupported file format")
 
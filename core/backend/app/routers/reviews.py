@@ -10,7 +10,10 @@ router = APIRouter()
 
 @router.post("/", response_model=schema.Review)
 def create_review(review: schema.ReviewCreate, db: Session = Depends(get_db)):
-  return crud.create_review(db=db, label=review.label, task_id=review.task_id, reviewer_id=review.user_id)
+  try:
+    return crud.create_review(db=db, label=review.label, task_id=review.task_id, reviewer_id=review.user_id)
+  except crud.UnknownLabelError as e:
+    raise HTTPException(status_code=422, detail=str(e))
 
 @router.get("/{review_id}", response_model=schema.Review)
 def read_review(review_id: int, db: Session = Depends(get_db)):
@@ -26,7 +29,10 @@ def read_reviews(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
 
 @router.put("/{review_id}", response_model=schema.Review)
 def update_review(review_id: int, review: schema.ReviewUpdate, db: Session = Depends(get_db)):
-  db_review = crud.update_review(db=db, review_id=review_id, label=review.label)
+  try:
+    db_review = crud.update_review(db=db, review_id=review_id, label=review.label)
+  except crud.UnknownLabelError as e:
+    raise HTTPException(status_code=422, detail=str(e))
   if db_review is None:
     raise HTTPException(status_code=404, detail="Review not found")
   return db_review
@@ -1,14 +1,16 @@
+import json
 from typing import List, Dict, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Response, Query
 
 from fastapi.requests import Request
 from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 import core.backend.app.crud as crud
 import core.backend.app.schema as schema
 import core.backend.app.model as model
+from core.backend.app import caching
 from core.backend.app.database import get_db
 from core.backend.app.dependencies import get_current_role, get_current_user
 
@@ -18,6 +20,7 @@ router = APIRouter()
 async def get_tasks_by_label_status(request: Request,
                                     project_id: int,
                                     labeled: Optional[bool] = None,
+                                    order: Optional[schema.TaskOrder] = None,
                                     db: Session = Depends(get_db),
                                     role: str = Depends(get_current_role)):
     user_info = get_current_user(request)
@@ -25,7 +28,8 @@ async def get_tasks_by_label_status(request: Request,
     user = crud.get_user(db, user_id)
     
     assigned_tasks = crud.get_assigned_tasks_by_type_and_project(db, 
-                                user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
+                                user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id,
+                                load_labels=labeled is not None, order=order)
     
     if labeled is not None:
       if role == schema.UserRole.annotator:
@@ -34,53 +38,37 @@ async def get_tasks_by_label_status(request: Request,
         assigned_tasks = [task for task in assigned_tasks if any(review.user_id == user.user_id for review in task.reviews) == labeled]
     return assigned_tasks
 
-@router.get("/{task_id}", response_class=JSONResponse)
-def get_task(task_id: str, db: Session = Depends(get_db)):
-  task = crud.get_task(db, task_id)
-  image_url = task.image.replace("gs://", "https://storage.cloud.google.com/")
-  response_data = {
-      "task_id": task.task_id,
-      "image": image_url,
-  }
-  return response_data
-
-# Update Task Endpoint
-@router.put("/{task_id}", response_model=schema.Task)
-def update_task(task_id: str, task: schema.TaskUpdate, db: Session = Depends(get_db)):
-  db_task = crud.update_task(db=db, task_id=task_id, task_update=task)
-  if db_task is None:
-    raise HTTPException(status_code=404, detail="Task not found")
-  return db_task
-
-# Delete Task Endpoint
-@router.delete("/{task_id}", response_model=schema.Task)
-def delete_task(task_id: str, db: Session = Depends(get_db)):
-  db_task = crud.delete_task(db=db, task_id=task_id)
-  if db_task is None:
-    raise HTTPException(status_code=404, detail="Task not found")
-  return db_task
-
+# Declared before /{task_id}, which would otherwise capture this path
 @router.get("/task-details")
 async def get_task_details(request: Request,
                           project_id: int,
-                          task_id: str,
+                          task_id: int,
                           role: str,
                           db: Session = Depends(get_db)
                           ):
-  task = crud.get_task(db, task_id=task_id)
-  if not task:
+  validators = caching.task_project_validators(db, request, task_id)
+  if validators is None:
     raise HTTPException(status_code=404, detail="Task not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+
+  task = crud.get_task(db, task_id=task_id)
 
   image_url = task.image.replace("gs://", "https://storage.cloud.google.com/")
   response_data = {
       "task_id": task.task_id,
+      "external_id": task.external_id,
       "image": image_url,
   }
 
   if role == schema.UserRole.admin:
-    users_assigned_to_task = crud.get_users_assigned_to_task(db, task_id=task_id, project_id=project_id)
-    response_data["assigned_users"] = [crud.get_user(db, user.user_id) for user in users_assigned_to_task]
-    return JSONResponse(content=response_data)
+    users_assigned_to_task = crud.get_users_for_task_assignments(db, task_id=task_id, project_id=project_id)
+    response_data["assigned_users"] = [
+        {"user_id": user.user_id, "username": user.username, "email": user.email} for user in users_assigned_to_task
+    ]
+    response = ORJSONResponse(content=response_data)
+    caching.set_cache_headers(response, validators)
+    return response
   else:
     user_info = get_current_user(request)
     user_id = user_info["user_id"]
@@ -90,17 +78,53 @@ async def get_task_details(request: Request,
                               user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
     current_task_index = next((i for i, t in enumerate(all_assigned_tasks) if t.task_id == task_id), -1)
     all_tasks_dict = [
-        {"task_id": t.task_id, "image": t.image.replace("gs://", "https://storage.cloud.google.com/")} for t in all_assigned_tasks
+        {"task_id": t.task_id, "external_id": t.external_id, "image": t.image.replace("gs://", "https://storage.cloud.google.com/")} for t in all_assigned_tasks
     ]
     response_data.update({
         "tasks_json": all_tasks_dict,
         "current_task_index": current_task_index,
         "user_id": user.user_id,
     })
-    return JSONResponse(content=response_data)
+    response = ORJSONResponse(content=response_data)
+    caching.set_cache_headers(response, validators)
+    return response
+
+@router.get("/{task_id}", response_class=JSONResponse)
+def get_task(request: Request, response: Response, task_id: int, db: Session = Depends(get_db)):
+  validators = caching.task_project_validators(db, request, task_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Task not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
+  task = crud.get_task(db, task_id)
+  image_url = task.image.replace("gs://", "https://storage.cloud.google.com/")
+  response_data = {
+      "task_id": task.task_id,
+      "external_id": task.external_id,
+      "image": image_url,
+  }
+  return response_data
+
+# Update Task Endpoint
+@router.put("/{task_id}", response_model=schema.Task)
+def update_task(task_id: int, task: schema.TaskUpdate, db: Session = Depends(get_db)):
+  additional_data = json.dumps(task.additional_data) if task.additional_data is not None else None
+  db_task = crud.update_task(db=db, task_id=task_id, image=task.image, additional_data=additional_data)
+  if db_task is None:
+    raise HTTPException(status_code=404, detail="Task not found")
+  return db_task
+
+# Delete Task Endpoint
+@router.delete("/{task_id}", response_model=schema.Task)
+def delete_task(task_id: int, db: Session = Depends(get_db)):
+  db_task = crud.delete_task(db=db, task_id=task_id)
+  if db_task is None:
+    raise HTTPException(status_code=404, detail="Task not found")
+  return db_task
 
 @router.get("/{task_id}/is_labeled")
-async def is_task_labeled(task_id: str, user_id: int, task_type: str, db: Session = Depends(get_db)):
+async def is_task_labeled(task_id: int, user_id: int, task_type: str, db: Session = Depends(get_db)):
   if task_type == schema.AssignmentType.annotation:
     query_response = db.query(model.Annotation).filter(
         model.Annotation.task_id == task_id,
@@ -134,68 +158,53 @@ async def are_tasks_labeled(label_check: schema.LabelCheck, db: Session = Depend
     ).all()
 
   labeled_task_ids = {result[0] for result in query_response}
-  return {task_id: task_id in labeled_task_ids for task_id in label_check.task_ids}
+  return {str(task_id): task_id in labeled_task_ids for task_id in label_check.task_ids}
 
 @router.get("/fetchall/imgUrl-and-labelStatus", response_model=List[schema.TaskResponse])
 async def get_tasks_url_label_status(project_id: int,
                                   user_id: int,
                                   role: str,
+                                  order: schema.TaskOrder = schema.TaskOrder.task_id,
                                   db: Session = Depends(get_db)
                                   ):
   
-  user = crud.get_user(db, user_id)
-
   if role == schema.UserRole.admin:
-    tasks = crud.get_tasks_in_project(db, project_id=project_id)
-  
-  elif role == schema.UserRole.annotator:
-    tasks = crud.get_assigned_tasks_by_type_and_project(db, 
-                      user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
+    tasks = crud.get_task_label_rows(db, project_id=project_id, order=order)
   
-  elif role == schema.UserRole.reviewer:
-    tasks = crud.get_assigned_tasks_by_type_and_project(db, 
-                      user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
+  elif role in (schema.UserRole.annotator, schema.UserRole.reviewer):
+    tasks = crud.get_task_label_rows(db, project_id=project_id,
+                      user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, order=order)
   else:
     return []
 
   tasks_response = []
   for task in tasks:
     if role == schema.UserRole.annotator:
-      completion_status = any(annotation.user_id == user.user_id for annotation in task.annotations)
+      completion_status = any(label_user_id == user_id for label_user_id, _ in task["annotations"])
     else:
-      completion_status = any(review.user_id == user.user_id for review in task.reviews)
-    image_url =  task.image.replace("gs://", "https://storage.cloud.google.com/")
+      completion_status = any(label_user_id == user_id for label_user_id, _ in task["reviews"])
+    image_url =  task["image"].replace("gs://", "https://storage.cloud.google.com/")
 
     tasks_response.append({
-        "task_id": task.task_id,
+        "task_id": task["task_id"],
+        "external_id": task["external_id"],
         "image_url": image_url,
         "completion_status": completion_status,
-        "annotations": [annotation.label for annotation in task.annotations],
-        "reviews": [review.label for review in task.reviews]
+        "annotations": [label for _, label in task["annotations"]],
+        "reviews": [label for _, label in task["reviews"]]
     })
-  return tasks_response
+  # Returned directly: the dicts already match the response model
+  return ORJSONResponse(tasks_response)
 
 @router.get("/fetch/imgUrl-and-labelStatus", response_model=schema.TaskResponse)
 async def get_tasks_url_label_status(project_id: int,
                                   user_id: int,
                                   role: str,
-                                  task_id: str,
+                                  task_id: int,
                                   db: Session = Depends(get_db)
                                   ):
   
   user = crud.get_user(db, user_id)
-
-  if role == schema.UserRole.admin:
-    tasks = crud.get_tasks_in_project(db, project_id=project_id)
-  
-  elif role == schema.UserRole.annotator:
-    tasks = crud.get_assigned_tasks_by_type_and_project(db, 
-                      user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
-  
-  else:
-    tasks = crud.get_assigned_tasks_by_type_and_project(db, 
-                      user_id=user_id, assignment_type=schema.RoleToAssignment[role].value, project_id=project_id)
-  
   task = crud.get_task(db=db, task_id=task_id)
   # Transform tasks to match the expected response structure
   task_response = []
@@ -211,6 +220,7 @@ async def get_tasks_url_label_status(project_id: int,
 
   task_response = {
       "task_id": task.task_id,
+      "external_id": task.external_id,
       "image_url": image_url,
       "completion_status": completion_status,
       "annotations": [annotation.label for annotation in task.annotations],
@@ -218,24 +228,33 @@ async def get_tasks_url_label_status(project_id: int,
   }
   return task_response
 
+@router.get("/{task_id}/prediction", response_model=Optional[schema.Prediction])
+def read_task_prediction(task_id: int, db: Session = Depends(get_db)):
+  # None when no prediction was imported for the task
+  return crud.get_prediction(db, task_id)
+
 @router.get("/{task_id}/user/{user_id}/annotations", response_model=Optional[schema.Annotation])
-def read_annotation_by_task_and_user(task_id: str, user_id: int, db: Session = Depends(get_db)):
+def read_annotation_by_task_and_user(task_id: int, user_id: int, db: Session = Depends(get_db)):
   annotation = crud.get_annotation_by_task_annotator(db=db, annotator_id=user_id, task_id=task_id)
   return annotation
 
 @router.get("/{task_id}/user/{user_id}/reviews", response_model=Optional[schema.Review])
-def read_review_by_task_and_user(task_id: str, user_id: int, db: Session = Depends(get_db)):
+def read_review_by_task_and_user(task_id: int, user_id: int, db: Session = Depends(get_db)):
   review = crud.get_review_by_task_reviewer(db=db, reviewer_id=user_id, task_id=task_id)
   return review
 
 # Auto Assign Tasks Endpoint
 @router.get("/assign-tasks/auto", response_model=List[schema.TaskRetrieve])
-async def auto_assign_task(project_id: int, db: Session = Depends(get_db)):
-  tasks = crud.auto_assign_tasks_to_users(db, project_id=project_id)
+async def auto_assign_task(project_id: int,
+                           order: schema.TaskOrder = schema.TaskOrder.task_id,
+                           limit: Optional[int] = Query(default=None, ge=1),
+                           strategy: schema.AssignmentStrategy = schema.AssignmentStrategy.round_robin,
+                           db: Session = Depends(get_db)):
+  tasks = crud.auto_assign_tasks_to_users(db, project_id=project_id, order=order, limit=limit, strategy=strategy)
   return tasks
 
 @router.post("/{task_id}/assign", response_class=JSONResponse)
-async def assign_review_task(task_id: str, assignData: schema.TaskAssign , db: Session = Depends(get_db)):
+async def assign_review_task(task_id: int, assignData: schema.TaskAssign , db: Session = Depends(get_db)):
   try:
     tasks = crud.assign_task(db, task_id, assignData.user_id, assignData.assignment_type)
     return tasks
@@ -244,7 +263,7 @@ async def assign_review_task(task_id: str, assignData: schema.TaskAssign , db: S
 
 # Unassign Task Endpoint
 @router.post("/{task_id}/unassign", response_class=JSONResponse)
-async def unassign_task(task_id: str, taskUnAssign: schema.TaskUnAssign, db: Session = Depends(get_db)):
+async def unassign_task(task_id: int, taskUnAssign: schema.TaskUnAssign, db: Session = Depends(get_db)):
   try:
     crud.unassign_task(db, task_id=task_id, assignment_type=taskUnAssign.assignment_type)
     return {"message": "Task unassigned successfully"}
@@ -252,29 +271,30 @@ async def unassign_task(task_id: str, taskUnAssign: schema.TaskUnAssign, db: Ses
     return JSONResponse(status_code=400, content={"message": str(e)})
 
 @router.get("/{task_id}/default_label", response_model=schema.AnnotationRetrieve)
-def get_default_label(task_id: str, user_id: int, task_type: str, db: Session = Depends(get_db)):
+def get_default_label(task_id: int, user_id: int, task_type: str, db: Session = Depends(get_db)):
   if task_type==schema.AssignmentType.review:
     query_response = crud.get_default_review(db, task_id=task_id, user_id=user_id)
   else:
     query_response = crud.get_default_label(db, task_id=task_id, user_id=user_id)
   return {"label": query_response.label if query_response else None}
 
-def preprocess_labels(labels_str):
-  return [label.strip(' "') for label in labels_str.split(",")]
-
 @router.get("/{task_id}/labels", response_model=List[str])
-async def get_task_labels(task_id: str, db: Session = Depends(get_db)):
-  string_labels = crud.get_task(db, task_id).project.configurations.labels
-  labels = preprocess_labels(string_labels)
-  return labels
+async def get_task_labels(request: Request, response: Response, task_id: int, db: Session = Depends(get_db)):
+  validators = caching.task_project_validators(db, request, task_id)
+  if validators is None:
+    raise HTTPException(status_code=404, detail="Task not found")
+  if caching.is_not_modified(request, validators):
+    return caching.not_modified_response(validators)
+  caching.set_cache_headers(response, validators)
+  return crud.get_task(db, task_id).project.label_names
 
 @router.get("/{task_id}/reviewers", response_model=List[schema.UserRetrieve])
-async def get_reviewers_by_task(task_id: str, db: Session = Depends(get_db)):
+async def get_reviewers_by_task(task_id: int, db: Session = Depends(get_db)):
   reviewers = crud.get_reviewers_by_task(db, task_id=task_id)
   return reviewers
 
 @router.get("/{task_id}/assigned_users", response_model=schema.AssignedUsersRetrieve)
-async def get_annotators_and_reviewers_assigned_to_task(task_id: str, db: Session = Depends(get_db)):
+async def get_annotators_and_reviewers_assigned_to_task(task_id: int, db: Session = Depends(get_db)):
   users = crud.get_assigned_users_for_task(db, task_id=task_id)
   assigned_annotators, assigned_reviewers = users
   assigned_users = {
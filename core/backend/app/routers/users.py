@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi.responses import JSONResponse
 import core.backend.app.crud as crud
 import core.backend.app.schema as schema
+from core.backend.app import scheduling
 from core.backend.app.database import get_db
 from core.backend.app.dependencies import get_current_role
 
@@ -55,6 +56,18 @@ async def read_user(user_id: int, db: Session = Depends(get_db)):
     raise HTTPException(status_code=404, detail="User not found")
   return db_user
 
+@router.get("/{user_id}/queue", response_model=List[schema.QueuedTask])
+def read_user_queue(user_id: int,
+                    assignment_type: schema.AssignmentType = schema.AssignmentType.annotation,
+                    limit: Optional[int] = Query(default=None, ge=1),
+                    db: Session = Depends(get_db)):
+  """
+  The user's unlabeled tasks across projects, those of projects most at risk
+  of missing their deadline first.
+  """
+  crud.refresh_project_priorities(db, max_age=scheduling.SCHEDULE_REFRESH_SECONDS)
+  return crud.get_user_queue(db, user_id, assignment_type, limit=limit)
+
 @router.put("/{user_id}", response_model=schema.User)
 async def update_user(user_id: int, user: schema.UserUpdate, db: Session = Depends(get_db)):
   db_user = crud.update_user(db=db, user_id=user_id, username=user.username, email=user.email)
@@ -1,19 +1,34 @@
 import os
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from starlette.responses import FileResponse
-from core.backend.app.database import init_db
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from core.backend.app import startup
+from core.backend.app.database import init_db, INIT_DB_ON_STARTUP
+from core.backend.app.static import FRONTEND_BUILD_DIR, PrecompressedStaticFiles, SPAIndex
 
 router = APIRouter()
 
+spa_index = SPAIndex(os.path.join(FRONTEND_BUILD_DIR, "index.html"))
+# Root build files such as favicon.ico and manifest.json
+build_files = PrecompressedStaticFiles(directory=FRONTEND_BUILD_DIR, check_dir=False)
+
 @router.on_event("startup")
 def on_startup():
-  init_db()
+  # Deployments that run `cli init-db` as a release step can skip this
+  if INIT_DB_ON_STARTUP:
+    init_db()
+    startup.mark("init_db")
+  startup.report()
 
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-  return FileResponse("core/frontend/build/index.html")
+  return spa_index.response(request)
 
 @router.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
-  return FileResponse("core/frontend/build/index.html")
\ No newline at end of file
+async def serve_frontend(full_path: str, request: Request):
+  if full_path and full_path != "index.html":
+    try:
+      return await build_files.get_response(full_path, request.scope)
+    except StarletteHTTPException:
+      pass
+  return spa_index.response(request)
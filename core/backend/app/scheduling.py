@@ -0,0 +1,58 @@
+"""
+Deadline-aware scheduling: the annotation rate each project needs to meet its
+completion_deadline, compared with the rate it actually achieved recently.
+"""
+import os
+import datetime
+from typing import Dict, Optional
+
+# Trailing window over which the observed annotation rate is measured
+SCHEDULE_WINDOW_HOURS = float(os.getenv("SCHEDULE_WINDOW_HOURS", "24"))
+# Seconds a worker reuses stored priorities before recomputing them
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "300"))
+# Projects past their deadline with work left are treated as due within this many hours
+MIN_HOURS_LEFT = 1.0
+
+def annotations_target(max_annotators_per_task: int, adaptive: bool, min_annotators_per_task: int) -> int:
+  # Adaptive projects may need more, but only the first round is certain
+  target = max_annotators_per_task or 1
+  return min(min_annotators_per_task, target) if adaptive else target
+
+def remaining_annotations(histogram: Dict[int, int], target: int) -> int:
+  """
+  :param histogram: Number of tasks by how many annotations they have.
+  :return: Annotations still needed to bring every task to `target`.
+  """
+  return sum(tasks * max(target - annotations, 0) for annotations, tasks in histogram.items())
+
+def required_rate(remaining: int, deadline: Optional[datetime.datetime], now: datetime.datetime) -> Optional[float]:
+  """
+  :return: Annotations per hour needed to finish by `deadline`, or None without a deadline.
+  """
+  if deadline is None:
+    return None
+  if remaining <= 0:
+    return 0.0
+  hours_left = max((deadline - now).total_seconds() / 3600, MIN_HOURS_LEFT)
+  return remaining / hours_left
+
+def projected_completion(remaining: int, rate: float, now: datetime.datetime) -> Optional[datetime.datetime]:
+  """
+  :return: When the work left is done at `rate` annotations per hour, or None if it never is.
+  """
+  if remaining <= 0:
+    return now
+  if rate <= 0:
+    return None
+  return now + datetime.timedelta(hours=remaining / rate)
+
+def priority(required: Optional[float], observed: float) -> float:
+  """
+  Ratio of the required to the observed annotation rate; above 1 the project
+  falls behind its deadline. Projects without a deadline or work left get 0.
+  A project without recent annotations counts as one annotation per window,
+  so that priorities stay finite and still grow with the work left.
+  """
+  if not required:
+    return 0.0
+  return required / max(observed, 1 / SCHEDULE_WINDOW_HOURS)
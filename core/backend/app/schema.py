@@ -1,16 +1,29 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
 import datetime
 from fastapi import UploadFile
 
 # Project Models
+class AssignmentMode(str, Enum):
+  fixed = "fixed"
+  adaptive = "adaptive"
+
+class AssignmentStrategy(str, Enum):
+  round_robin = "round_robin"
+  # Contiguous blocks of nearby tasks per annotator
+  locality = "locality"
+
 class ProjectBase(BaseModel):
   project_title: str
   project_description: Optional[str] = ""
   labels: str
   max_annotators_per_task: Optional[int] = 1
   completion_deadline: Optional[datetime.datetime] = None
+  assignment_mode: AssignmentMode = AssignmentMode.fixed
+  min_annotators_per_task: int = Field(default=2, ge=1)
+  # Above one half, at most one label can reach consensus
+  consensus_threshold: float = Field(default=1.0, gt=0.5, le=1.0)
 
 class ProjectCreate(ProjectBase):
   pass
@@ -21,10 +34,49 @@ class ProjectUpdate(BaseModel):
   labels: Optional[str]
   max_annotators_per_task: Optional[int]
   completion_deadline: Optional[datetime.datetime]
+  assignment_mode: Optional[AssignmentMode] = None
+  min_annotators_per_task: Optional[int] = Field(default=None, ge=1)
+  consensus_threshold: Optional[float] = Field(default=None, gt=0.5, le=1.0)
+
+class ProjectClone(BaseModel):
+  project_title: Optional[str] = None
+  project_description: Optional[str] = None
+  labels: Optional[str] = None
+  max_annotators_per_task: Optional[int] = None
+  completion_deadline: Optional[datetime.datetime] = None
+  assignment_mode: Optional[AssignmentMode] = None
+  min_annotators_per_task: Optional[int] = Field(default=None, ge=1)
+  consensus_threshold: Optional[float] = Field(default=None, gt=0.5, le=1.0)
+  copy_assignments: bool = False
 
 class Project(ProjectBase):
   project_id: int
   created_at: datetime.datetime
+  # Deadline priority as of the last refresh; see ProjectSchedule
+  priority: float = 0.0
+
+  class Config:
+    from_attributes = True
+
+class ProjectSchedule(BaseModel):
+  project_id: int
+  project_title: str
+  completion_deadline: Optional[datetime.datetime] = None
+  total_tasks: int
+  remaining_annotations: int
+  # Annotations per hour; required_rate is None without a deadline
+  required_rate: Optional[float] = None
+  observed_rate: float
+  # None while no annotations were made in the recent window
+  projected_completion: Optional[datetime.datetime] = None
+  at_risk: bool
+  priority: float
+
+class Label(BaseModel):
+  label_id: int
+  name: str
+  position: int
+  active: bool
 
   class Config:
     from_attributes = True
@@ -96,9 +148,10 @@ class UserRetrieve(UserBase):
 
 # Task Models
 class TaskBase(BaseModel):
-  task_id: str
+  external_id: str
 
 class Task(TaskBase):
+  task_id: int
   project_id: int
   image: str
   additional_data: Optional[Dict] = None
@@ -112,6 +165,7 @@ class TaskCreate(TaskBase):
   additional_data: Optional[Dict] = None
 
 class TaskRetrieve(TaskBase):
+  task_id: int
   project_id: int
   image: str
   # additional_data: Dict
@@ -121,15 +175,60 @@ class TaskUpsert(TaskBase):
   image: str
   additional_data: Optional[Dict] = None
 
-class TaskUpdate(TaskBase):
-  pass
+class TaskUpdate(BaseModel):
+  image: Optional[str] = None
+  additional_data: Optional[Dict] = None
 
 class TaskResponse(TaskBase):
+  task_id: int
   image_url: str
   completion_status: bool
   annotations: list
   reviews: list
 
+class TaskOrder(str, Enum):
+  task_id = "task_id"
+  # Smallest margin between the two top predicted labels first
+  margin = "margin"
+  # Highest prediction entropy first
+  uncertainty = "uncertainty"
+
+class QueuedTask(TaskBase):
+  task_id: int
+  project_id: int
+  project_title: str
+  image: str
+  priority: float
+  completion_deadline: Optional[datetime.datetime] = None
+
+class TaskLocation(BaseModel):
+  task_id: int
+  external_id: str
+  image: str
+  latitude: float
+  longitude: float
+
+class TaskCluster(BaseModel):
+  geohash: str
+  count: int
+  # Mean position of the cell's tasks
+  latitude: float
+  longitude: float
+  # Set when the cell holds a single task
+  task_id: Optional[int] = None
+
+class DeduplicationResult(BaseModel):
+  hashed: int
+  unreadable: int
+  duplicates: int
+  groups: int
+
+class TaskBulkDelete(BaseModel):
+  task_ids: Optional[List[int]] = None
+
+class TaskBulkDeleteResponse(BaseModel):
+  deleted: int
+
 class TaskAssign(BaseModel):
   user_id: int
   assignment_type: AssignmentType
@@ -142,7 +241,7 @@ class AnnotationBase(BaseModel):
   label: str
 
 class AnnotationCreate(AnnotationBase):
-  task_id: str
+  task_id: int
   user_id: int
 
 class AnnotationUpdate(AnnotationBase):
@@ -150,7 +249,8 @@ class AnnotationUpdate(AnnotationBase):
 
 class Annotation(AnnotationBase):
   annotation_id: int
-  task_id: str
+  label_id: int
+  task_id: int
   user_id: int
 
   class Config:
@@ -160,11 +260,11 @@ class AnnotationRetrieve(BaseModel):
   label: Optional[str]
 
 class AnnotationByUserTask(BaseModel):
-  task_id: str
+  task_id: int
   user_id: int
 
 class AdminRetrieveAllAnnotations(BaseModel):
-  task_id: str
+  task_id: int
   image: str
   annotations: str
 
@@ -173,7 +273,7 @@ class ReviewBase(BaseModel):
   label: str
 
 class ReviewCreate(ReviewBase):
-  task_id: str
+  task_id: int
   user_id: int
 
 class ReviewUpdate(ReviewBase):
@@ -181,23 +281,65 @@ class ReviewUpdate(ReviewBase):
 
 class Review(ReviewBase):
   review_id: int
-  task_id: str
+  label_id: int
+  task_id: int
   user_id: int
 
   class Config:
     from_attributes = True
 
 class LabelCheck(BaseModel):
-  task_ids: List[str]
+  task_ids: List[int]
   user_id: int
   task_type: str
 
+class LabeledStatusEncoding(str, Enum):
+  bitmap = "bitmap"
+  rle = "rle"
+
+class LabeledStatus(BaseModel):
+  project_id: int
+  user_id: int
+  task_type: AssignmentType
+  encoding: LabeledStatusEncoding
+  count: int
+  labeled: int
+  # Task IDs in status order, as [first_task_id, count] ranges of consecutive IDs
+  task_ids: List[List[int]]
+  # Base64 bitmap (most significant bit first) or alternating run lengths starting with unlabeled
+  status: Union[str, List[int]]
+
+# Prediction Models
+class PredictionScore(BaseModel):
+  label: str
+  score: float
+
+  class Config:
+    from_attributes = True
+
+class Prediction(BaseModel):
+  task_id: int
+  label: str
+  label_id: int
+  confidence: float
+  margin: float
+  entropy: float
+  scores: List[PredictionScore]
+
+  class Config:
+    from_attributes = True
+
+class PredictionImport(BaseModel):
+  imported: int
+  # Example IDs of the file without a task in the project
+  unknown_examples: List[str]
+
 # Assigned Task Models
 class AssignedTaskBase(BaseModel):
   task_type: str
 
 class AssignedTaskCreate(AssignedTaskBase):
-  task_id: str
+  task_id: int
   user_id: int
 
 class AssignedTaskUpdate(AssignedTaskBase):
@@ -205,7 +347,7 @@ class AssignedTaskUpdate(AssignedTaskBase):
 
 class AssignedTask(AssignedTaskBase):
   assignment_id: int
-  task_id: str
+  task_id: int
   user_id: int
 
   class Config:
@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Logs how long each startup phase took once the app is ready
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+# Modules that should only be imported when an endpoint needs them
+LAZY_MODULES = ("pandas", "numpy", "google.oauth2", "google.cloud.sql.connector")
+
+_started = time.perf_counter()
+_last = _started
+_phases: List[Tuple[str, float]] = []
+
+def mark(phase: str):
+  """
+  Record the time elapsed since the previous mark under `phase`.
+  """
+  global _last
+  now = time.perf_counter()
+  _phases.append((phase, now - _last))
+  _last = now
+
+def phases() -> List[Tuple[str, float]]:
+  return list(_phases)
+
+def report():
+  if not STARTUP_PROFILE:
+    return
+  total = time.perf_counter() - _started
+  timings = ", ".join(f"{phase} {elapsed * 1000:.0f} ms" for phase, elapsed in _phases)
+  loaded = [module for module in LAZY_MODULES if module in sys.modules]
+  logger.warning(f"Startup took {total * 1000:.0f} ms ({timings}); "
+                 f"lazy modules loaded at startup: {', '.join(loaded) or 'none'}")
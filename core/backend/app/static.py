@@ -0,0 +1,123 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from core.backend.app.compression import brotli, negotiate_encoding, COMPRESSIBLE_TYPES
+
+FRONTEND_BUILD_DIR = "core/frontend/build"
+
+# Precompressed variants next to each file, in order of preference
+PRECOMPRESSED_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+# Build tools put a content hash in bundle names (main.3f2a9c1e.js, logo.6ce24c58.svg)
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+def cache_control_for(path: str) -> str:
+  return IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE_CACHE_CONTROL
+
+class PrecompressedStaticFiles(StaticFiles):
+  """
+  StaticFiles serving prebuilt .br/.gz siblings when the client accepts them,
+  with immutable caching for content-hashed files.
+  """
+  def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+    request_headers = Headers(scope=scope)
+    full_path = str(full_path)
+    response = None
+
+    accept_encoding = request_headers.get("accept-encoding", "")
+    for encoding, extension in PRECOMPRESSED_EXTENSIONS.items():
+      if negotiate_encoding(accept_encoding, [encoding]) is None:
+        continue
+      try:
+        compressed_stat = os.stat(full_path + extension)
+      except OSError:
+        continue
+      response = FileResponse(full_path + extension,
+                              status_code=status_code,
+                              stat_result=compressed_stat,
+                              media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream")
+      response.headers["Content-Encoding"] = encoding
+      break
+
+    if response is None:
+      response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = cache_control_for(full_path)
+    if self.is_not_modified(response.headers, request_headers):
+      return NotModifiedResponse(response.headers)
+    return response
+
+class SPAIndex:
+  """
+  index.html held in memory together with its compressed variants, served
+  for every client-side route.
+  """
+  def __init__(self, path: str):
+    self.path = path
+    self._variants: Optional[Dict[Optional[str], bytes]] = None
+    self._etag = ""
+
+  def _load(self):
+    with open(self.path, "rb") as f:
+      body = f.read()
+    variants = {None: body, "gzip": gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+      variants["br"] = brotli.compress(body)
+    self._etag = f'"{hashlib.md5(body).hexdigest()}"'
+    self._variants = variants
+
+  def response(self, request: Request) -> Response:
+    if self._variants is None:
+      try:
+        self._load()
+      except FileNotFoundError:
+        return Response("Frontend build not found", status_code=404, media_type="text/plain")
+
+    headers = {"ETag": self._etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if self._etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+      return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""),
+                                  [name for name in ("br", "gzip") if name in self._variants])
+    if encoding is not None:
+      headers["Content-Encoding"] = encoding
+    return Response(self._variants[encoding], media_type="text/html", headers=headers)
+
+def precompress_directory(directory: str, minimum_size: int = 1024) -> Dict[str, int]:
+  """
+  Write .gz (and, when brotli is installed, .br) siblings for every compressible
+  file under `directory` that shrinks when compressed.
+
+  :return: Number of files written per encoding.
+  """
+  written = {"gzip": 0, "br": 0}
+  for root, _, files in os.walk(directory):
+    for name in files:
+      if name.endswith(tuple(PRECOMPRESSED_EXTENSIONS.values())):
+        continue
+      path = os.path.join(root, name)
+      media_type = mimetypes.guess_type(path)[0] or ""
+      if not media_type.startswith(COMPRESSIBLE_TYPES) or os.path.getsize(path) < minimum_size:
+        continue
+      with open(path, "rb") as f:
+        body = f.read()
+      variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+      if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+      for encoding, compressed in variants.items():
+        if len(compressed) >= len(body):
+          continue
+        with open(path + PRECOMPRESSED_EXTENSIONS[encoding], "wb") as f:
+          f.write(compressed)
+        written[encoding] += 1
+  return written
@@ -0,0 +1,247 @@
+import io
+import csv
+import json
+import random
+import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+
+import core.backend.app.schema as schema
+from core.backend.app.geo import encode_geohash
+from core.backend.app.migrations import ensure_schema
+from core.backend.app.model import (Project,
+                      Task,
+                      User,
+                      Role,
+                      Annotation,
+                      Review,
+                      Label,
+                      AssignedTask,
+                      user_roles)
+
+# Rows written per COPY/executemany batch
+BATCH_SIZE = 20000
+
+def parse_agreement(spec: str) -> List[Tuple[float, float]]:
+  """
+  Parse an agreement distribution such as "0.95:0.7,0.5:0.3": 70% of tasks
+  are easy (each annotator picks the true label with probability 0.95) and
+  30% are contested (probability 0.5). A bare "0.9" means every task uses 0.9.
+
+  :return: List of (agreement probability, weight) pairs.
+  """
+  distribution = []
+  for part in spec.split(","):
+    probability, _, weight = part.strip().partition(":")
+    distribution.append((float(probability), float(weight or 1)))
+  if not distribution or any(not 0 <= p <= 1 or w < 0 for p, w in distribution):
+    raise ValueError(f"Invalid agreement distribution: {spec!r}")
+  return distribution
+
+def _copy_rows(conn: Connection, table, columns: Sequence[str], rows: Iterable[Sequence]):
+  # PostgreSQL: stream CSV through COPY, the fastest bulk path
+  cursor = conn.connection.dbapi_connection.cursor()
+  sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+  try:
+    batch = []
+    for row in rows:
+      batch.append(row)
+      if len(batch) >= BATCH_SIZE:
+        _copy_batch(cursor, sql, batch)
+        batch = []
+    if batch:
+      _copy_batch(cursor, sql, batch)
+  finally:
+    cursor.close()
+
+def _copy_batch(cursor, sql: str, batch: List[Sequence]):
+  buffer = io.StringIO()
+  csv.writer(buffer).writerows(batch)
+  buffer.seek(0)
+  if hasattr(cursor, "copy_expert"):
+    cursor.copy_expert(sql, buffer)  # psycopg2
+  else:
+    cursor.execute(sql, stream=buffer)  # pg8000
+
+def _executemany_rows(conn: Connection, table, columns: Sequence[str], rows: Iterable[Sequence]):
+  batch = []
+  for row in rows:
+    batch.append(dict(zip(columns, row)))
+    if len(batch) >= BATCH_SIZE:
+      conn.execute(table.insert(), batch)
+      batch = []
+  if batch:
+    conn.execute(table.insert(), batch)
+
+def bulk_insert(conn: Connection, table, columns: Sequence[str], rows: Iterable[Sequence]):
+  if conn.dialect.name == "postgresql":
+    _copy_rows(conn, table, columns, rows)
+  else:
+    _executemany_rows(conn, table, columns, rows)
+
+def _ensure_roles(conn: Connection) -> Dict[str, int]:
+  existing = dict(conn.execute(select(Role.role_name, Role.role_id)).all())
+  missing = [name for name in schema.UserRole._member_names_ if name not in existing]
+  if missing:
+    conn.execute(Role.__table__.insert(), [{"role_name": name} for name in missing])
+    existing = dict(conn.execute(select(Role.role_name, Role.role_id)).all())
+  return existing
+
+def _create_users(conn: Connection, prefix: str, role: str, count: int, role_ids: Dict[str, int]) -> List[int]:
+  if count <= 0:
+    return []
+  usernames = [f"{prefix}_{role}_{i}" for i in range(count)]
+  bulk_insert(conn, User.__table__, ("username", "email"),
+              ((username, f"{username}@synthetic.local") for username in usernames))
+  user_ids = conn.execute(
+    select(User.user_id).where(User.username.in_(usernames)).order_by(User.user_id)
+  ).scalars().all()
+  bulk_insert(conn, user_roles, ("user_id", "role_id"),
+              ((user_id, role_ids[role]) for user_id in user_ids))
+  return list(user_ids)
+
+def generate_project(conn: Connection,
+                     rng: random.Random,
+                     title: str,
+                     num_tasks: int,
+                     annotator_ids: List[int],
+                     reviewer_ids: List[int],
+                     labels: List[str],
+                     annotators_per_task: int,
+                     annotated_fraction: float,
+                     reviewed_fraction: float,
+                     agreement: List[Tuple[float, float]]) -> Dict:
+  """
+  Write one project with its tasks, assignments, annotations and reviews.
+
+  :return: IDs of the created project and tasks, and the number of annotated tasks.
+  """
+  annotators_per_task = min(annotators_per_task, len(annotator_ids))
+  project_id = conn.execute(Project.__table__.insert().values(
+    project_title=title,
+    project_description="Synthetic project",
+    max_annotators_per_task=annotators_per_task,
+    created_at=datetime.datetime.utcnow()
+  )).inserted_primary_key[0]
+
+  bulk_insert(conn, Label.__table__, ("project_id", "name", "position"),
+              ((project_id, name, position) for position, name in enumerate(labels)))
+  label_ids = dict(conn.execute(
+    select(Label.name, Label.label_id).where(Label.project_id == project_id)
+  ).all())
+
+  def tasks():
+    for i in range(num_tasks):
+      latitude, longitude = round(rng.uniform(-60, 60), 6), round(rng.uniform(-180, 180), 6)
+      yield (f"example_{i}",
+             project_id,
+             f"gs://synthetic-bucket/project_{project_id}/image_{i}.png",
+             json.dumps({"latitude": latitude, "longitude": longitude, "source": "synthetic"}),
+             latitude,
+             longitude,
+             encode_geohash(latitude, longitude))
+
+  bulk_insert(conn, Task.__table__,
+              ("external_id", "project_id", "image", "additional_data", "latitude", "longitude", "geohash"), tasks())
+  task_ids = conn.execute(
+    select(Task.task_id).where(Task.project_id == project_id).order_by(Task.task_id)
+  ).scalars().all()
+
+  num_annotators = len(annotator_ids)
+  def assigned_annotators(i: int) -> List[int]:
+    return [annotator_ids[(i * annotators_per_task + j) % num_annotators] for j in range(annotators_per_task)]
+
+  if num_annotators:
+    bulk_insert(conn, AssignedTask.__table__, ("task_id", "user_id", "assignment_type"),
+                ((task_id, user_id, schema.AssignmentType.annotation.value)
+                 for i, task_id in enumerate(task_ids)
+                 for user_id in assigned_annotators(i)))
+
+  annotated_tasks = int(len(task_ids) * annotated_fraction) if num_annotators else 0
+  probabilities = [p for p, _ in agreement]
+  weights = [w for _, w in agreement]
+  true_labels = [rng.choice(labels) for _ in range(annotated_tasks)]
+
+  def annotations():
+    for i in range(annotated_tasks):
+      p = rng.choices(probabilities, weights)[0]
+      for user_id in assigned_annotators(i):
+        label = true_labels[i] if rng.random() < p or len(labels) == 1 else rng.choice(
+          [other for other in labels if other != true_labels[i]])
+        yield task_ids[i], user_id, label_ids[label]
+
+  bulk_insert(conn, Annotation.__table__, ("task_id", "user_id", "label_id"), annotations())
+
+  reviewed_tasks = int(annotated_tasks * reviewed_fraction) if reviewer_ids else 0
+  if reviewed_tasks:
+    bulk_insert(conn, AssignedTask.__table__, ("task_id", "user_id", "assignment_type"),
+                ((task_ids[i], reviewer_ids[i % len(reviewer_ids)], schema.AssignmentType.review.value)
+                 for i in range(reviewed_tasks)))
+    bulk_insert(conn, Review.__table__, ("task_id", "user_id", "label_id"),
+                ((task_ids[i], reviewer_ids[i % len(reviewer_ids)], label_ids[true_labels[i]])
+                 for i in range(reviewed_tasks)))
+
+  return {
+    "project_id": project_id,
+    "task_ids": list(task_ids),
+    "annotated_tasks": annotated_tasks,
+    "reviewed_tasks": reviewed_tasks,
+  }
+
+def generate_dataset(engine: Engine,
+                     projects: int = 1,
+                     tasks_per_project: int = 10000,
+                     annotators: int = 20,
+                     reviewers: int = 2,
+                     admins: int = 1,
+                     labels: int = 5,
+                     annotators_per_task: int = 3,
+                     annotated_fraction: float = 0.5,
+                     reviewed_fraction: float = 0.1,
+                     agreement: str = "0.9",
+                     prefix: str = "synthetic",
+                     seed: int = 0) -> Dict:
+  """
+  Generate users, projects, tasks, assignments, annotations and reviews
+  directly in the database using COPY (PostgreSQL) or executemany.
+
+  :param agreement: Agreement distribution, see parse_agreement.
+  :param prefix: Prefix for generated usernames; must differ between runs on one database.
+  :return: IDs of the generated users and, per project, of its tasks.
+  """
+  rng = random.Random(seed)
+  distribution = parse_agreement(agreement)
+  label_names = [f"label_{i}" for i in range(labels)]
+  # Stamped at head like any new database, so that `cli migrate` works on it later
+  ensure_schema(engine)
+
+  with engine.begin() as conn:
+    if conn.execute(select(User.user_id).where(User.username.like(f"{prefix}\\_%", escape="\\")).limit(1)).first():
+      raise ValueError(f"Users prefixed {prefix!r} already exist; pick another prefix")
+    role_ids = _ensure_roles(conn)
+    annotator_ids = _create_users(conn, prefix, schema.UserRole.annotator.value, annotators, role_ids)
+    reviewer_ids = _create_users(conn, prefix, schema.UserRole.reviewer.value, reviewers, role_ids)
+    admin_ids = _create_users(conn, prefix, schema.UserRole.admin.value, admins, role_ids)
+    generated_projects = [
+      generate_project(conn, rng,
+                       title=f"{prefix} project {i}",
+                       num_tasks=tasks_per_project,
+                       annotator_ids=annotator_ids,
+                       reviewer_ids=reviewer_ids,
+                       labels=label_names,
+                       annotators_per_task=annotators_per_task,
+                       annotated_fraction=annotated_fraction,
+                       reviewed_fraction=reviewed_fraction,
+                       agreement=distribution)
+      for i in range(projects)
+    ]
+
+  return {
+    "annotator_ids": annotator_ids,
+    "reviewer_ids": reviewer_ids,
+    "admin_ids": admin_ids,
+    "labels": label_names,
+    "projects": generated_projects,
+  }
@@ -1,5 +1,6 @@
+import base64
 from collections import Counter
-from typing import List, Optional, Any
+from typing import Iterable, List, Optional, Any
 
 def get_final_annotation(annotations: List[str], review: Optional[str]) -> Any:
   if review is not None:
@@ -24,4 +25,40 @@ def convert_origin_to_list(origins):
   elif isinstance(origins, list):
     return origins
   else:
-    raise ValueError("ORIGINS should be either a string or a list")
\ No newline at end of file
+    raise ValueError("ORIGINS should be either a string or a list")
+
+def encode_bitmap(flags: List[bool]) -> str:
+  """
+  Pack booleans into a base64 bitmap, most significant bit first.
+  """
+  packed = bytearray((len(flags) + 7) // 8)
+  for i, flag in enumerate(flags):
+    if flag:
+      packed[i >> 3] |= 0x80 >> (i & 7)
+  return base64.b64encode(bytes(packed)).decode("ascii")
+
+def encode_runs(flags: List[bool]) -> List[int]:
+  """
+  Run-length encode booleans as alternating run lengths, starting with a
+  (possibly empty) run of False.
+  """
+  runs, current, length = [], False, 0
+  for flag in flags:
+    if flag != current:
+      runs.append(length)
+      current, length = flag, 0
+    length += 1
+  runs.append(length)
+  return runs
+
+def encode_id_ranges(ids: Iterable[int]) -> List[List[int]]:
+  """
+  Compress ascending integers into [first, count] ranges of consecutive values.
+  """
+  ranges = []
+  for value in ids:
+    if ranges and value == ranges[-1][0] + ranges[-1][1]:
+      ranges[-1][1] += 1
+    else:
+      ranges.append([value, 1])
+  return ranges
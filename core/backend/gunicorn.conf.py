@@ -0,0 +1,38 @@
+"""
+Production server settings:
+
+  gunicorn -c core/backend/gunicorn.conf.py core.backend.app.main:app
+
+WEB_CONCURRENCY sets the number of worker processes (default: one per core).
+Each worker has its own database pool, sized by DB_POOL_SIZE and DB_MAX_OVERFLOW.
+Event streams see other workers' writes through the version watcher in events.py.
+"""
+import os
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Cloud Run enforces the request timeout itself; gunicorn should not kill busy workers
+timeout = int(os.getenv("WORKER_TIMEOUT", "0"))
+# Cloud Run sends SIGTERM and allows 10 seconds before SIGKILL
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "8"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+accesslog = "-" if os.getenv("ACCESS_LOG", "").lower() in ("1", "true", "yes") else None
+errorlog = "-"
+
+def post_fork(server, worker):
+  # Connections opened in the master must not be shared with forked workers
+  if preload_app:
+    from core.backend.app.database import engine
+    engine.dispose(close=False)
+
+def child_exit(server, worker):
+  if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,44 @@
+"""
+Alembic environment for the core backend.
+
+Run migrations with `python -m core.backend.app.cli migrate`; the CLI passes
+its connection in through `config.attributes`. Without one, the engine from
+`core.backend.app.database` is used.
+"""
+from alembic import context
+
+from core.backend.app.model import Base
+
+config = context.config
+
+def run_migrations_offline():
+  context.configure(url=config.get_main_option("sqlalchemy.url"),
+                    target_metadata=Base.metadata,
+                    literal_binds=True,
+                    transaction_per_migration=True)
+  with context.begin_transaction():
+    context.run_migrations()
+
+def run_migrations_online():
+  connection = config.attributes.get("connection")
+  if connection is None:
+    from core.backend.app.database import engine
+    with engine.connect() as connection:
+      _run(connection)
+      connection.commit()
+  else:
+    _run(connection)
+
+def _run(connection):
+  # One transaction per revision, so a long migration does not hold the
+  # locks of the ones before it
+  context.configure(connection=connection,
+                    target_metadata=Base.metadata,
+                    transaction_per_migration=True)
+  with context.begin_transaction():
+    context.run_migrations()
+
+if context.is_offline_mode():
+  run_migrations_offline()
+else:
+  run_migrations_online()
@@ -0,0 +1,21 @@
+"""
+Baseline: the schema as released before versioned migrations.
+
+Empty databases are created from the models and stamped at head instead of
+replaying revisions; this revision only anchors the history for databases
+that predate it.
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-19
+"""
+revision = "0000"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  pass
+
+def downgrade():
+  pass
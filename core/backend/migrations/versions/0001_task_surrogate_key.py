@@ -0,0 +1,120 @@
+"""
+Move tasks to a per-project example ID namespace with an integer surrogate key.
+
+* tasks.task_id (the uploaded example ID) becomes tasks.external_id, unique per project
+* tasks.task_id becomes a SERIAL primary key
+* annotations, reviews, assigned_tasks and user_tasks reference the integer key
+  with ON DELETE CASCADE, and the referencing columns are indexed
+
+PostgreSQL only; databases created by later versions start at head and never
+run it. Not safe while the service is live: the rename and the SERIAL column
+rewrite tasks under an ACCESS EXCLUSIVE lock, and code deployed before this
+revision cannot read the new keys. Stop the service for it. The child rows are
+backfilled in committed batches, so an interrupted upgrade resumes there.
+
+The downgrade rebuilds the string keys from tasks.external_id. It refuses to
+run once two projects share an example ID, which the old global key forbade.
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import batched_backfill
+
+revision = "0001"
+down_revision = "0000"
+branch_labels = None
+depends_on = None
+
+# Tables referencing tasks, with the integer column their backfill is batched on
+CHILD_TABLES = (("annotations", "annotation_id"), ("reviews", "review_id"),
+                ("assigned_tasks", "assignment_id"), ("user_tasks", "user_id"))
+INDEXED_TABLES = ("annotations", "reviews", "assigned_tasks")
+
+def _require_postgresql():
+  # Checked before any DDL: SQLite cannot drop the referenced columns and would be left half-migrated
+  dialect = op.get_bind().dialect.name
+  if dialect != "postgresql":
+    raise RuntimeError(f"Revision 0001 only runs on PostgreSQL, not {dialect}. Recreate this development "
+                       f"database: new databases are created at the current schema.")
+
+def upgrade():
+  _require_postgresql()
+  task_columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("tasks")}
+  # Already done when resuming an upgrade interrupted during the backfills
+  if "external_id" not in task_columns:
+    op.execute("ALTER TABLE tasks RENAME COLUMN task_id TO external_id")
+    op.execute("ALTER TABLE tasks ADD COLUMN task_id SERIAL")
+
+  # Resolve the new integer key for every child row while the old string key
+  # still exists; the former primary key index on external_id serves the lookups
+  for table, key in CHILD_TABLES:
+    op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS task_ref INTEGER")
+  for table, key in CHILD_TABLES:
+    batched_backfill(table, key,
+                     f"task_ref = (SELECT tasks.task_id FROM tasks WHERE tasks.external_id = {table}.task_id)",
+                     "task_ref IS NULL")
+
+  for table, _ in CHILD_TABLES:
+    # Dropping the string column also drops its foreign key and user_tasks' primary key
+    op.execute(f"ALTER TABLE {table} DROP COLUMN task_id")
+    op.execute(f"ALTER TABLE {table} RENAME COLUMN task_ref TO task_id")
+    # Rows that referenced missing tasks were orphans already
+    op.execute(f"DELETE FROM {table} WHERE task_id IS NULL")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN task_id SET NOT NULL")
+
+  op.execute("ALTER TABLE tasks DROP CONSTRAINT tasks_pkey")
+  op.execute("ALTER TABLE tasks ADD CONSTRAINT tasks_pkey PRIMARY KEY (task_id)")
+  op.execute("ALTER TABLE tasks ADD CONSTRAINT uq_tasks_project_external_id UNIQUE (project_id, external_id)")
+  op.execute("ALTER TABLE user_tasks ADD CONSTRAINT user_tasks_pkey PRIMARY KEY (user_id, task_id)")
+
+  op.execute("ALTER TABLE tasks DROP CONSTRAINT IF EXISTS tasks_project_id_fkey")
+  op.execute("ALTER TABLE tasks ADD CONSTRAINT tasks_project_id_fkey"
+             " FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE")
+  for table, _ in CHILD_TABLES:
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_task_id_fkey"
+               f" FOREIGN KEY (task_id) REFERENCES tasks (task_id) ON DELETE CASCADE")
+  for table in INDEXED_TABLES:
+    op.execute(f"CREATE INDEX ix_{table}_task_id ON {table} (task_id)")
+
+def downgrade():
+  _require_postgresql()
+  shared = op.get_bind().execute(sa.text(
+    "SELECT external_id FROM tasks GROUP BY external_id HAVING count(*) > 1 LIMIT 1")).scalar()
+  if shared is not None:
+    raise RuntimeError(f"Example ID {shared!r} is used by several projects; string task IDs must be "
+                       f"unique before downgrading past revision 0001")
+
+  for table in INDEXED_TABLES:
+    op.execute(f"DROP INDEX IF EXISTS ix_{table}_task_id")
+  for table, _ in CHILD_TABLES:
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_task_id_fkey")
+    op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS task_ref VARCHAR(255)")
+  op.execute("ALTER TABLE user_tasks DROP CONSTRAINT IF EXISTS user_tasks_pkey")
+  for table, key in CHILD_TABLES:
+    batched_backfill(table, key,
+                     f"task_ref = (SELECT tasks.external_id FROM tasks WHERE tasks.task_id = {table}.task_id)",
+                     "task_ref IS NULL")
+
+  for table, _ in CHILD_TABLES:
+    op.execute(f"ALTER TABLE {table} DROP COLUMN task_id")
+    op.execute(f"ALTER TABLE {table} RENAME COLUMN task_ref TO task_id")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN task_id SET NOT NULL")
+
+  op.execute("ALTER TABLE tasks DROP CONSTRAINT uq_tasks_project_external_id")
+  op.execute("ALTER TABLE tasks DROP CONSTRAINT tasks_pkey")
+  # Also drops the SERIAL column's sequence
+  op.execute("ALTER TABLE tasks DROP COLUMN task_id")
+  op.execute("ALTER TABLE tasks RENAME COLUMN external_id TO task_id")
+  op.execute("ALTER TABLE tasks ADD CONSTRAINT tasks_pkey PRIMARY KEY (task_id)")
+  op.execute("ALTER TABLE user_tasks ADD CONSTRAINT user_tasks_pkey PRIMARY KEY (user_id, task_id)")
+
+  op.execute("ALTER TABLE tasks DROP CONSTRAINT IF EXISTS tasks_project_id_fkey")
+  op.execute("ALTER TABLE tasks ADD CONSTRAINT tasks_project_id_fkey"
+             " FOREIGN KEY (project_id) REFERENCES projects (project_id)")
+  for table, _ in CHILD_TABLES:
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_task_id_fkey"
+               f" FOREIGN KEY (task_id) REFERENCES tasks (task_id)")
@@ -0,0 +1,25 @@
+"""
+Per-project version counter and modification time used for HTTP ETag/Last-Modified.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import batched_backfill
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  op.add_column("projects", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+  op.add_column("projects", sa.Column("updated_at", sa.TIMESTAMP(), nullable=True))
+  batched_backfill("projects", "project_id", "updated_at = created_at", "updated_at IS NULL")
+
+def downgrade():
+  op.drop_column("projects", "updated_at")
+  op.drop_column("projects", "version")
@@ -0,0 +1,29 @@
+"""
+Labeled-status lookups: per-project annotation version counter and
+(task_id, user_id) indexes on annotations and reviews.
+
+The indexes are built concurrently so they do not block writes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  op.add_column("projects", sa.Column("annotation_version", sa.Integer(), nullable=False, server_default="1"))
+  create_index_concurrently("ix_annotations_task_id_user_id", "annotations", ["task_id", "user_id"])
+  create_index_concurrently("ix_reviews_task_id_user_id", "reviews", ["task_id", "user_id"])
+
+def downgrade():
+  drop_index_concurrently("ix_reviews_task_id_user_id")
+  drop_index_concurrently("ix_annotations_task_id_user_id")
+  op.drop_column("projects", "annotation_version")
@@ -0,0 +1,103 @@
+"""
+Per-project label vocabulary: annotations and reviews reference integer label
+IDs instead of storing the label text, and projects.labels moves to rows.
+
+Labels that annotations or reviews use but the project no longer lists are
+kept as retired (inactive) labels.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import batched_backfill, create_index_concurrently, drop_index_concurrently
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+LABELLED_TABLES = (("annotations", "annotation_id"), ("reviews", "review_id"))
+
+def _parse_labels(labels: str):
+  names = []
+  for name in (labels or "").split(","):
+    name = name.strip(' "\'')
+    if name and name not in names:
+      names.append(name)
+  return names
+
+def upgrade():
+  labels = op.create_table(
+    "labels",
+    sa.Column("label_id", sa.Integer(), primary_key=True, autoincrement=True),
+    sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False),
+    sa.Column("name", sa.String(255), nullable=False),
+    sa.Column("position", sa.Integer(), nullable=False),
+    sa.Column("active", sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.UniqueConstraint("project_id", "name", name="uq_labels_project_name"),
+  )
+
+  bind = op.get_bind()
+  used = defaultdict(set)
+  for table, _ in LABELLED_TABLES:
+    rows = bind.execute(sa.text(f"SELECT DISTINCT tasks.project_id, {table}.label FROM {table} "
+                                f"JOIN tasks ON tasks.task_id = {table}.task_id"))
+    for project_id, name in rows:
+      used[project_id].add(name)
+
+  vocabulary = []
+  for project_id, project_labels in bind.execute(sa.text("SELECT project_id, labels FROM projects")):
+    names = _parse_labels(project_labels)
+    retired = sorted(used.pop(project_id, set()) - set(names))
+    vocabulary += [{"project_id": project_id, "name": name, "position": position, "active": True}
+                   for position, name in enumerate(names)]
+    vocabulary += [{"project_id": project_id, "name": name, "position": len(names) + i, "active": False}
+                   for i, name in enumerate(retired)]
+  if vocabulary:
+    op.bulk_insert(labels, vocabulary)
+
+  for table, key in LABELLED_TABLES:
+    op.add_column(table, sa.Column("label_id", sa.Integer(), nullable=True))
+    batched_backfill(table, key,
+                     f"label_id = (SELECT labels.label_id FROM labels "
+                     f"JOIN tasks ON tasks.project_id = labels.project_id "
+                     f"WHERE tasks.task_id = {table}.task_id AND labels.name = {table}.label)",
+                     "label_id IS NULL")
+    with op.batch_alter_table(table) as batch:
+      batch.alter_column("label_id", existing_type=sa.Integer(), nullable=False)
+      batch.create_foreign_key(f"{table}_label_id_fkey", "labels", ["label_id"], ["label_id"])
+      batch.drop_column("label")
+    # Lets deleting a project's labels check references without scanning the table
+    create_index_concurrently(f"ix_{table}_label_id", table, ["label_id"])
+
+  with op.batch_alter_table("projects") as batch:
+    batch.drop_column("labels")
+
+def downgrade():
+  op.add_column("projects", sa.Column("labels", sa.String(255), nullable=False, server_default=""))
+  bind = op.get_bind()
+  vocabulary = defaultdict(list)
+  for project_id, name in bind.execute(sa.text(
+      "SELECT project_id, name FROM labels WHERE active = :active ORDER BY project_id, position"), {"active": True}):
+    vocabulary[project_id].append(name)
+  for project_id, names in vocabulary.items():
+    bind.execute(sa.text("UPDATE projects SET labels = :labels WHERE project_id = :project_id"),
+                 {"labels": ",".join(names)[:255], "project_id": project_id})
+
+  for table, key in LABELLED_TABLES:
+    drop_index_concurrently(f"ix_{table}_label_id")
+    op.add_column(table, sa.Column("label", sa.String(60), nullable=True))
+    batched_backfill(table, key,
+                     f"label = (SELECT labels.name FROM labels WHERE labels.label_id = {table}.label_id)",
+                     "label IS NULL")
+    with op.batch_alter_table(table) as batch:
+      batch.alter_column("label", existing_type=sa.String(60), nullable=False)
+      # Dropping the column drops its foreign key as well
+      batch.drop_column("label_id")
+
+  op.drop_table("labels")
@@ -0,0 +1,30 @@
+"""
+Adaptive redundancy settings on projects: assignment mode, minimum annotators
+per task and the consensus threshold.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+assignment_mode = sa.Enum("fixed", "adaptive", name="assignmentmode")
+
+def upgrade():
+  assignment_mode.create(op.get_bind(), checkfirst=True)
+  op.add_column("projects", sa.Column("assignment_mode", assignment_mode, nullable=False, server_default="fixed"))
+  op.add_column("projects", sa.Column("min_annotators_per_task", sa.Integer(), nullable=False, server_default="2"))
+  op.add_column("projects", sa.Column("consensus_threshold", sa.Float(), nullable=False, server_default="1"))
+
+def downgrade():
+  with op.batch_alter_table("projects") as batch:
+    batch.drop_column("consensus_threshold")
+    batch.drop_column("min_annotators_per_task")
+    batch.drop_column("assignment_mode")
+  assignment_mode.drop(op.get_bind(), checkfirst=True)
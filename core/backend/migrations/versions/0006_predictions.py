@@ -0,0 +1,43 @@
+"""
+Model predictions per task: the top label with its confidence, margin and
+entropy, indexed per project for uncertainty ordering, and the score of every
+label.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  op.create_table(
+    "predictions",
+    sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.task_id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False),
+    sa.Column("label_id", sa.Integer(), sa.ForeignKey("labels.label_id"), nullable=False),
+    sa.Column("confidence", sa.Float(), nullable=False),
+    sa.Column("margin", sa.Float(), nullable=False),
+    sa.Column("entropy", sa.Float(), nullable=False),
+    sa.Column("created_at", sa.TIMESTAMP()),
+  )
+  # The table is new and empty, so plain index builds do not block anyone
+  op.create_index("ix_predictions_project_id_margin", "predictions", ["project_id", "margin"])
+  op.create_index("ix_predictions_project_id_entropy", "predictions", ["project_id", "entropy"])
+  op.create_table(
+    "prediction_scores",
+    sa.Column("task_id", sa.Integer(), sa.ForeignKey("predictions.task_id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("label_id", sa.Integer(), sa.ForeignKey("labels.label_id"), primary_key=True),
+    sa.Column("score", sa.Float(), nullable=False),
+  )
+
+def downgrade():
+  op.drop_table("prediction_scores")
+  op.drop_index("ix_predictions_project_id_entropy", table_name="predictions")
+  op.drop_index("ix_predictions_project_id_margin", table_name="predictions")
+  op.drop_table("predictions")
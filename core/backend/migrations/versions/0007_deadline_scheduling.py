@@ -0,0 +1,34 @@
+"""
+Deadline scheduling: annotation timestamps for the recent throughput window
+and a stored per-project priority that orders annotators' queues.
+
+Existing annotations keep a NULL created_at; they predate the window anyway.
+The indexes are built concurrently so they do not block writes.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  op.add_column("annotations", sa.Column("created_at", sa.TIMESTAMP(), nullable=True))
+  op.add_column("projects", sa.Column("priority", sa.Float(), nullable=False, server_default="0"))
+  create_index_concurrently("ix_annotations_created_at", "annotations", ["created_at"])
+  create_index_concurrently("ix_projects_priority", "projects", ["priority"])
+
+def downgrade():
+  drop_index_concurrently("ix_projects_priority")
+  drop_index_concurrently("ix_annotations_created_at")
+  with op.batch_alter_table("projects") as batch:
+    batch.drop_column("priority")
+  with op.batch_alter_table("annotations") as batch:
+    batch.drop_column("created_at")
@@ -0,0 +1,30 @@
+"""
+Near-duplicate detection: perceptual image hash per task and the group
+representative a duplicate takes its labels from.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app.migrations import create_index_concurrently, drop_index_concurrently
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+  with op.batch_alter_table("tasks") as batch:
+    batch.add_column(sa.Column("image_hash", sa.BigInteger(), nullable=True))
+    batch.add_column(sa.Column("duplicate_of", sa.Integer(), nullable=True))
+    batch.create_foreign_key("fk_tasks_duplicate_of", "tasks", ["duplicate_of"], ["task_id"], ondelete="SET NULL")
+  create_index_concurrently("ix_tasks_duplicate_of", "tasks", ["duplicate_of"])
+
+def downgrade():
+  drop_index_concurrently("ix_tasks_duplicate_of")
+  with op.batch_alter_table("tasks") as batch:
+    batch.drop_column("duplicate_of")
+    batch.drop_column("image_hash")
@@ -0,0 +1,68 @@
+"""
+Task locations: latitude, longitude and geohash columns extracted from
+additional_data, indexed per project for bounding-box queries and map
+clustering.
+
+Existing tasks are backfilled in batches of BACKFILL_BATCH_SIZE task IDs, each
+committed on its own. The indexes are built concurrently so they do not block
+writes.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+import ast
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.backend.app import geo
+from core.backend.app.migrations import BACKFILL_BATCH_SIZE, create_index_concurrently, drop_index_concurrently
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def _parse(additional_data):
+  # Stored as JSON; rows written by older releases hold a Python dict repr
+  try:
+    return json.loads(additional_data)
+  except ValueError:
+    try:
+      return ast.literal_eval(additional_data)
+    except (ValueError, SyntaxError):
+      return None
+
+def upgrade():
+  op.add_column("tasks", sa.Column("latitude", sa.Float(), nullable=True))
+  op.add_column("tasks", sa.Column("longitude", sa.Float(), nullable=True))
+  op.add_column("tasks", sa.Column("geohash", sa.String(12), nullable=True))
+
+  bind = op.get_bind()
+  low, high = bind.execute(sa.text("SELECT MIN(task_id), MAX(task_id) FROM tasks")).one()
+  select = sa.text("SELECT task_id, additional_data FROM tasks "
+                   "WHERE task_id >= :start AND task_id < :end AND additional_data IS NOT NULL")
+  update = sa.text("UPDATE tasks SET latitude = :latitude, longitude = :longitude, geohash = :geohash "
+                   "WHERE task_id = :task_id")
+  if low is not None:
+    with op.get_context().autocommit_block():
+      for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        rows = bind.execute(select, {"start": start, "end": start + BACKFILL_BATCH_SIZE}).all()
+        located = [{"task_id": task_id, **geo.location_columns(_parse(additional_data))}
+                   for task_id, additional_data in rows]
+        located = [row for row in located if row["geohash"] is not None]
+        if located:
+          bind.execute(update, located)
+
+  create_index_concurrently("ix_tasks_project_id_latitude", "tasks", ["project_id", "latitude"])
+  create_index_concurrently("ix_tasks_project_id_geohash", "tasks", ["project_id", "geohash"])
+
+def downgrade():
+  drop_index_concurrently("ix_tasks_project_id_geohash")
+  drop_index_concurrently("ix_tasks_project_id_latitude")
+  with op.batch_alter_table("tasks") as batch:
+    batch.drop_column("geohash")
+    batch.drop_column("longitude")
+    batch.drop_column("latitude")
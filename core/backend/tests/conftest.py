@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+# The application reads its configuration at import time
+_database_dir = tempfile.mkdtemp(prefix="skainnotate-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ["DEV_MODE"] = "1"
+os.environ["INIT_DB_ON_STARTUP"] = "0"
+os.environ["SLOW_REQUEST_MS"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.backend.app.database import engine
+from core.backend.app.dependencies import create_access_token
+from core.backend.app.main import app
+from core.backend.app.synthetic import generate_dataset
+
+@pytest.fixture(scope="session")
+def dataset():
+  """
+  Two seeded projects of different sizes, so that budgets can be checked to
+  hold regardless of the number of tasks.
+  """
+  small = generate_dataset(engine, tasks_per_project=20, annotators=4, reviewers=2, admins=1,
+                           labels=3, annotators_per_task=2, prefix="small")
+  large = generate_dataset(engine, tasks_per_project=200, annotators=8, reviewers=2, admins=1,
+                           labels=3, annotators_per_task=2, prefix="large")
+  return {"small": small, "large": large}
+
+@pytest.fixture()
+def client():
+  return TestClient(app)
+
+def login(client: TestClient, user_id: int, role: str):
+  client.cookies.set("access_token", create_access_token({"user_info": {"user_id": user_id}}))
+  client.cookies.set("current_role", role)
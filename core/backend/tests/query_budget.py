@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.backend.app.querydebug import repeated_shapes, REPEATED_QUERY_THRESHOLD
+
+class QueryBudgetExceeded(AssertionError):
+  pass
+
+@contextmanager
+def query_budget(engine: Engine,
+                 max_queries: int,
+                 max_repeats: Optional[int] = REPEATED_QUERY_THRESHOLD - 1):
+  """
+  Fail when the wrapped block runs more SQL than budgeted.
+
+  Usage:
+    with query_budget(engine, max_queries=3):
+      client.get("/api/tasks/fetchall/imgUrl-and-labelStatus", params=...)
+
+  :param engine: Engine the application under test executes against.
+  :param max_queries: Maximum number of statements allowed in the block.
+  :param max_repeats: Maximum executions of any one statement shape (N+1
+                      detection); None disables the check.
+  :return: List collecting the executed statements.
+  """
+  statements: List[str] = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+  event.listen(engine, "after_cursor_execute", record)
+  try:
+    yield statements
+  finally:
+    event.remove(engine, "after_cursor_execute", record)
+
+  problems = []
+  if len(statements) > max_queries:
+    problems.append(f"{len(statements)} queries executed, budget is {max_queries}")
+  if max_repeats is not None:
+    for shape, count in repeated_shapes(statements, threshold=max_repeats + 1).items():
+      problems.append(f"{count} executions of the same statement (N+1?): {shape}")
+  if problems:
+    raise QueryBudgetExceeded("\n".join(problems))
@@ -0,0 +1,40 @@
+import datetime
+from email.utils import format_datetime
+
+from fastapi import Response
+from starlette.requests import Request
+
+from core.backend.app import caching
+
+def _request(if_modified_since: datetime.datetime) -> Request:
+  header = format_datetime(if_modified_since, usegmt=True)
+  return Request({"type": "http", "method": "GET", "path": "/api/projects/1", "query_string": b"",
+                  "headers": [(b"if-modified-since", header.encode())]})
+
+def _last_modified(updated_at: datetime.datetime):
+  response = Response()
+  caching.set_cache_headers(response, caching.CacheValidators(etag='W/"p1-1"', last_modified=updated_at))
+  return response.headers.get("last-modified")
+
+def _utc(*args) -> datetime.datetime:
+  return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+def test_last_modified_is_the_second_after_the_write():
+  assert _last_modified(datetime.datetime(2026, 1, 1, 12, 0, 0, 300000)) == "Thu, 01 Jan 2026 12:00:01 GMT"
+
+def test_last_modified_is_withheld_during_the_write_second():
+  # A write later in this second would share the header's second
+  assert _last_modified(datetime.datetime.utcnow()) is None
+
+def test_unchanged_resource_is_not_modified():
+  validators = caching.CacheValidators(etag='W/"p1-1"', last_modified=datetime.datetime(2026, 1, 1, 12, 0, 0, 300000))
+  assert caching.is_not_modified(_request(_utc(2026, 1, 1, 12, 0, 1)), validators)
+
+def test_write_in_the_same_second_is_modified():
+  # The client's header is from a fetch at 12:00:00; a write at 12:00:00.7 must not get a 304
+  validators = caching.CacheValidators(etag='W/"p1-2"', last_modified=datetime.datetime(2026, 1, 1, 12, 0, 0, 700000))
+  assert not caching.is_not_modified(_request(_utc(2026, 1, 1, 12, 0, 0)), validators)
+
+def test_write_after_the_header_second_is_modified():
+  validators = caching.CacheValidators(etag='W/"p1-2"', last_modified=datetime.datetime(2026, 1, 1, 12, 0, 1))
+  assert not caching.is_not_modified(_request(_utc(2026, 1, 1, 12, 0, 1)), validators)
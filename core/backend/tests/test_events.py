@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from core.backend.app import crud, events
+from core.backend.app.database import SessionLocal, engine
+from core.backend.app.routers import projects
+from core.backend.app.synthetic import generate_dataset
+
+@pytest.fixture(scope="module")
+def project():
+  dataset = generate_dataset(engine, tasks_per_project=10, annotators=4, reviewers=1, admins=1,
+                             labels=2, annotators_per_task=1, annotated_fraction=0, prefix="events")
+  project = dataset["projects"][0]
+  return {"project_id": project["project_id"], "task_ids": project["task_ids"],
+          "annotator_ids": dataset["annotator_ids"], "label": dataset["labels"][0]}
+
+def _annotate(project, index):
+  with SessionLocal() as db:
+    crud.create_annotation(db, project["label"], project["task_ids"][index], project["annotator_ids"][index % 4])
+
+def _write_from_another_worker(project, index):
+  # Commits without publishing, like a write served by another process
+  with SessionLocal() as db:
+    crud.bump_annotation_version(db, project["task_ids"][index])
+    db.commit()
+
+def _received(*writes, project):
+  """
+  Subscribe to the project, run the writes and return the events the
+  subscriber has been sent once the version watcher has looked twice.
+  """
+  async def run():
+    subscription = events.broker.subscribe(project["project_id"])
+    try:
+      await asyncio.to_thread(projects._statistics_snapshot, project["project_id"], subscription)
+      events.broker.watch(projects._project_versions, interval=0.02)
+      for write in writes:
+        await asyncio.to_thread(write)
+      await asyncio.sleep(0.1)
+      received = []
+      while not subscription.queue.empty():
+        received.append(subscription.queue.get_nowait()["type"])
+      return received
+    finally:
+      events.broker.unsubscribe(subscription)
+  return asyncio.run(run())
+
+def test_local_write_does_not_reload_snapshot(project):
+  assert _received(lambda: _annotate(project, 0), lambda: _annotate(project, 1),
+                   project=project) == ["annotation.created", "annotation.created"]
+
+def test_write_from_another_worker_reloads_snapshot(project):
+  assert _received(lambda: _write_from_another_worker(project, 2), project=project) == [events.STALE]
+
+def test_local_write_after_another_worker_still_reloads(project):
+  # The local event does not cover the other worker's write, so the watcher must not skip it
+  received = _received(lambda: _write_from_another_worker(project, 3), lambda: _annotate(project, 4),
+                       project=project)
+  assert received == ["annotation.created", events.STALE]
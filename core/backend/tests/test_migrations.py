@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from core.backend.app.migrations import current_revision, head_revision, migrate
+
+# Tables as released before versioned migrations, enough to be recognised as revision 0000
+BASELINE_SCHEMA = """
+CREATE TABLE projects (project_id INTEGER PRIMARY KEY, project_title VARCHAR(255) NOT NULL,
+                       labels VARCHAR(255) NOT NULL DEFAULT '');
+CREATE TABLE users (user_id INTEGER PRIMARY KEY, username VARCHAR(255));
+CREATE TABLE tasks (task_id VARCHAR(255) PRIMARY KEY, project_id INTEGER NOT NULL REFERENCES projects (project_id),
+                    image VARCHAR(255) NOT NULL);
+CREATE TABLE annotations (annotation_id INTEGER PRIMARY KEY, label VARCHAR(60) NOT NULL,
+                          task_id VARCHAR(255) NOT NULL REFERENCES tasks (task_id),
+                          user_id INTEGER NOT NULL REFERENCES users (user_id))
+"""
+
+def test_empty_database_is_created_at_head(tmp_path):
+  engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+  assert migrate(engine) == (None, head_revision())
+
+def test_task_key_migration_refuses_sqlite_before_any_change(tmp_path):
+  engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+  with engine.begin() as connection:
+    for statement in BASELINE_SCHEMA.split(";"):
+      connection.execute(text(statement))
+    connection.execute(text("INSERT INTO projects VALUES (1, 'Project', 'cat')"))
+    connection.execute(text("INSERT INTO tasks VALUES ('example-1', 1, 'image.png')"))
+
+  with pytest.raises(RuntimeError, match="only runs on PostgreSQL"):
+    migrate(engine)
+
+  with engine.connect() as connection:
+    assert current_revision(connection) == "0000"
+    assert [column["name"] for column in inspect(connection).get_columns("tasks")] == ["task_id", "project_id", "image"]
+    assert connection.execute(text("SELECT task_id FROM tasks")).scalar() == "example-1"
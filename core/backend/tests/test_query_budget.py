@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import text
+
+from core.backend.app.database import engine
+from core.backend.tests.conftest import login
+from core.backend.tests.query_budget import query_budget, QueryBudgetExceeded
+
+# Statements each endpoint may run, whatever the number of tasks
+BUDGETS = {
+  "project_list": 3,
+  "statistics": 5,
+  "export_csv": 4,
+  "task_details_admin": 3,
+  "task_details_annotator": 4,
+  "task_listing_annotator": 3,
+  "task_listing_reviewer": 3,
+  "task_listing_admin": 3,
+}
+
+def _request(client, dataset, endpoint):
+  project = dataset["projects"][0]
+  project_id, task_id = project["project_id"], project["task_ids"][0]
+  annotator_id, reviewer_id = dataset["annotator_ids"][0], dataset["reviewer_ids"][0]
+  listing = "/api/tasks/fetchall/imgUrl-and-labelStatus"
+  if endpoint == "project_list":
+    return client.get("/api/projects/")
+  if endpoint == "statistics":
+    return client.get(f"/api/projects/{project_id}/statistics")
+  if endpoint == "export_csv":
+    return client.get(f"/api/projects/{project_id}/export-annotations", params={"format": "csv"})
+  if endpoint == "task_details_admin":
+    return client.get("/api/tasks/task-details", params={"project_id": project_id, "task_id": task_id, "role": "admin"})
+  if endpoint == "task_details_annotator":
+    login(client, annotator_id, "annotator")
+    return client.get("/api/tasks/task-details",
+                      params={"project_id": project_id, "task_id": task_id, "role": "annotator"})
+  if endpoint == "task_listing_annotator":
+    return client.get(listing, params={"project_id": project_id, "user_id": annotator_id, "role": "annotator"})
+  if endpoint == "task_listing_reviewer":
+    return client.get(listing, params={"project_id": project_id, "user_id": reviewer_id, "role": "reviewer"})
+  if endpoint == "task_listing_admin":
+    return client.get(listing, params={"project_id": project_id, "user_id": annotator_id, "role": "admin"})
+  raise ValueError(endpoint)
+
+@pytest.mark.parametrize("size", ["small", "large"])
+@pytest.mark.parametrize("endpoint", sorted(BUDGETS))
+def test_endpoint_query_budget(client, dataset, endpoint, size):
+  with query_budget(engine, max_queries=BUDGETS[endpoint]):
+    response = _request(client, dataset[size], endpoint)
+  assert response.status_code == 200
+
+@pytest.mark.parametrize("endpoint", sorted(BUDGETS))
+def test_query_count_does_not_grow_with_tasks(client, dataset, endpoint):
+  counts = {}
+  for size in ("small", "large"):
+    with query_budget(engine, max_queries=BUDGETS[endpoint]) as statements:
+      _request(client, dataset[size], endpoint)
+    counts[size] = len(statements)
+  assert counts["small"] == counts["large"]
+
+def test_listings_return_every_assigned_task(client, dataset):
+  # Guards against budgets passing because a listing came back empty
+  response = _request(client, dataset["large"], "task_listing_admin")
+  assert len(response.json()) == len(dataset["large"]["projects"][0]["task_ids"])
+
+def test_not_modified_runs_one_query(client, dataset):
+  project_id = dataset["small"]["projects"][0]["project_id"]
+  etag = client.get(f"/api/projects/{project_id}").headers["etag"]
+  with query_budget(engine, max_queries=1):
+    response = client.get(f"/api/projects/{project_id}", headers={"If-None-Match": etag})
+  assert response.status_code == 304
+
+def test_repeated_statements_fail_the_budget():
+  with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+    with query_budget(engine, max_queries=100):
+      with engine.connect() as conn:
+        for task_id in range(10):
+          conn.execute(text("SELECT * FROM tasks WHERE task_id = :task_id"), {"task_id": task_id})
+
+def test_exceeding_the_budget_fails():
+  with pytest.raises(QueryBudgetExceeded, match="budget is 1"):
+    with query_budget(engine, max_queries=1, max_repeats=None):
+      with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
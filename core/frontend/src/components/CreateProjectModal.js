@@ -29,6 +29,38 @@ const CreateProjectModal = ({newProject, onChange, onSubmit, onTaskFileChange, m
           type="number"
           required
         />
+        <Form.Select
+          label="Assignment Mode"
+          name="assignment_mode"
+          value={newProject.assignment_mode}
+          onChange={onChange}
+          options={[
+            { key: 'fixed', value: 'fixed', text: 'Fixed: every task gets the max annotators' },
+            { key: 'adaptive', value: 'adaptive', text: 'Adaptive: add annotators only to contested tasks' },
+          ]}
+        />
+        {newProject.assignment_mode === 'adaptive' && (
+          <Form.Group widths="equal">
+            <Form.Input
+              label="Min Annotators per Task"
+              name="min_annotators_per_task"
+              value={newProject.min_annotators_per_task}
+              onChange={onChange}
+              type="number"
+              min="1"
+            />
+            <Form.Input
+              label="Consensus Threshold"
+              name="consensus_threshold"
+              value={newProject.consensus_threshold}
+              onChange={onChange}
+              type="number"
+              step="0.05"
+              min="0.55"
+              max="1"
+            />
+          </Form.Group>
+        )}
         <Form.Input
           label="Completion Deadline"
           name="completion_deadline"
@@ -1,7 +1,7 @@
 import React from 'react';
-import {Grid, Card, Dropdown} from 'semantic-ui-react';
+import {Grid, Card, Dropdown, Label} from 'semantic-ui-react';
 
-const ProjectCard = ({projects, onProjectClick, onEditClick, onDelete}) => {
+const ProjectCard = ({projects, schedules = {}, onProjectClick, onEditClick, onDelete}) => {
 
   if (!projects || projects.length === 0) {
     return <div>No projects available.</div>;
@@ -13,7 +13,14 @@ const ProjectCard = ({projects, onProjectClick, onEditClick, onDelete}) => {
         <Grid.Column key={project.project_id} onClick={() => onProjectClick(project.project_id)}>
           <Card
             header={`Title: ${project.project_title}`}
-            meta={`Project ID: ${project.project_id}`}
+            meta={
+              <div>
+                <span>Project ID: {project.project_id}</span>
+                {schedules[project.project_id]?.at_risk && (
+                  <Label color="red" size="tiny" style={{ marginLeft: '8px' }}>Behind schedule</Label>
+                )}
+              </div>
+            }
             description={`Description: ${project.project_description}`}
             extra={
               <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
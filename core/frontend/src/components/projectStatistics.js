@@ -1,5 +1,13 @@
 import React, { useEffect, useState } from 'react';
-import { fetchProjectStatistics } from '../services/api';
+import { fetchProjectStatistics, projectEventsUrl } from '../services/api';
+
+const applyDelta = (stats, delta) => {
+  const updated = { ...stats };
+  Object.entries(delta || {}).forEach(([key, change]) => {
+    updated[key] = (updated[key] || 0) + change;
+  });
+  return updated;
+};
 
 const ProjectStats = ({ projectId }) => {
   const [stats, setStats] = useState({
@@ -24,7 +32,39 @@ const ProjectStats = ({ projectId }) => {
       }
     };
 
-    fetchStatistics();
+    if (typeof EventSource === 'undefined') {
+      fetchStatistics();
+      return undefined;
+    }
+
+    // The stream opens with a snapshot and then pushes counter deltas,
+    // so the dashboard never polls the statistics endpoint
+    const source = new EventSource(projectEventsUrl(projectId), { withCredentials: true });
+    const onSnapshot = (event) => {
+      setStats(JSON.parse(event.data));
+      setError(null);
+      setLoading(false);
+    };
+    const onChange = (event) => {
+      const { delta } = JSON.parse(event.data);
+      setStats((current) => applyDelta(current, delta));
+    };
+    const changeEvents = [
+      'annotation.created',
+      'annotation.deleted',
+      'task.created',
+    ];
+    source.addEventListener('snapshot', onSnapshot);
+    changeEvents.forEach((name) => source.addEventListener(name, onChange));
+    source.addEventListener('project.deleted', () => source.close());
+    source.onerror = () => {
+      // EventSource reconnects on its own; fall back to a single fetch until it does
+      if (source.readyState === EventSource.CLOSED) {
+        fetchStatistics();
+      }
+    };
+
+    return () => source.close();
   }, [projectId]);
 
   if (loading) return <div>Loading statistics...</div>;
@@ -16,15 +16,18 @@ export const fetchProject = (projectId) => getRequest(`/api/projects/${projectId
 export const createProject = (projectData) => postRequest(`/api/projects/`, projectData);
 export const updateProject = (projectId, projectData) => putRequest(`/api/projects/${projectId}`, projectData);
 export const deleteProject = (projectId) => deleteRequest(`/api/projects/${projectId}`);
+export const fetchProjectSchedule = () => getRequest(`/api/projects/schedule`);
 
 // Tasks APIs
-export const fetchTasks = (projectId, userId, currentRole) => 
-  getRequest(`/api/tasks/fetchall/imgUrl-and-labelStatus`, { project_id: projectId, user_id: userId, role: currentRole });
+export const fetchTasks = (projectId, userId, currentRole, order) => 
+  getRequest(`/api/tasks/fetchall/imgUrl-and-labelStatus`, { project_id: projectId, user_id: userId, role: currentRole, order });
 
 export const fetchTask = (projectId, userId, currentRole, taskId) => 
   getRequest(`/api/tasks/fetch/imgUrl-and-labelStatus`, { project_id: projectId, user_id: userId, role: currentRole, task_id: taskId });
 
-export const assignTasks = (projectId) => getRequest(`/api/tasks/assign-tasks/auto`, { project_id: projectId });
+export const fetchTaskPrediction = (taskId) => getRequest(`/api/tasks/${taskId}/prediction`);
+export const deduplicateTasks = (projectId) => postRequest(`/api/projects/${projectId}/deduplicate`);
+export const assignTasks = (projectId, strategy) => getRequest(`/api/tasks/assign-tasks/auto`, { project_id: projectId, strategy });
 export const deleteTask = (taskId) => deleteRequest(`/api/tasks/${taskId}`);
 
 export const uploadTaskFromCSV = (projectId, formData) => 
@@ -46,8 +49,15 @@ export const unAssignTaskToReviewer = (taskId, taskUnAssignData) => postRequest(
 export const assignRole = (userRole) => postRequest(`/api/users/assign-role`, userRole);
 export const unAssignRole = (unAssignData) => postRequest(`/api/users/unassign-role`, unAssignData);
 
+// Map APIs; bounds are { west, south, east, north } in degrees
+export const fetchTaskClusters = (projectId, zoom, bounds) =>
+  getRequest(`/api/projects/${projectId}/tasks/clusters`, { zoom, ...bounds });
+export const fetchTaskLocations = (projectId, bounds, limit) =>
+  getRequest(`/api/projects/${projectId}/tasks/locations`, { ...bounds, limit });
+
 // Project Stats
 export const fetchProjectStatistics = (projectId) => getRequest(`/api/projects/${projectId}/statistics`);
+export const projectEventsUrl = (projectId) => `${BASE_API_URL}/api/projects/${projectId}/events`;
 
 // Annotations APIs
 export const fetchAnnotationByUserAndTaskID = (userId, taskId) => getRequest(`/api/tasks/${taskId}/user/${userId}/annotations`);
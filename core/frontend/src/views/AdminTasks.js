@@ -103,7 +103,7 @@ const AdminTasksList = ({
         <Table.Body>
           {tasksWithUsers.map(task => (
             <Table.Row key={task.task_id}>
-              <Table.Cell>{task.task_id}</Table.Cell>
+              <Table.Cell>{task.external_id}</Table.Cell>
               <Table.Cell>
                 <Image src={task.image_url} size="small" />
               </Table.Cell>
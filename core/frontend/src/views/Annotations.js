@@ -14,6 +14,7 @@ import { createAnnotation,
         fetchProject,
         fetchTask,
         fetchTasks,
+        fetchTaskPrediction,
         updateAnnotation,
         updateReview } from '../services/api';
 import '../assets/styles/AnnotationPage.css';
@@ -28,6 +29,7 @@ const AnnotationPage = () => {
   const [tasks, setTasks] = useState([]);
   const [filter, setFilter] = useState('all');
   const [labelOptions, setLabelOptions] = useState([]);
+  const [prediction, setPrediction] = useState(null);
   const navigate = useNavigate();
 
 
@@ -42,6 +44,8 @@ const AnnotationPage = () => {
         setTask(taskResponse.data);
 
         if (role === 'annotator'){
+          const predictionResponse = await fetchTaskPrediction(taskId);
+          setPrediction(predictionResponse.data);
           const labelResponse = await fetchAnnotationByUserAndTaskID(user.user_info.user_id, taskId);
           if (labelResponse.data){
           setLabel(labelResponse.data.label);
@@ -84,7 +88,9 @@ const AnnotationPage = () => {
     if (task) {
       const fetchAndSetTasks = async () => {
         try {
-          const response = await fetchTasks(projectId, user.user_info.user_id, role);
+          // Annotators get the tasks the model is least sure about first
+          const order = role === 'annotator' ? 'margin' : undefined;
+          const response = await fetchTasks(projectId, user.user_info.user_id, role, order);
           setTasks(response.data);
         } catch (error) {
           setError('Failed to fetch tasks');
@@ -152,7 +158,7 @@ const submitReview = async (data) => {
   const handleFilterChange = (e, { value }) => setFilter(value);
 
   const handleNavigation = (direction) => async() => {
-    const currentIndex = tasks.findIndex(t => t.task_id === taskId);
+    const currentIndex = tasks.findIndex(t => String(t.task_id) === taskId);
     const nextIndex = direction === 'next' ? currentIndex + 1 : currentIndex - 1;
     if (nextIndex >= 0 && nextIndex < tasks.length) {
       navigate(`/projects/${projectId}/tasks/${tasks[nextIndex].task_id}`);
@@ -192,8 +198,12 @@ const submitReview = async (data) => {
     return true;
   });
   const header = role === 'annotator' ? 'Annotation': role === 'reviewer' ? 'Reviewer': 'Admin';
-  const labelOptionsTitle = role === 'annotator' ? 'Label Options': role === 'reviewer' ? "Label Options (Annotators' Agreement Score)": 'Admin';
+  const labelOptionsTitle = role === 'annotator' ? (prediction ? 'Label Options (Model Score)' : 'Label Options'): role === 'reviewer' ? "Label Options (Annotators' Agreement Score)": 'Admin';
   const annotationAgreementScores = role === 'reviewer' ? calculateAnnotationFractions(task): {};
+  // Annotators see the model scores next to each label instead
+  const predictionScores = prediction
+    ? Object.fromEntries(prediction.scores.map(({ label, score }) => [label, score.toFixed(2)]))
+    : {};
 
   return (
     <div className="annotation-container">
@@ -211,7 +221,7 @@ const submitReview = async (data) => {
       
       <div className="annotation-main-content">
         <div className="image-container">
-          <div className="task-id">Task ID: {task.task_id}</div>
+          <div className="task-id">Task ID: {task.external_id}</div>
           <TaskImage imageUrl={task.image_url} />
         </div>
       
@@ -228,14 +238,23 @@ const submitReview = async (data) => {
         labelOptions={labelOptions}
         currentLabel={label}
         onLabelChange={handleLabelChange}
-        agreementScores={annotationAgreementScores} 
+        agreementScores={role === 'annotator' ? predictionScores : annotationAgreementScores} 
         />
 
+      {role === 'annotator' && prediction && !label && (
+        <div className="prediction-suggestion">
+          Model suggests <strong>{prediction.label}</strong> ({prediction.confidence.toFixed(2)})
+          <Button size="small" onClick={() => submitAnnotation({ value: prediction.label })}>
+            Use suggestion
+          </Button>
+        </div>
+      )}
+
       <NavigationButtons 
         onPrevious={handleNavigation('previous')} 
         onNext={handleNavigation('next')} 
-        disablePrevious={tasks.findIndex(t => t.task_id === taskId) === 0}
-        disableNext={tasks.findIndex(t => t.task_id === taskId) === tasks.length - 1}
+        disablePrevious={tasks.findIndex(t => String(t.task_id) === taskId) === 0}
+        disableNext={tasks.findIndex(t => String(t.task_id) === taskId) === tasks.length - 1}
       />
     </div>
   );
@@ -26,7 +26,7 @@ const AnnotatorTasksList = ({ tasks, onRowClick, onCsvFileChange, onCsvSubmit, s
                 <Table.Body>
                     {currentTasks.map(task => (
                         <Table.Row key={task.task_id} onClick={() => onRowClick(task.task_id)} style={{ cursor: 'pointer' }}>
-                            <Table.Cell>{task.task_id}</Table.Cell>
+                            <Table.Cell>{task.external_id}</Table.Cell>
                             <Table.Cell>
                                 <Image src={task.image_url} size="small" />
                             </Table.Cell>
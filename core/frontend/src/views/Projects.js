@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useReducer } from 'react';
 import { Button, Icon } from 'semantic-ui-react';
-import { createProject, updateProject, deleteProject, fetchProjects, uploadTaskFromCSV } from '../services/api';
+import { createProject, updateProject, deleteProject, fetchProjects, fetchProjectSchedule, uploadTaskFromCSV } from '../services/api';
 import ProjectGrid from '../components/ProjectGrid';
 import CreateProjectModal from '../components/CreateProjectModal';
 import RoleSelectionModal from '../components/RoleSelectionModal';
@@ -23,6 +23,7 @@ function modalReducer(state, action) {
 const ProjectsPage = () => {
   const { user, role } = useUser();
   const [projects, setProjects] = useState([]);
+  const [schedules, setSchedules] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [modalOpen, setModalOpen] = useState(false);
@@ -32,6 +33,9 @@ const ProjectsPage = () => {
     max_annotators_per_task: '',
     completion_deadline: '',
     labels: '',
+    assignment_mode: 'fixed',
+    min_annotators_per_task: '2',
+    consensus_threshold: '1',
   });
   const [csvFile, setCsvFile] = useState(null);
   const navigate = useNavigate();
@@ -39,13 +43,20 @@ const ProjectsPage = () => {
 
   useEffect(() => {
     fetchAndSetProjects();
-    }, []);
+    }, [role]);
 
   const fetchAndSetProjects = async () => {
     setLoading(true);
     try {
-      const response = await fetchProjects();
-      setProjects(response.data);
+      const [response, scheduleResponse] = await Promise.all([fetchProjects(), fetchProjectSchedule()]);
+      const scheduleByProject = Object.fromEntries(scheduleResponse.data.map(schedule => [schedule.project_id, schedule]));
+      // Annotators and reviewers see the projects most at risk of missing their deadline first
+      const ordered = role === 'admin'
+        ? response.data
+        : [...response.data].sort((a, b) =>
+            (scheduleByProject[b.project_id]?.priority || 0) - (scheduleByProject[a.project_id]?.priority || 0));
+      setSchedules(scheduleByProject);
+      setProjects(ordered);
       sessionStorage.setItem('projects', JSON.stringify(response.data));
     } catch (error) {
       setError('Failed to fetch projects');
@@ -72,6 +83,9 @@ const ProjectsPage = () => {
     max_annotators_per_task: parseInt(newProject.max_annotators_per_task),
     completion_deadline: new Date(newProject.completion_deadline).toISOString(),
     labels: newProject.labels,
+    assignment_mode: newProject.assignment_mode,
+    min_annotators_per_task: parseInt(newProject.min_annotators_per_task),
+    consensus_threshold: parseFloat(newProject.consensus_threshold),
   };
 
   let projectResponse;
@@ -115,6 +129,9 @@ const ProjectsPage = () => {
       max_annotators_per_task: project.max_annotators_per_task.toString(), // Convert number to string for the form input
       completion_deadline: new Date(project.completion_deadline).toISOString().split('T')[0], // Format date for input
       labels: project.labels,
+      assignment_mode: project.assignment_mode,
+      min_annotators_per_task: project.min_annotators_per_task.toString(),
+      consensus_threshold: project.consensus_threshold.toString(),
     });
     setModalOpen(true); // Open the modal for editing
   };
@@ -126,6 +143,9 @@ const ProjectsPage = () => {
       max_annotators_per_task: '',
       completion_deadline: '',
       labels: '',
+      assignment_mode: 'fixed',
+      min_annotators_per_task: '2',
+      consensus_threshold: '1',
     });
     setModalOpen(true); // Open the modal for editing
   };
@@ -145,6 +165,7 @@ const ProjectsPage = () => {
       </div>
       <ProjectGrid
         projects={projects}
+        schedules={schedules}
         onProjectClick={handleProjectClick}
         onEditClick={handleEditClick}
         onDelete={handleDelete}
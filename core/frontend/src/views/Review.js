@@ -70,7 +70,7 @@ const ReviewerPage = () => {
   const handleFilterChange = (e, { value }) => setFilter(value);
 
   const handleNavigation = (direction) => () => {
-    const currentIndex = tasks.findIndex(t => t.task_id === taskId);
+    const currentIndex = tasks.findIndex(t => String(t.task_id) === taskId);
     const nextIndex = direction === 'next' ? currentIndex + 1 : currentIndex - 1;
     if (nextIndex >= 0 && nextIndex < tasks.length) {
       navigate(`/projects/${projectId}/tasks/${tasks[nextIndex].task_id}/review`);
@@ -91,7 +91,7 @@ const ReviewerPage = () => {
       <h2 className="page-title"><Icon name="tag" /> Review Tasks</h2>
       <div className="annotation-main-content">
         <div className="image-container">
-          <div className="task-id">Task ID: {task.task_id}</div>
+          <div className="task-id">Task ID: {task.external_id}</div>
           <TaskImage imageUrl={task.image_url} />
         </div>
       
@@ -106,8 +106,8 @@ const ReviewerPage = () => {
       <NavigationButtons 
         onPrevious={handleNavigation('previous')} 
         onNext={handleNavigation('next')} 
-        disablePrevious={tasks.findIndex(t => t.task_id === taskId) === 0}
-        disableNext={tasks.findIndex(t => t.task_id === taskId) === tasks.length - 1}
+        disablePrevious={tasks.findIndex(t => String(t.task_id) === taskId) === 0}
+        disableNext={tasks.findIndex(t => String(t.task_id) === taskId) === tasks.length - 1}
       />
     </div>
   );
@@ -12,7 +12,7 @@ const TaskList = ({ tasks, onSelectTask, filter }) => {
     <List>
       {filteredTasks.map(task => (
         <List.Item key={task.task_id} onClick={() => onSelectTask(task.task_id)} style={{ cursor: 'pointer' }}>
-          Task ID: {task.task_id}
+          Task ID: {task.external_id}
         </List.Item>
       ))}
     </List>
@@ -3,7 +3,7 @@ import { Loader, Message, Button, Icon, Dropdown, Sidebar, Segment } from 'seman
 import { useParams, useNavigate } from 'react-router-dom';
 import { useUser } from '../UserContext';
 import ProjectStats from "../components/projectStatistics";
-import { fetchTasks, uploadTaskFromCSV, assignTasks, fetchReviewers, fetchReviewersbyTask, exportAnnotations, deleteTask, assignTaskToReviewer, unAssignTaskToReviewer } from '../services/api';
+import { fetchTasks, uploadTaskFromCSV, assignTasks, deduplicateTasks, fetchReviewers, fetchReviewersbyTask, exportAnnotations, deleteTask, assignTaskToReviewer, unAssignTaskToReviewer } from '../services/api';
 import AnnotatorTasksList from './AnnotatorTasks';
 import AdminTasksList from './AdminTasks';
 import { saveAs } from 'file-saver';
@@ -91,6 +91,18 @@ const TasksPage = () => {
     // navigate(0);
   };
 
+  const handleDeduplicate = async () => {
+    try {
+      const response = await deduplicateTasks(projectId);
+      const { duplicates, groups } = response.data;
+      setSuccessMessage(`Found ${duplicates} near-duplicate images in ${groups} groups; they will take their group's label`);
+      setSuccess(true);
+      setTimeout(() => setSuccess(false), 5000);
+    } catch (error) {
+      setError('Failed to detect duplicate images');
+    }
+  };
+
   const handleAssignReviewer = async (task, reviewerId) => {
     if (reviewerId) {
       // const taskAssignData = ;
@@ -233,6 +245,14 @@ const TasksPage = () => {
               content="Assign"
             />
 
+            <Button 
+              icon="clone"
+              onClick={handleDeduplicate}
+              aria-label="Group near-duplicate task images"
+              className="icon-button"
+              content="Duplicates"
+            />
+
             <Dropdown
               text="Export Data"
               icon="download"
@@ -0,0 +1,391 @@
+"""
+Diagnostics for a SKAInnotate deployment, run with `skainnotate checks`.
+
+Probes the annotation database (connect latency, pool and server connections,
+query plans of the hot queries, table sizes and dead rows) and times a
+synthetic request mix against a running core backend. Everything ends up in
+one JSON report so runs before and after a scaling change can be diffed.
+"""
+import os
+import re
+import json
+import time
+import random
+import socket
+import platform
+import datetime
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+
+# Tables smaller than this are scanned sequentially by design; do not flag them
+SEQ_SCAN_MIN_ROWS = int(os.getenv("CHECKS_SEQ_SCAN_MIN_ROWS", "1000"))
+# Dead rows above this share of live rows mean autovacuum is falling behind
+BLOAT_RATIO = float(os.getenv("CHECKS_BLOAT_RATIO", "0.2"))
+POOL_CHECKOUT_WARN_MS = 50.0
+
+# The queries behind the task list, labeled status, statistics and per-task
+# label lookups in core/backend/app/crud.py, in their SQL form
+HOT_QUERIES = {
+  "project_tasks": """
+    SELECT task_id, external_id, image FROM tasks
+    WHERE project_id = :project_id ORDER BY task_id""",
+  "assigned_tasks": """
+    SELECT tasks.task_id FROM tasks
+    JOIN assigned_tasks ON assigned_tasks.task_id = tasks.task_id
+    WHERE tasks.project_id = :project_id AND assigned_tasks.user_id = :user_id
+      AND assigned_tasks.assignment_type = 'annotation'""",
+  "task_annotations": """
+    SELECT annotations.task_id, annotations.user_id, labels.name FROM annotations
+    JOIN labels ON labels.label_id = annotations.label_id
+    WHERE annotations.task_id IN (SELECT task_id FROM tasks WHERE project_id = :project_id)""",
+  "labeled_status": """
+    SELECT DISTINCT tasks.task_id, annotations.task_id IS NOT NULL FROM tasks
+    LEFT OUTER JOIN annotations ON annotations.task_id = tasks.task_id AND annotations.user_id = :user_id
+    WHERE tasks.project_id = :project_id ORDER BY tasks.task_id""",
+  "completed_tasks": """
+    SELECT count(*) FROM (SELECT annotations.task_id FROM annotations
+      JOIN tasks ON tasks.task_id = annotations.task_id
+      WHERE tasks.project_id = :project_id
+      GROUP BY annotations.task_id HAVING count(annotations.annotation_id) >= 1) AS completed""",
+  "user_annotation": """
+    SELECT annotation_id, label FROM annotations WHERE task_id = :task_id AND user_id = :user_id""",
+  "user_review": """
+    SELECT review_id, label FROM reviews WHERE task_id = :task_id AND user_id = :user_id""",
+}
+
+# Weighted GET requests a busy annotation session sends; weights are relative
+REQUEST_MIX = [
+  ("projects", "/api/projects/", 1),
+  ("project", "/api/projects/{project_id}", 1),
+  ("statistics", "/api/projects/{project_id}/statistics", 2),
+  ("labeled_status", "/api/projects/{project_id}/labeled-status?user_id={user_id}", 3),
+  ("task_rows", "/api/tasks/fetchall/imgUrl-and-labelStatus?project_id={project_id}&user_id={user_id}&role=admin", 2),
+  ("task", "/api/tasks/{task_id}", 3),
+]
+
+def _percentile(samples: List[float], q: float) -> float:
+  ordered = sorted(samples)
+  return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def _latency(samples: List[float]) -> Dict:
+  if not samples:
+    return {"runs": 0}
+  return {
+    "runs": len(samples),
+    "min_ms": round(min(samples) * 1000, 3),
+    "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+    "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+    "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+    "max_ms": round(max(samples) * 1000, 3),
+  }
+
+def _issue(check: str, message: str, **details) -> Dict:
+  return {"check": check, "message": message, **details}
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+def check_connections(database_url: str, samples: int = 10, pool_size: int = 5) -> Dict:
+  """
+  Time fresh connections and pooled checkouts, and report server-side connection use.
+
+  :return: Report section with `connect`, `checkout`, `pool` and `server` entries.
+  """
+  fresh = create_engine(database_url, poolclass=NullPool)
+  connect_times = []
+  for _ in range(samples):
+    start = time.perf_counter()
+    with fresh.connect() as connection:
+      connection.execute(text("SELECT 1"))
+    connect_times.append(time.perf_counter() - start)
+  fresh.dispose()
+
+  options = {} if database_url.startswith("sqlite") else {"pool_size": pool_size, "pool_pre_ping": True}
+  pooled = create_engine(database_url, **options)
+  checkout_times = []
+  try:
+    # Warm the pool, then time checkouts that should reuse open connections
+    with pooled.connect() as connection:
+      connection.execute(text("SELECT 1"))
+    for _ in range(samples):
+      start = time.perf_counter()
+      with pooled.connect() as connection:
+        connection.execute(text("SELECT 1"))
+      checkout_times.append(time.perf_counter() - start)
+    pool = {"class": type(pooled.pool).__name__, "status": pooled.pool.status()}
+    with pooled.connect() as connection:
+      server = _server_connections(connection)
+  finally:
+    pooled.dispose()
+
+  return {
+    "connect": _latency(connect_times),
+    "checkout": _latency(checkout_times),
+    "pool": pool,
+    "server": server,
+  }
+
+def _server_connections(connection: Connection) -> Dict:
+  if connection.dialect.name != "postgresql":
+    return {"dialect": connection.dialect.name}
+  rows = connection.execute(text(
+    "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+    "WHERE datname = current_database() GROUP BY 1")).all()
+  return {
+    "dialect": "postgresql",
+    "version": connection.execute(text("SHOW server_version")).scalar(),
+    "max_connections": int(connection.execute(text("SHOW max_connections")).scalar()),
+    "connections_by_state": {state: count for state, count in rows},
+  }
+
+def _sample_parameters(connection: Connection) -> Dict:
+  """
+  IDs to plan the hot queries with: the largest project and one of its annotators.
+  """
+  project_id = connection.execute(text(
+    "SELECT project_id FROM tasks GROUP BY project_id ORDER BY count(*) DESC LIMIT 1")).scalar()
+  task_id = connection.execute(text(
+    "SELECT min(task_id) FROM tasks WHERE project_id = :project_id"), {"project_id": project_id}).scalar()
+  user_id = connection.execute(text(
+    "SELECT user_id FROM annotations WHERE task_id = :task_id LIMIT 1"), {"task_id": task_id}).scalar()
+  if user_id is None:
+    user_id = connection.execute(text("SELECT min(user_id) FROM users")).scalar()
+  return {"project_id": project_id or 0, "task_id": task_id or 0, "user_id": user_id or 0}
+
+def _postgres_scans(plan: Dict) -> List[Dict]:
+  scans = []
+  if plan.get("Node Type") == "Seq Scan":
+    scans.append({"table": plan.get("Relation Name"), "filter": plan.get("Filter"),
+                  "rows": plan.get("Plan Rows")})
+  for child in plan.get("Plans", []):
+    scans.extend(_postgres_scans(child))
+  return scans
+
+def _sqlite_scans(rows: List) -> List[Dict]:
+  # "SCAN tasks" reads the whole table; "SEARCH tasks USING INDEX ..." does not
+  scans = []
+  for row in rows:
+    match = re.match(r"SCAN (?:TABLE )?(\w+)(.*)", row[-1])
+    if match and "COVERING INDEX" not in match.group(2) and "USING INDEX" not in match.group(2):
+      scans.append({"table": match.group(1), "filter": None, "rows": None})
+  return scans
+
+def explain_hot_queries(connection: Connection, row_counts: Dict[str, int]) -> Dict:
+  """
+  Plan every hot query and flag sequential scans of tables large enough to need an index.
+
+  :return: Report section with the plans and the flagged scans.
+  """
+  parameters = _sample_parameters(connection)
+  postgres = connection.dialect.name == "postgresql"
+  queries, flagged = {}, []
+  for name, sql in HOT_QUERIES.items():
+    start = time.perf_counter()
+    if postgres:
+      plan = connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), parameters).scalar()
+      plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+      scans = _postgres_scans(plan["Plan"])
+      queries[name] = {"planning_ms": plan.get("Planning Time"), "execution_ms": plan.get("Execution Time"),
+                       "total_cost": plan["Plan"].get("Total Cost"), "seq_scans": scans}
+    else:
+      rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), parameters).all()
+      scans = _sqlite_scans(rows)
+      queries[name] = {"plan": [row[-1] for row in rows], "seq_scans": scans}
+    queries[name]["explain_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    for scan in scans:
+      rows = row_counts.get(scan["table"], 0)
+      if rows >= SEQ_SCAN_MIN_ROWS:
+        flagged.append(_issue("missing_index", f"{name} scans all {rows} rows of {scan['table']}",
+                              query=name, table=scan["table"], filter=scan["filter"]))
+  return {"parameters": parameters, "queries": queries, "issues": flagged}
+
+def unindexed_foreign_keys(engine: Engine, row_counts: Dict[str, int]) -> List[Dict]:
+  """
+  Foreign key columns of large tables that are not the leading column of any
+  index; joins and cascading deletes on them scan the referencing table.
+  """
+  inspector = inspect(engine)
+  issues = []
+  for table in inspector.get_table_names():
+    if row_counts.get(table, 0) < SEQ_SCAN_MIN_ROWS:
+      continue
+    leading = {index["column_names"][0] for index in inspector.get_indexes(table) if index["column_names"]}
+    primary_key = inspector.get_pk_constraint(table).get("constrained_columns") or []
+    if primary_key:
+      leading.add(primary_key[0])
+    for unique in inspector.get_unique_constraints(table):
+      leading.add(unique["column_names"][0])
+    for foreign_key in inspector.get_foreign_keys(table):
+      column = foreign_key["constrained_columns"][0]
+      if column not in leading:
+        issues.append(_issue("unindexed_foreign_key",
+                             f"{table}.{column} references {foreign_key['referred_table']} without an index",
+                             table=table, column=column))
+  return issues
+
+def table_sizes(connection: Connection) -> List[Dict]:
+  """
+  Rows and on-disk size per table; on PostgreSQL also dead rows and the last vacuum.
+  """
+  if connection.dialect.name == "postgresql":
+    rows = connection.execute(text("""
+      SELECT relname, n_live_tup, n_dead_tup,
+             pg_relation_size(relid), pg_indexes_size(relid), pg_total_relation_size(relid),
+             greatest(last_vacuum, last_autovacuum), greatest(last_analyze, last_autoanalyze)
+      FROM pg_stat_user_tables ORDER BY pg_total_relation_size(relid) DESC""")).all()
+    return [{
+      "table": name,
+      "rows": live,
+      "dead_rows": dead,
+      "dead_ratio": round(dead / live, 3) if live else 0.0,
+      "table_bytes": table_bytes,
+      "index_bytes": index_bytes,
+      "total_bytes": total_bytes,
+      "last_vacuum": last_vacuum.isoformat() if last_vacuum else None,
+      "last_analyze": last_analyze.isoformat() if last_analyze else None,
+    } for name, live, dead, table_bytes, index_bytes, total_bytes, last_vacuum, last_analyze in rows]
+
+  sizes = []
+  for name in inspect(connection).get_table_names():
+    rows = connection.execute(text(f'SELECT count(*) FROM "{name}"')).scalar()
+    sizes.append({"table": name, "rows": rows})
+  if connection.dialect.name == "sqlite":
+    page_size = connection.execute(text("PRAGMA page_size")).scalar()
+    free_pages = connection.execute(text("PRAGMA freelist_count")).scalar()
+    pages = connection.execute(text("PRAGMA page_count")).scalar()
+    sizes.append({"table": "(database file)", "total_bytes": pages * page_size,
+                  "free_bytes": free_pages * page_size})
+  return sizes
+
+def bloat_issues(sizes: List[Dict]) -> List[Dict]:
+  return [_issue("bloat", f"{size['table']} has {size['dead_rows']} dead rows ({size['dead_ratio']:.0%} of live)",
+                 table=size["table"])
+          for size in sizes
+          if size.get("dead_ratio", 0) > BLOAT_RATIO and size.get("dead_rows", 0) >= SEQ_SCAN_MIN_ROWS]
+
+def check_database(database_url: str, samples: int = 10) -> Dict:
+  """
+  :return: Report section with connection timings, table sizes, query plans and issues.
+  """
+  report = {"connections": check_connections(database_url, samples)}
+  issues = []
+  checkout = report["connections"]["checkout"]
+  if checkout.get("p95_ms", 0) > POOL_CHECKOUT_WARN_MS:
+    issues.append(_issue("pool", f"Pooled checkout p95 is {checkout['p95_ms']}ms; connections are not being reused"))
+  server = report["connections"]["server"]
+  if "max_connections" in server:
+    in_use = sum(server["connections_by_state"].values())
+    if in_use > 0.8 * server["max_connections"]:
+      issues.append(_issue("connections", f"{in_use} of {server['max_connections']} server connections in use"))
+
+  engine = create_engine(database_url, poolclass=NullPool)
+  try:
+    with engine.connect() as connection:
+      report["tables"] = table_sizes(connection)
+      row_counts = {size["table"]: size.get("rows") or 0 for size in report["tables"]}
+      if "tasks" in row_counts:
+        report["hot_queries"] = explain_hot_queries(connection, row_counts)
+        issues.extend(report["hot_queries"].pop("issues"))
+    issues.extend(unindexed_foreign_keys(engine, row_counts))
+    issues.extend(bloat_issues(report["tables"]))
+  finally:
+    engine.dispose()
+  report["issues"] = issues
+  return report
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+def _get(url: str, cookie: Optional[str], timeout: float) -> tuple:
+  request = urllib.request.Request(url, headers={"Cookie": cookie} if cookie else {})
+  start = time.perf_counter()
+  try:
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+      response.read()
+      status = response.status
+  except urllib.error.HTTPError as e:
+    status = e.code
+  except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+    status = type(e).__name__
+  return status, time.perf_counter() - start
+
+def check_endpoints(base_url: str, parameters: Dict, requests: int = 200, concurrency: int = 8,
+                    cookie: Optional[str] = None, timeout: float = 30.0, seed: int = 0) -> Dict:
+  """
+  Send a weighted mix of the frontend's read requests and time them per endpoint.
+
+  :param parameters: project_id, user_id and task_id substituted into the paths.
+  :return: Report section with overall throughput and per-endpoint latencies and status codes.
+  """
+  names = [name for name, _, _ in REQUEST_MIX]
+  paths = {name: path.format(**parameters) for name, path, _ in REQUEST_MIX}
+  weights = [weight for _, _, weight in REQUEST_MIX]
+  picks = random.Random(seed).choices(names, weights=weights, k=requests)
+  base_url = base_url.rstrip("/")
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    results = list(pool.map(lambda name: (name, *_get(base_url + paths[name], cookie, timeout)), picks))
+  elapsed = time.perf_counter() - start
+
+  endpoints = {}
+  for name in names:
+    samples = [duration for pick, _, duration in results if pick == name]
+    statuses = {}
+    for pick, status, _ in results:
+      if pick == name:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    endpoints[name] = {"path": paths[name], **_latency(samples), "statuses": statuses}
+
+  failed = sum(1 for _, status, _ in results if not isinstance(status, int) or status >= 400)
+  issues = [_issue("endpoint", f"{name} answered {endpoint['statuses']}", endpoint=name)
+            for name, endpoint in endpoints.items()
+            if any(not status.isdigit() or int(status) >= 400 for status in endpoint["statuses"])]
+  return {
+    "base_url": base_url,
+    "requests": requests,
+    "concurrency": concurrency,
+    "elapsed_s": round(elapsed, 3),
+    "throughput_per_s": round(requests / elapsed, 2) if elapsed else None,
+    "errors": failed,
+    "overall": _latency([duration for _, _, duration in results]),
+    "endpoints": endpoints,
+    "issues": issues,
+  }
+
+def run_checks(database_url: Optional[str] = None, base_url: Optional[str] = None,
+               requests: int = 200, concurrency: int = 8, samples: int = 10,
+               cookie: Optional[str] = None) -> Dict:
+  """
+  Run the database and endpoint checks that have a target.
+
+  :return: The full report; `issues` collects the findings of every section.
+  """
+  report = {
+    "generated_at": datetime.datetime.utcnow().isoformat() + "Z",
+    "host": platform.node(),
+    "python": platform.python_version(),
+  }
+  issues = []
+  parameters = {"project_id": 1, "user_id": 1, "task_id": 1}
+  if database_url:
+    try:
+      report["database"] = check_database(database_url, samples)
+      issues.extend(report["database"].pop("issues"))
+      parameters = report["database"].get("hot_queries", {}).get("parameters", parameters)
+    except Exception as e:
+      report["database"] = {"error": str(e)}
+      issues.append(_issue("database", f"Database checks failed: {e}"))
+  if base_url:
+    report["endpoints"] = check_endpoints(base_url, parameters, requests, concurrency, cookie)
+    issues.extend(report["endpoints"].pop("issues"))
+  report["issues"] = issues
+  return report
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import os
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from typing import Generator
@@ -18,6 +19,12 @@ class Deployment(Base):
   service_name = Column(String)
   service_url = Column(String)
   deployed_at = Column(DateTime, default=datetime.utcnow)
+  # Progress of the background deployment operation
+  region = Column(String)
+  operation_name = Column(String)
+  progress = Column(String)
+  error = Column(String)
+  updated_at = Column(DateTime, default=datetime.utcnow)
 
   def __repr__(self):
     return (f"<Deployment(project_id='{self.project_id}', " +
@@ -26,8 +33,23 @@ class Deployment(Base):
     "service_name='{self.service_name}', " +
     "url='{self.service_url}')>")
 
-engine = create_engine('sqlite:///deployment_setup/deployments.db')
+# Relative to the directory the server is started from
+DEPLOYMENTS_DATABASE_URL = os.getenv("DEPLOYMENTS_DATABASE_URL", "sqlite:///deployment_setup/deployments.db")
+
+engine = create_engine(DEPLOYMENTS_DATABASE_URL,
+                       connect_args={"check_same_thread": False})
 Base.metadata.create_all(engine)
+
+def _add_missing_columns():
+  # deployments.db files created by earlier versions lack the progress columns
+  existing = {column["name"] for column in inspect(engine).get_columns(Deployment.__tablename__)}
+  with engine.begin() as connection:
+    for column in Deployment.__table__.columns:
+      if column.name not in existing:
+        column_type = column.type.compile(engine.dialect)
+        connection.execute(text(f"ALTER TABLE {Deployment.__tablename__} ADD COLUMN {column.name} {column_type}"))
+
+_add_missing_columns()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db() -> Generator:
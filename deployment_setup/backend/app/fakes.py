@@ -0,0 +1,170 @@
+"""
+In-memory stand-ins for the Cloud Run and Cloud SQL Admin clients.
+
+Enabled with SKAINNOTATE_FAKE_GCP=1 to run the deployment flow locally without
+a GCP project. Operations complete after FAKE_OPERATION_SECONDS; services whose
+name starts with "fail" end in an error.
+"""
+import os
+import time
+import threading
+from types import SimpleNamespace
+from typing import Callable, Dict, Set
+
+import httplib2
+from google.api_core.exceptions import AlreadyExists, InternalServerError, NotFound
+from googleapiclient.errors import HttpError
+
+FAKE_OPERATION_SECONDS = float(os.getenv("FAKE_OPERATION_SECONDS", "5"))
+
+_lock = threading.Lock()
+# Service path -> (ready time, uri or None when the rollout fails)
+_services: Dict[str, tuple] = {}
+# (project, instance) -> time it becomes RUNNABLE
+_instance_states: Dict[tuple, float] = {}
+_databases: Set[tuple] = set()
+_users: Dict[str, list] = {}
+# SQL admin operation name -> time it is DONE
+_operations: Dict[str, float] = {}
+
+class FakeOperation:
+  """
+  Mimics google.api_core.operation.Operation: done() polls, result() blocks.
+  """
+  def __init__(self, name: str, ready_at: float, resolve: Callable):
+    self.operation = SimpleNamespace(name=name)
+    self._ready_at = ready_at
+    self._resolve = resolve
+
+  def done(self) -> bool:
+    return time.monotonic() >= self._ready_at
+
+  def result(self, timeout=None):
+    time.sleep(max(0.0, self._ready_at - time.monotonic()))
+    return self._resolve()
+
+class FakeServicesClient:
+  def create_service(self, parent: str, service, service_id: str) -> FakeOperation:
+    service_path = f"{parent}/services/{service_id}"
+    ready_at = time.monotonic() + FAKE_OPERATION_SECONDS
+    with _lock:
+      if service_path in _services:
+        raise AlreadyExists(f"Service {service_id} already exists")
+      uri = None if service_id.startswith("fail") else f"https://{service_id}-fake.a.run.app"
+      _services[service_path] = (ready_at, uri)
+
+    def resolve():
+      if uri is None:
+        raise InternalServerError(f"Revision of {service_path} failed to become ready")
+      return SimpleNamespace(name=service_path, uri=uri)
+    return FakeOperation(f"{parent}/operations/{service_id}-{int(time.time())}", ready_at, resolve)
+
+  def get_service(self, name: str):
+    with _lock:
+      entry = _services.get(name)
+    if entry is None or entry[1] is None or time.monotonic() < entry[0]:
+      raise NotFound(f"Service {name} not found")
+    return SimpleNamespace(name=name, uri=entry[1])
+
+  def delete_service(self, name: str) -> FakeOperation:
+    with _lock:
+      if _services.pop(name, None) is None:
+        raise NotFound(f"Service {name} not found")
+    return FakeOperation(f"{name}/operations/delete", time.monotonic(), lambda: None)
+
+def _http_error(status: int, message: str):
+  return HttpError(httplib2.Response({"status": status}), message.encode())
+
+def _start_operation(project: str, instance: str) -> dict:
+  """
+  Start an admin operation on `instance`. Like Cloud SQL, an instance runs one
+  operation at a time and answers 409 while one is in progress.
+  """
+  now = time.monotonic()
+  with _lock:
+    if any(name.startswith(f"{project}:{instance}:") and ready_at > now
+           for name, ready_at in _operations.items()):
+      raise _http_error(409, "Operation failed because another operation was already in progress")
+    name = f"{project}:{instance}:{len(_operations)}"
+    _operations[name] = now + FAKE_OPERATION_SECONDS
+  return {"kind": "sql#operation", "name": name, "status": "PENDING"}
+
+class _Request:
+  def __init__(self, call):
+    self._call = call
+
+  def execute(self, http=None, num_retries=0):
+    return self._call()
+
+class _Operations:
+  def get(self, project, operation):
+    def call():
+      ready_at = _operations.get(operation)
+      if ready_at is None:
+        raise _http_error(404, "Operation not found")
+      return {"name": operation, "status": "DONE" if time.monotonic() >= ready_at else "RUNNING"}
+    return _Request(call)
+
+class _Instances:
+  def get(self, project, instance):
+    def call():
+      ready_at = _instance_states.get((project, instance))
+      if ready_at is None:
+        raise _http_error(404, "Instance not found")
+      return {"name": instance, "state": "RUNNABLE" if time.monotonic() >= ready_at else "PENDING_CREATE"}
+    return _Request(call)
+
+  def insert(self, project, body):
+    def call():
+      if (project, body["name"]) in _instance_states:
+        raise _http_error(409, "The Cloud SQL instance already exists")
+      operation = _start_operation(project, body["name"])
+      _instance_states[(project, body["name"])] = _operations[operation["name"]]
+      return operation
+    return _Request(call)
+
+class _Databases:
+  def get(self, project, instance, database):
+    def call():
+      if (project, instance, database) not in _databases:
+        raise _http_error(404, "Database not found")
+      return {"name": database}
+    return _Request(call)
+
+  def insert(self, project, instance, body):
+    def call():
+      operation = _start_operation(project, instance)
+      _databases.add((project, instance, body["name"]))
+      return operation
+    return _Request(call)
+
+class _Users:
+  def list(self, project, instance):
+    return _Request(lambda: {"items": [dict(user) for user in _users.get(f"{project}:{instance}", [])]})
+
+  def insert(self, project, instance, body):
+    def call():
+      operation = _start_operation(project, instance)
+      # Like the real API, listed users do not include their password
+      _users.setdefault(f"{project}:{instance}", []).append({"name": body["name"], "host": body.get("host")})
+      return operation
+    return _Request(call)
+
+  def update(self, project, instance, body, name=None, host=None):
+    return _Request(lambda: _start_operation(project, instance))
+
+class FakeSQLAdmin:
+  """
+  The subset of the sqladmin v1beta4 discovery client used for provisioning.
+  """
+  def instances(self):
+    return _Instances()
+
+  def databases(self):
+    return _Databases()
+
+  def users(self):
+    return _Users()
+
+  def operations(self):
+    return _Operations()
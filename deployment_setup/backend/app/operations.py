@@ -0,0 +1,159 @@
+"""
+Cloud Run deployments run as background tasks on the server's event loop.
+
+Each deployment is a row in the `deployments` table that the task keeps up to
+date while it polls the long-running operation. Listeners (the SSE endpoint)
+receive every state change.
+"""
+import os
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+import deployment_setup.backend.app.utils as utils
+from deployment_setup.backend.app.database import Deployment, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+PENDING = "Pending"
+DEPLOYING = "Deploying"
+SUCCESS = "Success"
+FAILED = "Failed"
+TERMINAL_STATUSES = (SUCCESS, FAILED)
+
+# Seconds between operation polls
+POLL_INTERVAL_SECONDS = float(os.getenv("DEPLOY_POLL_INTERVAL", "2"))
+
+# Keep references so running tasks are not garbage collected
+_tasks: Set[asyncio.Task] = set()
+_listeners: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+@dataclass
+class DeployRequest:
+  project_id: str
+  region: str
+  instance_name: str
+  service_name: str
+  container_image: str
+  env_vars: Dict[str, str]
+  service_account_file: Optional[str] = None
+
+def deployment_state(deployment: Deployment) -> dict:
+  return {
+    "id": deployment.id,
+    "project_id": deployment.project_id,
+    "instance_name": deployment.instance_name,
+    "service_name": deployment.service_name,
+    "region": deployment.region,
+    "deployment_status": deployment.deployment_status,
+    "progress": deployment.progress,
+    "error": deployment.error,
+    "operation_name": deployment.operation_name,
+    "service_url": deployment.service_url,
+    "deployed_at": deployment.deployed_at.isoformat() if deployment.deployed_at else None,
+    "updated_at": deployment.updated_at.isoformat() if deployment.updated_at else None,
+  }
+
+def get_state(deployment_id: int) -> Optional[dict]:
+  with SessionLocal() as db:
+    deployment = db.get(Deployment, deployment_id)
+    return deployment_state(deployment) if deployment else None
+
+def _update(deployment_id: int, **fields) -> Optional[dict]:
+  with SessionLocal() as db:
+    deployment = db.get(Deployment, deployment_id)
+    if deployment is None:  # Removed from the list while running
+      return None
+    for name, value in fields.items():
+      setattr(deployment, name, value)
+    deployment.updated_at = datetime.utcnow()
+    db.commit()
+    state = deployment_state(deployment)
+  for queue in list(_listeners.get(deployment_id, ())):
+    queue.put_nowait(state)
+  return state
+
+def subscribe(deployment_id: int) -> asyncio.Queue:
+  queue = asyncio.Queue()
+  _listeners[deployment_id].add(queue)
+  return queue
+
+def unsubscribe(deployment_id: int, queue: asyncio.Queue):
+  listeners = _listeners.get(deployment_id)
+  if listeners is not None:
+    listeners.discard(queue)
+    if not listeners:
+      del _listeners[deployment_id]
+
+def format_sse(state: dict) -> str:
+  return f"event: deployment\ndata: {json.dumps(state)}\n\n"
+
+def start_deployment(request: DeployRequest) -> dict:
+  """
+  Record a pending deployment and start it in the background.
+
+  :return: The initial deployment state.
+  """
+  with SessionLocal() as db:
+    deployment = Deployment(project_id=request.project_id,
+                            instance_name=request.instance_name,
+                            service_name=request.service_name,
+                            region=request.region,
+                            deployment_status=PENDING,
+                            progress="Queued")
+    db.add(deployment)
+    db.commit()
+    state = deployment_state(deployment)
+
+  task = asyncio.create_task(_run(state["id"], request))
+  _tasks.add(task)
+  task.add_done_callback(_tasks.discard)
+  return state
+
+async def _run(deployment_id: int, request: DeployRequest):
+  try:
+    _update(deployment_id, deployment_status=DEPLOYING, progress="Creating Cloud Run service")
+    # Client calls block on network I/O, so they run in worker threads
+    operation = await asyncio.to_thread(utils.start_deploy,
+                                        service_account_file=request.service_account_file,
+                                        service_name=request.service_name,
+                                        project_id=request.project_id,
+                                        container_image=request.container_image,
+                                        region=request.region,
+                                        instance_connection_name=f"{request.project_id}:{request.region}:{request.instance_name}",
+                                        env_vars=request.env_vars)
+    _update(deployment_id, operation_name=operation.operation.name, progress="Rolling out revision")
+
+    started = asyncio.get_running_loop().time()
+    while not await asyncio.to_thread(operation.done):
+      await asyncio.sleep(POLL_INTERVAL_SECONDS)
+      elapsed = asyncio.get_running_loop().time() - started
+      _update(deployment_id, progress=f"Rolling out revision ({elapsed:.0f}s)")
+
+    service = await asyncio.to_thread(operation.result)
+    _update(deployment_id, deployment_status=SUCCESS, progress="Deployed", service_url=service.uri)
+  except Exception as e:
+    logger.error(f"Deployment {deployment_id} failed: {e}")
+    _update(deployment_id, deployment_status=FAILED, progress="Deployment failed", error=str(e))
+  finally:
+    if request.service_account_file and os.path.exists(request.service_account_file):
+      os.remove(request.service_account_file)
+
+def mark_interrupted():
+  """
+  Fail deployments left running by a previous server process; their tasks are gone.
+  """
+  with SessionLocal() as db:
+    interrupted = (db.query(Deployment)
+                   .filter(Deployment.deployment_status.in_([PENDING, DEPLOYING]))
+                   .all())
+    for deployment in interrupted:
+      deployment.deployment_status = FAILED
+      deployment.error = (f"Interrupted by a server restart; check operation {deployment.operation_name} "
+                          f"in the Cloud Console" if deployment.operation_name else "Interrupted by a server restart")
+      deployment.updated_at = datetime.utcnow()
+    db.commit()
@@ -0,0 +1,246 @@
+"""
+Cloud SQL provisioning as a dependency graph of idempotent steps:
+
+  instance ─┬─ database
+            └─ users ─┬─ app_user
+                      └─ postgres_user
+
+Steps without a dependency between them run concurrently. Every step checks the
+current state before changing it and waits for the admin operation it starts,
+so an interrupted run is resumed by running the pipeline again.
+"""
+import os
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Longest wait for a single admin operation (instance creation takes several minutes)
+OPERATION_TIMEOUT_SECONDS = float(os.getenv("SQL_OPERATION_TIMEOUT", "1800"))
+INITIAL_BACKOFF_SECONDS = float(os.getenv("SQL_INITIAL_BACKOFF", "1"))
+MAX_BACKOFF_SECONDS = float(os.getenv("SQL_MAX_BACKOFF", "30"))
+# 409: another operation is running on the instance; the admin API runs them one at a time
+RETRYABLE_STATUSES = (409, 429, 500, 502, 503, 504)
+MAX_ATTEMPTS = 8
+
+class ProvisioningError(Exception):
+  def __init__(self, step: str, message: str):
+    super().__init__(f"{step}: {message}")
+    self.step = step
+
+@dataclass
+class Step:
+  name: str
+  # Called with the results of the steps that have finished so far
+  run: Callable[[Dict[str, object]], Awaitable]
+  depends_on: Tuple[str, ...] = ()
+
+def _ordered(steps: Iterable[Step]) -> List[Step]:
+  by_name = {step.name: step for step in steps}
+  ordered, visiting, done = [], set(), set()
+
+  def visit(step: Step):
+    if step.name in done:
+      return
+    if step.name in visiting:
+      raise ValueError(f"Dependency cycle at step {step.name}")
+    visiting.add(step.name)
+    for dependency in step.depends_on:
+      if dependency not in by_name:
+        raise ValueError(f"Step {step.name} depends on unknown step {dependency}")
+      visit(by_name[dependency])
+    visiting.discard(step.name)
+    done.add(step.name)
+    ordered.append(step)
+
+  for step in by_name.values():
+    visit(step)
+  return ordered
+
+async def run_graph(steps: Iterable[Step]) -> Dict[str, object]:
+  """
+  Run each step once all its dependencies have finished.
+
+  :return: Result of every step by name. The first failure cancels the steps still running.
+  """
+  tasks: Dict[str, asyncio.Task] = {}
+  results: Dict[str, object] = {}
+
+  async def run_step(step: Step):
+    await asyncio.gather(*(tasks[dependency] for dependency in step.depends_on))
+    results[step.name] = await step.run(results)
+
+  for step in _ordered(steps):
+    tasks[step.name] = asyncio.create_task(run_step(step), name=step.name)
+  try:
+    await asyncio.gather(*tasks.values())
+  except BaseException:
+    for task in tasks.values():
+      task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    raise
+  return results
+
+def backoff_delay(attempt: int) -> float:
+  # Exponential with jitter so concurrent steps do not retry in lockstep
+  return min(MAX_BACKOFF_SECONDS, INITIAL_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _status(error: HttpError) -> int:
+  return int(getattr(error.resp, "status", 0) or 0)
+
+class CloudSQLProvisioner:
+  """
+  Idempotent Cloud SQL admin steps on top of a sqladmin v1beta4 client.
+
+  :param http_factory: Returns a fresh authorized HTTP object per request;
+                       httplib2 connections must not be shared between threads.
+  """
+  def __init__(self, sqladmin, project_id: str, instance_name: str,
+               http_factory: Optional[Callable] = None):
+    self.sqladmin = sqladmin
+    self.project_id = project_id
+    self.instance_name = instance_name
+    self.http_factory = http_factory
+
+  async def execute(self, step: str, request, retry_conflicts: bool = True):
+    for attempt in range(MAX_ATTEMPTS):
+      try:
+        if self.http_factory is None:
+          return await asyncio.to_thread(request.execute)
+        return await asyncio.to_thread(request.execute, http=self.http_factory())
+      except HttpError as e:
+        retryable = _status(e) in RETRYABLE_STATUSES and (retry_conflicts or _status(e) != 409)
+        if not retryable or attempt == MAX_ATTEMPTS - 1:
+          raise
+        delay = backoff_delay(attempt)
+        logger.info(f"{step}: HTTP {_status(e)}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+  async def _poll(self, step: str, check: Callable[[], Awaitable[bool]]):
+    deadline = asyncio.get_running_loop().time() + OPERATION_TIMEOUT_SECONDS
+    attempt = 0
+    while not await check():
+      if asyncio.get_running_loop().time() > deadline:
+        raise ProvisioningError(step, f"timed out after {OPERATION_TIMEOUT_SECONDS:.0f}s")
+      await asyncio.sleep(backoff_delay(attempt))
+      attempt += 1
+
+  async def wait_for_operation(self, step: str, operation: dict):
+    async def done() -> bool:
+      current = await self.execute(step, self.sqladmin.operations().get(project=self.project_id,
+                                                                         operation=operation["name"]))
+      if current.get("status") != "DONE":
+        return False
+      errors = current.get("error", {}).get("errors")
+      if errors:
+        raise ProvisioningError(step, "; ".join(error.get("message", str(error)) for error in errors))
+      return True
+    await self._poll(step, done)
+
+  async def _get_instance(self) -> Optional[dict]:
+    try:
+      return await self.execute("instance", self.sqladmin.instances().get(project=self.project_id,
+                                                                          instance=self.instance_name))
+    except HttpError as e:
+      if _status(e) == 404:
+        return None
+      raise
+
+  async def ensure_instance(self, region: str, tier: str = "db-f1-micro",
+                            database_version: str = "POSTGRES_15") -> bool:
+    """
+    :return: True if the instance was created by this run.
+    """
+    created = False
+    instance = await self._get_instance()
+    if instance is None:
+      body = {
+        "name": self.instance_name,
+        "settings": {"tier": tier},
+        "databaseVersion": database_version,
+        "region": region,
+      }
+      try:
+        operation = await self.execute("instance", self.sqladmin.instances().insert(project=self.project_id, body=body),
+                                       retry_conflicts=False)
+        await self.wait_for_operation("instance", operation)
+        created = True
+      except HttpError as e:
+        # Created concurrently by another run; wait for it below
+        if _status(e) != 409:
+          raise
+
+    # An instance created by an earlier, interrupted run may still be starting
+    async def runnable() -> bool:
+      current = await self._get_instance()
+      return current is not None and current.get("state", "RUNNABLE") == "RUNNABLE"
+    await self._poll("instance", runnable)
+    return created
+
+  async def ensure_database(self, database_name: str) -> bool:
+    """
+    :return: True if the database already existed.
+    """
+    try:
+      await self.execute("database", self.sqladmin.databases().get(project=self.project_id,
+                                                                   instance=self.instance_name,
+                                                                   database=database_name))
+      return True
+    except HttpError as e:
+      if _status(e) != 404:
+        raise
+    operation = await self.execute("database", self.sqladmin.databases().insert(project=self.project_id,
+                                                                                instance=self.instance_name,
+                                                                                body={"name": database_name}))
+    await self.wait_for_operation("database", operation)
+    return False
+
+  async def list_users(self) -> List[dict]:
+    response = await self.execute("users", self.sqladmin.users().list(project=self.project_id,
+                                                                      instance=self.instance_name))
+    return response.get("items", [])
+
+  async def ensure_user(self, users: List[dict], name: str, password: str) -> bool:
+    """
+    :return: True if the user was created by this run.
+    """
+    if any(user["name"] == name for user in users):
+      return False
+    operation = await self.execute(f"user {name}", self.sqladmin.users().insert(
+      project=self.project_id, instance=self.instance_name,
+      body={"name": name, "password": password, "host": "%"}))
+    await self.wait_for_operation(f"user {name}", operation)
+    return True
+
+  async def ensure_postgres_password(self, users: List[dict], password: str):
+    postgres_user = next((user for user in users if user["name"] == "postgres"), None)
+    if postgres_user is None:
+      await self.ensure_user(users, "postgres", password)
+    elif "password" in postgres_user:
+      operation = await self.execute("user postgres", self.sqladmin.users().update(
+        project=self.project_id, instance=self.instance_name, name="postgres",
+        body={"name": "postgres", "password": password, "host": "%"}))
+      await self.wait_for_operation("user postgres", operation)
+
+async def provision_cloudsql(sqladmin, project_id: str, instance_name: str, region: str,
+                             database_name: str, db_user: str, db_pass: str,
+                             http_factory: Optional[Callable] = None) -> Tuple[bool, bool, bool]:
+  """
+  Make sure the instance, database, application user and postgres password exist.
+
+  :return: (instance_created, database_exists, user_created)
+  """
+  provisioner = CloudSQLProvisioner(sqladmin, project_id, instance_name, http_factory)
+  results = await run_graph([
+    Step("instance", lambda results: provisioner.ensure_instance(region)),
+    Step("database", lambda results: provisioner.ensure_database(database_name), ("instance",)),
+    Step("users", lambda results: provisioner.list_users(), ("instance",)),
+    Step("app_user", lambda results: provisioner.ensure_user(results["users"], db_user, db_pass), ("users",)),
+    Step("postgres_user", lambda results: provisioner.ensure_postgres_password(results["users"], db_pass), ("users",)),
+  ])
+  return results["instance"], results["database"], results["app_user"]
@@ -1,5 +1,7 @@
 import os
 import logging
+import secrets
+import tempfile
 from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
 from fastapi.responses import JSONResponse
 from google.oauth2 import service_account
@@ -10,6 +12,7 @@ from pydantic import EmailStr
 import deployment_setup.backend.app.utils as utils
 import deployment_setup.backend.app.configs as configs
 import deployment_setup.backend.app.schema as schema
+import deployment_setup.backend.app.operations as operations
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -48,7 +51,7 @@ async def get_project_details(setProjectData: schema.setProject):
 @router.post("/setup-gcp-sql", response_class=JSONResponse)
 async def setup_cloud_sql(sqlInstanceData: schema.SQLInstance):
   try:
-      out = utils.create_cloudsql_instance(
+      instance_created, database_exists, user_created = await utils.provision_cloudsql_instance(
           project_id=sqlInstanceData.project_id,
           service_account_file=sqlInstanceData.service_account_file,
           instance_name=sqlInstanceData.instance_name,
@@ -57,16 +60,11 @@ async def setup_cloud_sql(sqlInstanceData: schema.SQLInstance):
           db_user=sqlInstanceData.db_user,
           db_pass=sqlInstanceData.db_pass
       )
-
-      if out:
-        instance_created, database_exists, user_created = out
-        return {
-            "message": f"Cloud SQL Instance '{sqlInstanceData.instance_name}' setup complete. "
-                        f"Database '{sqlInstanceData.database_name}' {'created' if not database_exists else 'already exists'}. "
-                        f"User '{sqlInstanceData.db_user}' {'created' if user_created else 'already exists'}."
-        }
-      else:
-        raise HTTPException(status_code=500, detail="Cloud SQL instance creation failed")
+      return {
+          "message": f"Cloud SQL Instance '{sqlInstanceData.instance_name}' {'created' if instance_created else 'ready'}. "
+                      f"Database '{sqlInstanceData.database_name}' {'created' if not database_exists else 'already exists'}. "
+                      f"User '{sqlInstanceData.db_user}' {'created' if user_created else 'already exists'}."
+      }
   except Exception as e:
     logger.error(f"Error setting up Cloud SQL: {e}")
     raise HTTPException(status_code=500, detail=str(e))
@@ -86,7 +84,6 @@ async def setup_cloud_run(
     superuser_username: str = Form(...),
     service_account_file: UploadFile = File(None)  # Optional file field
 ):
-    instance_connection_name = f"{project_id}:{region}:{instance_name}"
     # Assume you have a function to get configuration values:
     cfg = configs.get_configs()
     container_image = cfg['CONTAINER_IMAGE']
@@ -100,42 +97,27 @@ async def setup_cloud_run(
         "INSTANCE_NAME": instance_name,
         "SUPERUSER_EMAIL": superuser_email,
         "SUPERUSER_USERNAME": superuser_username,
-        "GOOGLE_CLIENT_ID": clientId
+        "GOOGLE_CLIENT_ID": clientId,
+        # The backend refuses to start without it; a new deployment signs users out
+        "SECRET_KEY": secrets.token_urlsafe(32),
     }
 
-    try:
-        logger.info(f"Deploying service with file: {service_account_file.filename if service_account_file else 'None'}")
-        logger.info("print env dict: {envs_backend}")
-        envs_vars_str = ",".join([f'{k}={v}' for k, v in envs_backend.items()])
-        logger.info("Done parsing dict to strings for env variables {envs_vars_str}")
-
-        import tempfile
-
-        # Read the file contents from the UploadFile
+    service_account_path = None
+    if service_account_file is not None:
+        # The background task reads the key after this request returns; it deletes the file when done
         file_contents = await service_account_file.read()
-
-        # Save to a temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
             tmp.write(file_contents)
-            tmp_path = tmp.name
-
-        utils.run_deploy(
-            service_account_file=tmp_path,
-            service_name=service_name,
-            project_id=project_id,
-            container_image=container_image,
-            instance_connection_name=instance_connection_name,
-            region=region,
-            env_vars=envs_vars_str
-        )
-
-        logger.info("Fetching Cloud Run service URL")
-        service_url = utils.get_cloud_run_url(
-            service_name=service_name,
-            project_id=project_id,
-            region=region
-        )
-        return {"message": "Deployment successful", "service_url": service_url}
-    except Exception as e:
-        logger.error(f"Error deploying service: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+            service_account_path = tmp.name
+
+    deployment = operations.start_deployment(operations.DeployRequest(
+        project_id=project_id,
+        region=region,
+        instance_name=instance_name,
+        service_name=service_name,
+        container_image=container_image,
+        env_vars=envs_backend,
+        service_account_file=service_account_path,
+    ))
+    logger.info(f"Started deployment {deployment['id']} of service {service_name}")
+    return JSONResponse(status_code=202, content=deployment)
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from deployment_setup.backend.app import schema, database
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from deployment_setup.backend.app import schema, database, operations
 from deployment_setup.backend.app.database import get_db
 from sqlalchemy.orm import Session
 
@@ -24,6 +26,45 @@ def get_deployments(db: Session = Depends(get_db)):
   deployments = db.query(database.Deployment).all()
   return deployments
 
+@router.get("/deployments/{deployment_id}", response_model=schema.DeploymentResponse)
+def get_deployment(deployment_id: int, db: Session = Depends(get_db)):
+  deployment = db.query(database.Deployment).filter_by(id=deployment_id).first()
+  if deployment is None:
+    raise HTTPException(status_code=404, detail="Deployment not found")
+  return deployment
+
+@router.get("/deployments/{deployment_id}/events")
+async def deployment_events(deployment_id: int, request: Request):
+  """
+  Server-sent events with the deployment state: the current state first, then
+  every change until the deployment succeeds or fails.
+  """
+  # Subscribe before reading the state so no change falls in between
+  queue = operations.subscribe(deployment_id)
+  state = operations.get_state(deployment_id)
+  if state is None:
+    operations.unsubscribe(deployment_id, queue)
+    raise HTTPException(status_code=404, detail="Deployment not found")
+
+  async def stream():
+    current = state
+    try:
+      yield operations.format_sse(current)
+      while current["deployment_status"] not in operations.TERMINAL_STATUSES:
+        if await request.is_disconnected():
+          break
+        try:
+          current = await asyncio.wait_for(queue.get(), timeout=15)
+        except asyncio.TimeoutError:
+          yield ": keepalive\n\n"
+          continue
+        yield operations.format_sse(current)
+    finally:
+      operations.unsubscribe(deployment_id, queue)
+
+  return StreamingResponse(stream(), media_type="text/event-stream",
+                           headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.delete("/deployments/{deployment_id}")
 def delete_deployment(deployment_id: int, db: Session = Depends(get_db)):
   deployment = db.query(database.Deployment).filter_by(id=deployment_id).first()
@@ -43,7 +43,12 @@ class DeploymentResponse(BaseModel):
   project_id: str
   instance_name: str
   deployment_status: str
-  service_name: str = None
-  service_url: str = None
+  service_name: Optional[str] = None
+  service_url: Optional[str] = None
   deployed_at: datetime
+  region: Optional[str] = None
+  progress: Optional[str] = None
+  error: Optional[str] = None
+  operation_name: Optional[str] = None
+  updated_at: Optional[datetime] = None
   # active: bool
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from google.cloud import storage, run_v2
 from google.oauth2 import service_account
@@ -11,6 +12,9 @@ from googleapiclient.errors import HttpError
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Use the in-memory clients from fakes.py instead of calling GCP
+FAKE_GCP = os.getenv("SKAINNOTATE_FAKE_GCP", "").lower() in ("1", "true", "yes")
+
 def get_credentials(service_account_file):
   """Fetch credentials from a service account file."""
   logger.info(f"Service account file: {service_account_file}")
@@ -19,11 +23,17 @@ def get_credentials(service_account_file):
   return service_account.Credentials.from_service_account_file(service_account_file)
 
 def get_sqladmin_client(service_account_file):
+  if FAKE_GCP:
+    from deployment_setup.backend.app.fakes import FakeSQLAdmin
+    return FakeSQLAdmin()
   return build('sqladmin', 'v1beta4', credentials=get_credentials(service_account_file))
 
 
 def get_cloud_run_client(service_account_file):
   """Create a Cloud Run client."""
+  if FAKE_GCP:
+    from deployment_setup.backend.app.fakes import FakeServicesClient
+    return FakeServicesClient()
   credentials = get_credentials(service_account_file)
   return run_v2.ServicesClient(credentials=credentials)
 
@@ -38,10 +48,14 @@ def get_cloud_run_url(service_account, service_name, project_id, region):
     print(f"Service '{service_name}' not found.")
     return None
 
-def run_deploy(service_account_file, service_name, project_id, container_image, region, instance_connection_name, env_vars):
-  """Deploy a service to Cloud Run using the Python client."""
+def start_deploy(service_account_file, service_name, project_id, container_image, region, instance_connection_name, env_vars):
+  """
+  Start creating a Cloud Run service without waiting for it.
+
+  :return: The long-running operation; poll operation.done() and read operation.result().
+  """
   logger.info(f"Inspect service account file: {service_account_file}, service name: {service_name}")
-  client = get_cloud_run_client(service_account_file)  # Use default credentials
+  client = get_cloud_run_client(service_account_file)
   parent = f"projects/{project_id}/locations/{region}"
 
   # Define the service template
@@ -57,9 +71,13 @@ def run_deploy(service_account_file, service_name, project_id, container_image,
           service_account=f"{service_name}-sa@{project_id}.iam.gserviceaccount.com",
       ),
   )
+  return client.create_service(parent=parent, service=service, service_id=service_name)
 
+def run_deploy(service_account_file, service_name, project_id, container_image, region, instance_connection_name, env_vars):
+  """Deploy a service to Cloud Run using the Python client."""
   try:
-    operation = client.create_service(parent=parent, service=service, service_id=service_name)
+    operation = start_deploy(service_account_file, service_name, project_id, container_image,
+                             region, instance_connection_name, env_vars)
     print(f"Deploying service '{service_name}'...")
     operation.result()  # Wait for the operation to complete
     print(f"Service '{service_name}' deployed successfully.")
@@ -90,101 +108,38 @@ def delete_service(service_name, project_id, region):
 
 
 
-def create_cloudsql_instance(service_account_file, project_id, instance_name, region, database_name, db_user, db_pass):
-  instance_body = {
-      'name': instance_name,
-      'settings': {'tier': 'db-f1-micro'},
-      'databaseVersion': 'POSTGRES_15',
-      'region': region
-  }
-  
-  sqladmin = get_sqladmin_client(service_account_file)
-
-  # Check if the Cloud SQL instance already exists
-  try:
-    sqladmin.instances().get(project=project_id, instance=instance_name).execute()
-    instance_exists = True
-  except HttpError as e:
-    if e.resp.status == 404:
-      instance_exists = False
-    else:
-      print("Error: ", str(e))
-      return {"error": f"Failed to check instance existence: {str(e)}"}
-
-  # Create the Cloud SQL instance if it doesn't exist
-  if not instance_exists:
-    try:
-      request = sqladmin.instances().insert(project=project_id, body=instance_body)
-      response = request.execute()
-      instance_created = True
-    except HttpError as e:
-      return {"error": f"Failed to create instance: {str(e)}"}
-  else:
-    instance_created = False
+def get_sqladmin_http_factory(service_account_file):
+  """
+  Authorized HTTP objects for concurrent sqladmin requests, one per request
+  since httplib2 connections are not thread-safe. None for the fake client.
+  """
+  if FAKE_GCP:
+    return None
+  import httplib2
+  from google_auth_httplib2 import AuthorizedHttp
+  credentials = get_credentials(service_account_file).with_scopes(["https://www.googleapis.com/auth/cloud-platform"])
+  return lambda: AuthorizedHttp(credentials, http=httplib2.Http())
+
+async def provision_cloudsql_instance(service_account_file, project_id, instance_name, region, database_name, db_user, db_pass):
+  """
+  Create whatever is missing of the instance, database and users.
+
+  :return: (instance_created, database_exists, user_created)
+  """
+  from deployment_setup.backend.app.provisioning import provision_cloudsql
+  return await provision_cloudsql(get_sqladmin_client(service_account_file),
+                                  project_id=project_id,
+                                  instance_name=instance_name,
+                                  region=region,
+                                  database_name=database_name,
+                                  db_user=db_user,
+                                  db_pass=db_pass,
+                                  http_factory=get_sqladmin_http_factory(service_account_file))
 
-  try:
-    sqladmin.databases().get(project=project_id, instance=instance_name, database=database_name).execute()
-    database_exists = True
-  except HttpError as e:
-    if e.resp.status == 404:
-      database_exists = False
-    else:
-      return {"error": f"Failed to check database existence: {str(e)}"}
-
-  # Create the database if it doesn't exist
-  if not database_exists:
-    try:
-      request = sqladmin.databases().insert(project=project_id, instance=instance_name, body={'name': database_name})
-      response = request.execute()
-    except HttpError as e:
-      return {"error": f"Failed to create database: {str(e)}"}
-
-  # Check if the user already exists
-  try:
-    users_list = sqladmin.users().list(project=project_id, instance=instance_name).execute()
-    user_exists = any(user['name'] == db_user for user in users_list.get('items', []))
-  except HttpError as e:
-    return {"error": f"Failed to check user existence: {str(e)}"}
-
-  # Create the user if it doesn't exist
-  if not user_exists:
-    user_body = {
-        "name": db_user,
-        "password": db_pass,
-        "host": "%"
-    }
-    try:
-      sqladmin.users().insert(project=project_id, instance=instance_name, body=user_body).execute()
-      user_created = True
-    except HttpError as e:
-      return {"error": f"Failed to create user: {str(e)}"}
-  else:
-    user_created = False
-
-  # Check if the default postgres user exists and update password if necessary
-  try:
-    postgres_user = next(user for user in users_list.get('items', []) if user['name'] == 'postgres')
-    if postgres_user and 'password' in postgres_user:
-        # Update the password if the user exists
-      update_body = {
-          "name": "postgres",
-          "password": db_pass,
-          "host": "%"
-      }
-      sqladmin.users().update(project=project_id, instance=instance_name, body=update_body).execute()
-  except StopIteration:
-    # Postgres user does not exist, create it
-    user_body = {
-        "name": "postgres",
-        "password": db_pass,
-        "host": "%"
-    }
-    try:
-      sqladmin.users().insert(project=project_id, instance=instance_name, body=user_body).execute()
-    except HttpError as e:
-      return {"error": f"Failed to create postgres user: {str(e)}"}
-
-  return instance_created, database_exists, user_created
+def create_cloudsql_instance(service_account_file, project_id, instance_name, region, database_name, db_user, db_pass):
+  """Blocking form of provision_cloudsql_instance for scripts."""
+  return asyncio.run(provision_cloudsql_instance(service_account_file, project_id, instance_name, region,
+                                                 database_name, db_user, db_pass))
 
 # Example usage
 # service_account_file = "skai-project-388314-ec99ca5755fb.json"
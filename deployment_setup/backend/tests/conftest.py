@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# The deployment modules read their configuration at import time; run them
+# against the in-memory GCP fakes with short operations and backoffs
+_database_dir = tempfile.mkdtemp(prefix="skainnotate-deployments-")
+os.environ["DEPLOYMENTS_DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'deployments.db')}"
+os.environ["SKAINNOTATE_FAKE_GCP"] = "1"
+os.environ["FAKE_OPERATION_SECONDS"] = "0.05"
+os.environ["SQL_INITIAL_BACKOFF"] = "0.01"
+os.environ["SQL_MAX_BACKOFF"] = "0.05"
+os.environ["DEPLOY_POLL_INTERVAL"] = "0.01"
+
+import pytest
+
+from deployment_setup.backend.app import fakes
+
+@pytest.fixture(autouse=True)
+def fake_gcp():
+  """
+  Start every test with empty fake Cloud Run and Cloud SQL state.
+  """
+  with fakes._lock:
+    fakes._services.clear()
+    fakes._instance_states.clear()
+    fakes._databases.clear()
+    fakes._users.clear()
+    fakes._operations.clear()
+  yield
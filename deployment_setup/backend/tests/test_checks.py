@@ -0,0 +1,130 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from deployment_setup.backend.app import checks
+
+# The columns the hot queries read, without any secondary index
+SCHEMA = """
+CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT);
+CREATE TABLE tasks (task_id INTEGER PRIMARY KEY, project_id INTEGER, external_id TEXT, image TEXT);
+CREATE TABLE labels (label_id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE assigned_tasks (id INTEGER PRIMARY KEY, task_id INTEGER REFERENCES tasks (task_id),
+                             user_id INTEGER REFERENCES users (user_id), assignment_type TEXT);
+CREATE TABLE annotations (annotation_id INTEGER PRIMARY KEY, task_id INTEGER REFERENCES tasks (task_id),
+                          user_id INTEGER REFERENCES users (user_id),
+                          label_id INTEGER REFERENCES labels (label_id), label TEXT);
+CREATE TABLE reviews (review_id INTEGER PRIMARY KEY, task_id INTEGER REFERENCES tasks (task_id),
+                      user_id INTEGER REFERENCES users (user_id), label TEXT)
+"""
+
+@pytest.fixture()
+def database_url(tmp_path):
+  url = f"sqlite:///{tmp_path / 'annotations.db'}"
+  engine = create_engine(url)
+  with engine.begin() as connection:
+    for statement in SCHEMA.split(";"):
+      connection.execute(text(statement))
+    connection.execute(text("INSERT INTO users VALUES (1, 'annotator')"))
+    connection.execute(text("INSERT INTO labels VALUES (1, 'cat')"))
+    for task_id in range(1, 21):
+      connection.execute(text("INSERT INTO tasks VALUES (:task_id, 1, :task_id, 'image.png')"), {"task_id": task_id})
+      connection.execute(text("INSERT INTO assigned_tasks VALUES (:task_id, :task_id, 1, 'annotation')"),
+                         {"task_id": task_id})
+      connection.execute(text("INSERT INTO annotations VALUES (:task_id, :task_id, 1, 1, 'cat')"),
+                         {"task_id": task_id})
+  engine.dispose()
+  return url
+
+@pytest.fixture()
+def backend():
+  """
+  A local stand-in for the core backend whose statistics endpoint fails.
+  """
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      status = 500 if self.path.endswith("/statistics") else 200
+      body = json.dumps({"path": self.path}).encode()
+      self.send_response(status)
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, format, *args):
+      pass
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield f"http://127.0.0.1:{server.server_address[1]}/"
+  server.shutdown()
+  server.server_close()
+
+def _issues(report, check):
+  return [issue for issue in report["issues"] if issue["check"] == check]
+
+def test_small_tables_are_not_flagged(database_url):
+  report = checks.check_database(database_url, samples=3)
+  assert report["issues"] == []
+  assert report["connections"]["connect"]["runs"] == 3
+  assert report["hot_queries"]["parameters"] == {"project_id": 1, "task_id": 1, "user_id": 1}
+  assert set(report["hot_queries"]["queries"]) == set(checks.HOT_QUERIES)
+  assert {"table": "tasks", "rows": 20} in report["tables"]
+
+def test_scans_and_unindexed_foreign_keys_are_flagged(database_url, monkeypatch):
+  monkeypatch.setattr(checks, "SEQ_SCAN_MIN_ROWS", 10)
+  report = checks.check_database(database_url, samples=1)
+  scans = {(issue["query"], issue["table"]) for issue in _issues(report, "missing_index")}
+  assert ("project_tasks", "tasks") in scans
+  foreign_keys = {(issue["table"], issue["column"]) for issue in _issues(report, "unindexed_foreign_key")}
+  assert ("annotations", "task_id") in foreign_keys
+  # Tables below the threshold are never flagged
+  assert not {table for _, table in scans} & {"users", "labels", "reviews"}
+
+def test_indexes_clear_the_flags(database_url, monkeypatch):
+  monkeypatch.setattr(checks, "SEQ_SCAN_MIN_ROWS", 10)
+  engine = create_engine(database_url)
+  with engine.begin() as connection:
+    connection.execute(text("CREATE INDEX ix_tasks_project_id ON tasks (project_id)"))
+    connection.execute(text("CREATE INDEX ix_annotations_task_id ON annotations (task_id, user_id)"))
+  engine.dispose()
+  report = checks.check_database(database_url, samples=1)
+  assert ("project_tasks", "tasks") not in {(issue["query"], issue["table"])
+                                            for issue in _issues(report, "missing_index")}
+  assert ("annotations", "task_id") not in {(issue["table"], issue["column"])
+                                            for issue in _issues(report, "unindexed_foreign_key")}
+
+def test_sqlite_plan_parsing():
+  rows = [(0, 0, 0, "SCAN tasks"),
+          (0, 0, 0, "SEARCH annotations USING INDEX ix_annotations_task_id (task_id=?)"),
+          (0, 0, 0, "SCAN assigned_tasks USING COVERING INDEX ix_assigned"),
+          (0, 0, 0, "SCAN TABLE reviews")]
+  assert [scan["table"] for scan in checks._sqlite_scans(rows)] == ["tasks", "reviews"]
+
+def test_endpoint_errors_are_reported(backend):
+  report = checks.check_endpoints(backend, {"project_id": 1, "user_id": 1, "task_id": 1},
+                                  requests=40, concurrency=4)
+  statistics = report["endpoints"]["statistics"]
+  assert statistics["statuses"] == {"500": statistics["runs"]}
+  assert report["errors"] == statistics["runs"] > 0
+  assert [issue["endpoint"] for issue in report["issues"]] == ["statistics"]
+  assert sum(endpoint["runs"] for endpoint in report["endpoints"].values()) == 40
+
+def test_unreachable_backend_is_reported():
+  report = checks.check_endpoints("http://127.0.0.1:1", {"project_id": 1, "user_id": 1, "task_id": 1},
+                                  requests=6, concurrency=2, timeout=1)
+  assert report["errors"] == 6
+  assert all(set(endpoint["statuses"]) <= {"URLError"} for endpoint in report["endpoints"].values())
+  assert report["issues"]
+
+def test_run_checks_records_database_failures(tmp_path, backend):
+  report = checks.run_checks(database_url=f"sqlite:///{tmp_path / 'missing' / 'annotations.db'}",
+                             base_url=backend, requests=10, concurrency=2, samples=1)
+  assert "error" in report["database"]
+  assert _issues(report, "database")
+  # The endpoint checks still run, with the default parameters
+  assert report["endpoints"]["endpoints"]["project"]["path"] == "/api/projects/1"
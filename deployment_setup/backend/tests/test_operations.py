@@ -0,0 +1,79 @@
+import asyncio
+
+from deployment_setup.backend.app import fakes, operations
+from deployment_setup.backend.app.database import Deployment, SessionLocal
+
+def _request(service_name: str, service_account_file=None) -> operations.DeployRequest:
+  return operations.DeployRequest(project_id="test-project", region="europe-west1", instance_name="test-instance",
+                                  service_name=service_name, container_image="gcr.io/test-project/backend",
+                                  env_vars={"DB_NAME": "test-db"}, service_account_file=service_account_file)
+
+async def _deploy(request: operations.DeployRequest):
+  """
+  Start a deployment and collect the states it publishes until it finishes.
+  """
+  state = operations.start_deployment(request)
+  queue = operations.subscribe(state["id"])
+  states = [state]
+  try:
+    while states[-1]["deployment_status"] not in operations.TERMINAL_STATUSES:
+      states.append(await asyncio.wait_for(queue.get(), timeout=5))
+  finally:
+    operations.unsubscribe(state["id"], queue)
+  return states
+
+def test_deployment_succeeds():
+  states = asyncio.run(_deploy(_request("backend")))
+  final = states[-1]
+  assert final["deployment_status"] == operations.SUCCESS
+  assert final["service_url"] == "https://backend-fake.a.run.app"
+  assert final["operation_name"].startswith("projects/test-project/locations/europe-west1/operations/")
+  assert [state["deployment_status"] for state in states[:2]] == [operations.PENDING, operations.DEPLOYING]
+  # Progress is published while the operation is polled
+  assert any(state["progress"].startswith("Rolling out revision") for state in states)
+  assert operations.get_state(final["id"]) == final
+  assert not operations._listeners
+
+def test_failed_rollout_marks_deployment_failed():
+  final = asyncio.run(_deploy(_request("fail-backend")))[-1]
+  assert final["deployment_status"] == operations.FAILED
+  assert "failed to become ready" in final["error"]
+  assert final["service_url"] is None
+
+def test_existing_service_marks_deployment_failed():
+  asyncio.run(_deploy(_request("backend")))
+  final = asyncio.run(_deploy(_request("backend")))[-1]
+  assert final["deployment_status"] == operations.FAILED
+  assert "already exists" in final["error"]
+
+def test_deployment_removes_service_account_file(tmp_path):
+  service_account_file = tmp_path / "service-account.json"
+  service_account_file.write_text("{}")
+  final = asyncio.run(_deploy(_request("fail-backend", str(service_account_file))))[-1]
+  assert final["deployment_status"] == operations.FAILED
+  assert not service_account_file.exists()
+
+def test_concurrent_deployments_do_not_block_each_other():
+  async def deploy_all():
+    return await asyncio.gather(*(_deploy(_request(f"backend-{index}")) for index in range(5)))
+  finals = [states[-1] for states in asyncio.run(deploy_all())]
+  assert {final["deployment_status"] for final in finals} == {operations.SUCCESS}
+  assert len(fakes._services) == 5
+
+def test_mark_interrupted_fails_running_deployments():
+  with SessionLocal() as db:
+    queued = Deployment(project_id="test-project", instance_name="test-instance", deployment_status=operations.PENDING)
+    rolling_out = Deployment(project_id="test-project", instance_name="test-instance",
+                             deployment_status=operations.DEPLOYING, operation_name="operations/123")
+    done = Deployment(project_id="test-project", instance_name="test-instance", deployment_status=operations.SUCCESS)
+    db.add_all([queued, rolling_out, done])
+    db.commit()
+    ids = queued.id, rolling_out.id, done.id
+
+  operations.mark_interrupted()
+
+  queued, rolling_out, done = (operations.get_state(deployment_id) for deployment_id in ids)
+  assert queued["deployment_status"] == rolling_out["deployment_status"] == operations.FAILED
+  assert queued["error"] == "Interrupted by a server restart"
+  assert "operations/123" in rolling_out["error"]
+  assert done["deployment_status"] == operations.SUCCESS
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from deployment_setup.backend.app import fakes, provisioning
+from deployment_setup.backend.app.provisioning import (CloudSQLProvisioner,
+                                                       ProvisioningError,
+                                                       Step,
+                                                       provision_cloudsql,
+                                                       run_graph)
+
+PROJECT, INSTANCE = "test-project", "test-instance"
+
+def _provision(sqladmin=None):
+  return asyncio.run(provision_cloudsql(sqladmin or fakes.FakeSQLAdmin(), PROJECT, INSTANCE, "europe-west1",
+                                        "test-db", "test-user", "test-pass"))
+
+class _Request:
+  """
+  Answers with the given HTTP statuses in turn, then with `result`.
+  """
+  def __init__(self, statuses, result=None):
+    self.statuses = list(statuses)
+    self.result = result
+    self.calls = 0
+
+  def execute(self, http=None, num_retries=0):
+    self.calls += 1
+    if self.statuses:
+      raise fakes._http_error(self.statuses.pop(0), "Injected error")
+    return self.result
+
+class _RacingInstances(fakes._Instances):
+  # Another run creates the instance between our lookup and our insert
+  def insert(self, project, body):
+    fakes._Instances().insert(project, body).execute()
+    return super().insert(project, body)
+
+class _RacingSQLAdmin(fakes.FakeSQLAdmin):
+  def instances(self):
+    return _RacingInstances()
+
+class _FailingOperations(fakes._Operations):
+  def get(self, project, operation):
+    return _Request([], {"name": operation, "status": "DONE",
+                         "error": {"errors": [{"message": "Quota exceeded"}]}})
+
+class _FailingSQLAdmin(fakes.FakeSQLAdmin):
+  def operations(self):
+    return _FailingOperations()
+
+def test_provisioning_creates_everything():
+  assert _provision() == (True, False, True)
+  assert (PROJECT, INSTANCE, "test-db") in fakes._databases
+  assert {user["name"] for user in fakes._users[f"{PROJECT}:{INSTANCE}"]} == {"test-user", "postgres"}
+
+def test_provisioning_is_idempotent():
+  _provision()
+  operations = len(fakes._operations)
+  assert _provision() == (False, True, False)
+  assert len(fakes._operations) == operations
+  assert len(fakes._users[f"{PROJECT}:{INSTANCE}"]) == 2
+
+def test_provisioning_resumes_while_instance_is_starting():
+  # An interrupted run left the instance creating and nothing else
+  fakes._Instances().insert(PROJECT, {"name": INSTANCE}).execute()
+  assert _provision() == (False, False, True)
+  assert (PROJECT, INSTANCE, "test-db") in fakes._databases
+
+def test_operation_in_progress_is_retried(caplog):
+  fakes._start_operation(PROJECT, INSTANCE)
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  with caplog.at_level(logging.INFO, logger=provisioning.__name__):
+    assert asyncio.run(provisioner.ensure_database("test-db")) is False
+  assert "database: HTTP 409, retrying" in caplog.text
+  assert (PROJECT, INSTANCE, "test-db") in fakes._databases
+
+def test_retries_give_up_after_max_attempts(monkeypatch):
+  monkeypatch.setattr(provisioning, "MAX_ATTEMPTS", 3)
+  request = _Request([503, 503, 503, 503])
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  with pytest.raises(HttpError) as error:
+    asyncio.run(provisioner.execute("database", request))
+  assert error.value.resp.status == 503
+  assert request.calls == 3
+
+def test_transient_errors_are_retried():
+  request = _Request([429, 503], {"status": "DONE"})
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  assert asyncio.run(provisioner.execute("database", request)) == {"status": "DONE"}
+  assert request.calls == 3
+
+def test_non_retryable_errors_are_raised_at_once():
+  request = _Request([403])
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  with pytest.raises(HttpError):
+    asyncio.run(provisioner.execute("database", request))
+  assert request.calls == 1
+
+def test_conflicts_are_not_retried_when_disabled():
+  request = _Request([409])
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  with pytest.raises(HttpError):
+    asyncio.run(provisioner.execute("instance", request, retry_conflicts=False))
+  assert request.calls == 1
+
+def test_instance_created_concurrently_is_waited_for():
+  provisioner = CloudSQLProvisioner(_RacingSQLAdmin(), PROJECT, INSTANCE)
+  assert asyncio.run(provisioner.ensure_instance("europe-west1")) is False
+  assert fakes._Instances().get(PROJECT, INSTANCE).execute()["state"] == "RUNNABLE"
+
+def test_failed_operation_raises_provisioning_error():
+  with pytest.raises(ProvisioningError, match="Quota exceeded") as error:
+    _provision(_FailingSQLAdmin())
+  assert error.value.step == "instance"
+
+def test_operation_timeout_raises_provisioning_error(monkeypatch):
+  monkeypatch.setattr(provisioning, "OPERATION_TIMEOUT_SECONDS", 0.05)
+  monkeypatch.setattr(fakes, "FAKE_OPERATION_SECONDS", 10)
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  with pytest.raises(ProvisioningError, match="timed out") as error:
+    asyncio.run(provisioner.ensure_database("test-db"))
+  assert error.value.step == "database"
+
+def test_existing_postgres_password_is_updated():
+  provisioner = CloudSQLProvisioner(fakes.FakeSQLAdmin(), PROJECT, INSTANCE)
+  asyncio.run(provisioner.ensure_postgres_password([{"name": "postgres", "password": ""}], "test-pass"))
+  assert len(fakes._operations) == 1
+  assert f"{PROJECT}:{INSTANCE}" not in fakes._users
+
+def test_graph_runs_steps_after_their_dependencies():
+  order = []
+
+  def step(name, *depends_on):
+    async def run(results):
+      assert all(dependency in results for dependency in depends_on)
+      order.append(name)
+      return name.upper()
+    return Step(name, run, depends_on)
+
+  results = asyncio.run(run_graph([step("c", "a", "b"), step("b", "a"), step("a")]))
+  assert order == ["a", "b", "c"]
+  assert results == {"a": "A", "b": "B", "c": "C"}
+
+@pytest.mark.parametrize("steps, message", [
+  ([Step("a", None, ("b",)), Step("b", None, ("a",))], "cycle"),
+  ([Step("a", None, ("missing",))], "unknown step missing"),
+])
+def test_graph_rejects_invalid_dependencies(steps, message):
+  with pytest.raises(ValueError, match=message):
+    asyncio.run(run_graph(steps))
+
+def test_graph_failure_cancels_remaining_steps():
+  finished = []
+
+  async def fail(results):
+    raise ProvisioningError("a", "failed")
+
+  async def slow(results):
+    await asyncio.sleep(5)
+    finished.append("slow")
+
+  async def dependent(results):
+    finished.append("dependent")
+
+  with pytest.raises(ProvisioningError):
+    asyncio.run(run_graph([Step("a", fail), Step("slow", slow), Step("dependent", dependent, ("a",))]))
+  assert finished == []
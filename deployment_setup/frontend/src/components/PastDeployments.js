@@ -83,6 +83,10 @@ const handleDelete = (deployment) => {
                   {deployment.deployment_status}
                 </span>
               </p>
+              {deployment.deployment_status !== 'Success' && deployment.progress && (
+                <p><strong>Progress:</strong> {deployment.progress}</p>
+              )}
+              {deployment.error && <p><strong>Error:</strong> {deployment.error}</p>}
               <p>
                 <strong>Service URL:</strong>{" "}
                 <a href={deployment.service_url} target="_blank" rel="noopener noreferrer">
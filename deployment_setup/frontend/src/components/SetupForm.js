@@ -5,7 +5,7 @@ import {
   setProject,
   createSQLInstance,
   deployApp,
-  addDeployment,
+  deploymentEventsUrl,
 } from '../services/api';
 import {
   Segment,
@@ -23,6 +23,7 @@ const SetupForm = () => {
   const [loading, setLoading] = useState(false);
   const [success, setSuccess] = useState(false);
   const [serviceAccountFile, setServiceAccountFile] = useState(null);
+  const [progress, setProgress] = useState('');
 
   // Controlled state for text fields
   const [formData, setFormData] = useState({
@@ -80,12 +81,8 @@ const SetupForm = () => {
       return;
     }
 
-    let service_url = '';
-    let deployment_status = '';
-
     try {
-      alertify.success('Application launch in progress...');
-      const deployResponse = await deployApp({
+      const deployment = await deployApp({
         project_id: formData.project_id,
         instance_name: formData.instance_name,
         region: formData.region,
@@ -98,33 +95,39 @@ const SetupForm = () => {
         superuser_username: formData.superuser_username,
         service_account_file: serviceAccountFile,
       });
-      if (deployResponse && deployResponse.service_url) {
-        service_url = deployResponse.service_url;
-        deployment_status = 'Success';
-        alertify.success(`App launched successfully at ${service_url}!`);
-        setSuccess(true);
-      } else {
-        deployment_status = 'Failed';
-      }
+      alertify.success('Application launch in progress...');
+      followDeployment(deployment.id);
     } catch (error) {
       alertify.error(`Error launching application: ${error?.message || 'Unknown error'}`);
-      deployment_status = 'Failed';
-    } finally {
-      try {
-        await addDeployment({
-          project_id: formData.project_id,
-          instance_name: formData.instance_name,
-          service_name: formData.service_name,
-          service_url,
-          deployment_status,
-        });
-      } catch (error) {
-        console.error('Error adding deployment:', error);
-      }
       setLoading(false);
     }
   };
 
+  // The deployment runs on the server; follow its progress until it finishes
+  const followDeployment = (deploymentId) => {
+    const source = new EventSource(deploymentEventsUrl(deploymentId));
+    source.addEventListener('deployment', (event) => {
+      const deployment = JSON.parse(event.data);
+      setProgress(deployment.progress || '');
+      if (deployment.deployment_status === 'Success') {
+        alertify.success(`App launched successfully at ${deployment.service_url}!`);
+        setSuccess(true);
+      } else if (deployment.deployment_status === 'Failed') {
+        alertify.error(`Error launching application: ${deployment.error || 'Unknown error'}`);
+      } else {
+        return;
+      }
+      source.close();
+      setLoading(false);
+    });
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        alertify.warning('Lost track of the deployment; check Past Deployments for its status.');
+        setLoading(false);
+      }
+    };
+  };
+
   return (
     <Segment className="setup-segment">
       <Header as="h2" textAlign="center">
@@ -289,6 +292,7 @@ const SetupForm = () => {
           <Icon name="check circle" /> Launch
         </Button>
       </Form>
+      {loading && progress && <p className="deployment-progress">{progress}</p>}
     </Segment>
   );
 };
@@ -44,6 +44,9 @@ export const deployApp = async (configData) => {
   }
 };
 
+// Server-sent events with the state of a running deployment
+export const deploymentEventsUrl = (deploymentId) => `${BASE_API_URL}/deployments/${deploymentId}/events`;
+
 export const addDeployment = async (DepData) => {
   try {
     const response = await axios.post(`${BASE_API_URL}/deployments`, DepData);